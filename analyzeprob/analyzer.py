@@ -4,18 +4,22 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from collections import defaultdict
 from conditionals.condition_tree_builder import ConditionTreeBuilder
-from conditionals.path_extractor import extract_paths
-from pathbranch.probability_calculator import ProbabilityCalculator
+from conditionals.symbolic_store import extract_paths_with_store
+from conditionals.random_inputs import discover_random_inputs
+from pathbranch.limitpathfix import ProbabilityCalculator
 
-def analyze_return_probabilities(code, variables, domain):
+def analyze_return_probabilities(code, variables=None, domain=None, bindings=None):
     """
     Analyze return value probabilities of a Python function using symbolic path analysis.
-    
+
     Args:
         code (str): The Python function source code as a string.
-        variables (list): List of symbolic variables used in conditions.
-        domain (dict): Dictionary mapping each variable to its domain (possible values).
-    
+        variables (list): List of random input variables used in conditions. If None, they are
+            discovered from the random.* calls in the code (see conditionals/random_inputs.py).
+        domain (dict): Dictionary mapping each variable to its domain (possible values). With
+            discovery, only needed for parameters that are not sampled in the code itself.
+        bindings (dict): Optional fixed values for non-random parameters (e.g. {'door_switch': 1}).
+
     Returns:
         result_distribution (dict): Probabilities for each return value.
         path_probs (dict): Probabilities for each symbolic execution path.
@@ -24,34 +28,50 @@ def analyze_return_probabilities(code, variables, domain):
     builder = ConditionTreeBuilder()
     condition_tree = builder.build_tree(code)
 
-    # Step 2: Extract all true/false execution paths from condition tree
-    paths = extract_paths(condition_tree)
+    # Step 2: Extract paths, substituting assignments (e.g. choice=3, host_door=1)
+    # into later conditions so only the random inputs are left to enumerate
+    paths = extract_paths_with_store(condition_tree, bindings)
 
     # Step 3: Compute symbolic probabilities for all paths
-    calc = ProbabilityCalculator(variables, domain)
+    pmf = None
+    if variables is None:
+        variables, found, pmf = discover_random_inputs(code, bindings, paths)
+        # Parameters given a domain explicitly are enumerated uniformly
+        for v, values in (domain or {}).items():
+            if v not in found:
+                variables.append(v)
+                found[v] = list(values)
+                if pmf is not None:
+                    pmf[v] = {x: 1 / len(found[v]) for x in found[v]}
+        domain = found
+    calc = ProbabilityCalculator(variables, domain, pmf=pmf)
     path_probs = calc.calculate_path_probabilities(paths)
 
     # Step 4: Evaluate return values (including symbolic expressions like "not door_switch")
     result_distribution = defaultdict(float)
     for path, prob in path_probs.items():
         found_return = False
+        givens = [c if o == "True" else f"not ({c})" for c, o in path if c != "Statements"]
         for cond, stmt in path:
             if cond == "Statements":
                 for s in stmt:
                     if s.strip().startswith("return"):
-                        return_expr = s.strip().replace("return", "").strip()
+                        return_expr = s.strip().replace("return", "", 1).strip()
                         found_return = True
                         try:
-                            true_count = 0
-                            for case in calc.total_cases:
-                                local_env = dict(zip(variables, case))
-                                result = eval(return_expr, {}, local_env)
-                                if result:
-                                    true_count += 1
-                            ratio = true_count / len(calc.total_cases)
+                            value = eval(return_expr, {}, {})
+                            if isinstance(value, bool):
+                                value = int(value)
+                            result_distribution[str(value)] += prob
+                        except NameError:
+                            # Depends on the inputs: split by P(expr | path conditions)
+                            if givens:
+                                ratio = calc.compute_conditional_probability(return_expr, " and ".join(givens))
+                            else:
+                                ratio = calc.compute_probability(return_expr)
                             result_distribution['1'] += ratio * prob
                             result_distribution['0'] += (1 - ratio) * prob
-                        except:
+                        except Exception:
                             result_distribution[return_expr] += prob
         if not found_return:
             # If no return statement was executed in this path, assume default return 0
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Exact-vs-simulated differential benchmark over the bundled examples.
+
+For every registered case the exact engine (path analysis with
+limitpathfix.ProbabilityCalculator, or the closed form the example documents)
+and the vectorized simulator (examples/simulate.py, or a compiled kernel from
+conditionals/vector_kernel.py for branch-only sources) are run on the same
+event. Each row records wall time and peak traced memory of both sides and
+whether the simulated frequency agrees with the exact value: a two-sided
+binomial z-test (p-value) and whether the exact value lies in the Wilson
+interval at the same level. Rows go to a JSON and/or CSV report; the exit
+status is 1 when any case disagrees, so it can gate a change.
+
+Usage:
+  python benchmark.py --trials 1000000 --json bench.json --csv bench.csv
+  python benchmark.py --only monty,pi --alpha 1e-4
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import csv
+import json
+import math
+import time
+import argparse
+import tracemalloc
+from statistics import NormalDist
+
+from analyzer import analyze_return_probabilities
+from conditionals.pathrunner import (EX_MONTY, EX_PI, MONTY_VARS, MONTY_DOMAIN,
+                                     ConditionTreeBuilder, extract_paths)
+from conditionals.vector_kernel import register_kernel
+from conditionals.walk_chain import cliff_walk, randint_step_prob
+from examples.autobdy import gen_birthday_chain_source
+from examples.simulate import simulate, wilson_interval
+from pathbranch.limitpathfix import ProbabilityCalculator
+from pathbranch.modmain import calculate_freivalds_k_prob, generate_freivalds_code
+
+# ============================
+# 1) Cases: name -> (exact(), simulate(trials, seed))
+# ============================
+CASES = {}
+
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+
+def exact_win(code, variables=None, domain=None, pmf=None):
+    """P(return 1) (or True) of a source, by path analysis."""
+    if pmf is None:
+        dist, _ = analyze_return_probabilities(code, variables, domain)
+        return dist.get('1', 0.0)
+    paths = extract_paths(ConditionTreeBuilder().build_tree(code))
+    probs = ProbabilityCalculator(variables, domain, pmf=pmf).calculate_path_probabilities(paths)
+    return sum(p for path, p in probs.items() if 'return 1' in path[-1][1])
+
+
+def kernel_sim(name, code, **kwargs):
+    def run(trials, seed):
+        register_kernel(name, code, **kwargs)
+        return simulate(name, trials, seed=seed)
+    return run
+
+
+TWO_DRAWS = """import random
+def f():
+    x = random.randint(1, 10)
+    y = random.randint(1, 10)
+    if {test}:
+        return 1
+    else:
+        return 0
+"""
+
+NEUMANN = """
+if a == 0 and b == 1:
+    return 0
+elif a == 1 and b == 0:
+    return 1
+else:
+    return -1
+"""
+
+FREIVALDS_INSTANCE = ([[1, 2], [3, 4]], [[1, 1], [1, 1]], [[1, 2], [1, 4]])  # AB != C (modmain demo)
+
+
+@case("monty")
+def monty_case():
+    return (lambda: exact_win(EX_MONTY, MONTY_VARS, MONTY_DOMAIN),
+            lambda trials, seed: simulate("monty", trials, seed=seed))
+
+
+@case("pi")
+def pi_case(R=315):
+    code = EX_PI.replace("R2", str(R * R))
+    domain = {"x": range(R + 1), "y": range(R + 1)}
+    return (lambda: exact_win(code, ["x", "y"], domain),
+            lambda trials, seed: simulate("pi", trials, seed=seed, R=R))
+
+
+@case("birthday")
+def birthday_case(K=23, N=365):
+    code = gen_birthday_chain_source(K, N)
+    return (lambda: exact_win(code),
+            lambda trials, seed: simulate("birthday", trials, seed=seed, K=K, N=N))
+
+
+@case("freivalds")
+def freivalds_case():
+    A, B, C = FREIVALDS_INSTANCE
+    code, variables = generate_freivalds_code(A, B, C, 2)
+    return (lambda: calculate_freivalds_k_prob(A, B, C, 2, 1)["p_fp_1"],
+            kernel_sim("bench_freivalds", code, variables=variables, domain={v: [0, 1] for v in variables}))
+
+
+for _name, _test in [("min_of_two", "x < y"), ("max_of_two", "x > y"), ("eq_of_two", "x == y")]:
+    def _two_case(test=_test, name=_name):
+        code = TWO_DRAWS.format(test=test)
+        return lambda: exact_win(code), kernel_sim(f"bench_{name}", code)
+    case(_name)(_two_case)
+
+
+@case("vonneumann")
+def vonneumann_case(p=0.8):
+    pmf = {"a": {0: p, 1: 1 - p}, "b": {0: p, 1: 1 - p}}
+    return (lambda: exact_win(NEUMANN, ["a", "b"], {"a": [0, 1], "b": [0, 1]}, pmf),
+            lambda trials, seed: simulate("vonneumann", trials, seed=seed, p=p))
+
+
+@case("walk")
+def walk_case(p=0.3):
+    # fall within the simulator's 1000-step limit, from the sparse chain
+    left = randint_step_prob(p)
+    return (lambda: cliff_walk().solve([left, 1 - left], start=0, horizon=1000)["within"]["fall"],
+            lambda trials, seed: simulate("walk", max(trials // 10, 1), seed=seed, prob_step_left=p))
+
+
+# ============================
+# 2) Measurement and agreement
+# ============================
+def _measure(fn, memory=True):
+    """(result, seconds, peak traced MiB); memory is traced in a second run so timing stays clean."""
+    t0 = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - t0
+    peak = float("nan")
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def agreement(exact, hits, trials, alpha):
+    """Two-sided z-test of hits/trials against 'exact'; returns (z, p_value, in_wilson_ci)."""
+    lo, hi = wilson_interval(hits, trials, 1 - alpha)
+    in_ci = lo <= exact <= hi
+    if exact <= 0 or exact >= 1:
+        ok = hits == (0 if exact <= 0 else trials)
+        return (0.0 if ok else math.inf), (1.0 if ok else 0.0), in_ci
+    z = (hits / trials - exact) / math.sqrt(exact * (1 - exact) / trials)
+    return z, 2 * (1 - NormalDist().cdf(abs(z))), in_ci
+
+
+def run_case(name, trials=1_000_000, seed=1, alpha=1e-3, memory=True):
+    exact_fn, sim_fn = CASES[name]()
+    exact, t_exact, mem_exact = _measure(exact_fn, memory)
+    sim, t_sim, mem_sim = _measure(lambda: sim_fn(trials, seed), memory)
+    z, p_value, in_ci = agreement(exact, sim["hits"], sim["trials"], alpha)
+    return {
+        "case": name,
+        "exact": exact,
+        "estimate": sim["estimate"],
+        "stderr": sim["stderr"],
+        "trials": sim["trials"],
+        "z": z,
+        "p_value": p_value,
+        "in_ci": in_ci,
+        "agree": p_value >= alpha,
+        "exact_seconds": t_exact,
+        "sim_seconds": t_sim,
+        "exact_peak_mib": mem_exact,
+        "sim_peak_mib": mem_sim,
+    }
+
+
+def write_report(rows, json_path=None, csv_path=None):
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+    if csv_path and rows:
+        with open(csv_path, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=list(rows[0]))
+            w.writeheader()
+            w.writerows(rows)
+
+
+# ============================
+# 3) Run
+# ============================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Exact vs simulated benchmark over the bundled examples")
+    ap.add_argument("--trials", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--alpha", type=float, default=1e-3, help="significance level of the agreement test")
+    ap.add_argument("--only", default="", help="comma-separated case names (default: all)")
+    ap.add_argument("--no-memory", action="store_true", help="skip the traced second run")
+    ap.add_argument("--json", default="benchmark.json")
+    ap.add_argument("--csv", default="benchmark.csv")
+    args = ap.parse_args()
+
+    names = [n for n in args.only.split(",") if n] or list(CASES)
+    rows = []
+    for name in names:
+        row = run_case(name, args.trials, args.seed, args.alpha, not args.no_memory)
+        rows.append(row)
+        print(f"{name:>11}: exact {row['exact']:.6f}  sim {row['estimate']:.6f}  p={row['p_value']:.3f} "
+              f"{'ok ' if row['agree'] else 'FAIL'}  exact {row['exact_seconds']:.3f}s/{row['exact_peak_mib']:.1f}MiB"
+              f"  sim {row['sim_seconds']:.3f}s/{row['sim_peak_mib']:.1f}MiB")
+    write_report(rows, args.json, args.csv)
+    print(f"report -> {args.json}, {args.csv}")
+    sys.exit(0 if all(r["agree"] for r in rows) else 1)
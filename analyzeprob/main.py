@@ -60,16 +60,18 @@ example_code = """def monty_hall(choice, door_switch):
  
 """
 
-variables = ['choice', 'door_switch', 'car_door', 'host_door']
+# host_door and the reassigned choice are derived from the random inputs, so
+# only choice and car_door are enumerated (9 tuples instead of 54);
+# door_switch is a strategy parameter bound per run. car_door's domain is
+# discovered from random.randint(1, 3); the initial choice is a parameter.
 domain = {
     'choice': [1, 2, 3],
-    'door_switch': [1,0],
-    'car_door': [1, 2, 3],
-    'host_door': [1, 2, 3]
 }
 
-result_distribution, path_probs = analyze_return_probabilities(example_code, variables, domain)
+for door_switch in (1, 0):
+    result_distribution, path_probs = analyze_return_probabilities(
+        example_code, domain=domain, bindings={'door_switch': door_switch})
 
-print("== Summary of Return Probabilities ==")
-for ret_val, prob in result_distribution.items():
-    print(f"Return {ret_val} → P = {prob:.4f}")
+    print(f"== Summary of Return Probabilities (door_switch={door_switch}) ==")
+    for ret_val, prob in result_distribution.items():
+        print(f"Return {ret_val} → P = {prob:.4f}")
@@ -7,14 +7,23 @@ Rules:
 - Everything else (return 0, pass, or anything not 'return 1') => lose
 
 Formatting:
-- First N-1 branches: 12 decimals, no semicolon, '+' prefix
-- Last branch: 15 decimals, semicolon BEFORE the comment
+- Every branch: 12 decimals, '+' prefix after the first; the rounded
+  probabilities sum to exactly 1 (largest-remainder rounding)
+- Last branch: semicolon BEFORE the comment
 """
 
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import re
-from decimal import Decimal, getcontext
+import ast
+import math
+import numbers
+from fractions import Fraction
+from functools import lru_cache
 
-getcontext().prec = 50  # high precision for clean remainder arithmetic
+import numpy as np
 
 # ============================
 # 1) Paste your dump here
@@ -1050,43 +1059,98 @@ Probability: 0.888889
 # ============================
 # 2) Parse the dump
 # ============================
-PATH_RE = re.compile(r"^Path:\s*\((.*)\)\s*$")
-PROB_RE = re.compile(r"^Probability:\s*([0-9]*\.?[0-9]+)\s*$")
+# One pass over the whole dump: a Path line, then (after blank lines) its Probability line.
+# The probability group is optional so a Path without one is reported, not skipped.
+RECORD_RE = re.compile(
+    rb"^Path:[ \t]*\((?P<raw>.*)\)[ \t]*\r?$"
+    rb"(?:\s*^Probability:[ \t]*(?P<prob>[0-9]*\.?[0-9]+)[ \t]*\r?$)?",
+    re.M)
+@lru_cache(maxsize=4096)
+def _leaf_outcome(leaf: str) -> str:
+    try:
+        stmts = ast.literal_eval(leaf)
+    except (ValueError, SyntaxError):
+        return "lose"
+    return statements_outcome(stmts if isinstance(stmts, (list, tuple)) else (stmts,))
+
+def dump_outcome(raw: str) -> str:
+    """Outcome from the path's final ('Statements', (...)) tuple (see statements_outcome)."""
+    k = raw.rfind("'Statements'")
+    if k < 0:
+        return "lose"
+    # "'Statements', ('return 1',))" -> "('return 1',)"; leaves repeat, so parse each once
+    leaf = raw[raw.index(",", k) + 1:].strip()
+    return _leaf_outcome(leaf[:-1].rstrip() if leaf.endswith(")") else leaf)
+
+def iter_dump(data):
+    """
+    Lazily yield {'id','prob','outcome','raw'} records from dump text, bytes or an mmap.
+    One compiled pattern is run with finditer; nothing is split into lines.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    for k, m in enumerate(RECORD_RE.finditer(data), start=1):
+        if m.group("prob") is None:
+            raise ValueError(f"Expected 'Probability:' after Path {k}")
+        raw = m.group("raw").decode()
+        yield {"id": k, "prob": float(m.group("prob")), "outcome": dump_outcome(raw), "raw": raw}
+
+def iter_dump_file(filename):
+    """iter_dump over a memory-mapped dump file (records are produced while the file is scanned)."""
+    import mmap
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_dump(mm)
 
 def parse_dump(text: str):
-    """Return list of dicts: [{'id':k,'prob':Decimal,'outcome':'win|lose','raw':...}, ...]"""
-    lines = [ln.rstrip() for ln in text.splitlines()]
-    i = 0
-    k = 0
-    paths = []
-    while i < len(lines):
-        m = PATH_RE.match(lines[i])
-        if m:
-            k += 1
-            raw = m.group(1)
-            # probability line (skip blank lines)
-            j = i + 1
-            while j < len(lines) and lines[j].strip() == "":
-                j += 1
-            if j >= len(lines):
-                raise ValueError(f"Missing Probability after Path {k}")
-            pm = PROB_RE.match(lines[j])
-            if not pm:
-                raise ValueError(f"Expected 'Probability:' after Path {k}, got: {lines[j]}")
-            prob = Decimal(pm.group(1))
-
-            # outcome rule: ONLY 'return 1' is win; everything else => lose
-            raw_lower = raw.lower()
-            if "return 1" in raw_lower or "return1" in raw_lower:
-                outcome = "win"
-            else:
-                outcome = "lose"
+    """Return list of dicts: [{'id':k,'prob':float,'outcome':'win|lose','raw':...}, ...]"""
+    return list(iter_dump(text))
 
-            paths.append({"id": k, "prob": prob, "outcome": outcome, "raw": raw})
-            i = j + 1
+
+# ============================
+# 2b) In-memory path probabilities (no text dump round-trip)
+# ============================
+def statements_outcome(stmts) -> str:
+    """Same rule as parse_dump, read from the structured Statements tuple: ONLY 'return 1' is win."""
+    for s in stmts:
+        if s.replace(" ", "").lower() == "return1":
+            return "win"
+    return "lose"
+
+def path_records(path_probs):
+    """
+    Yield records shaped like parse_dump's from the dict returned by
+    calculate_path_probabilities, or from any iterable of (path, prob) pairs.
+    Probabilities are kept as given (float, or exact int/Fraction), with no
+    6-digit text rounding; normalize_units takes care of the rest.
+    """
+    items = path_probs.items() if hasattr(path_probs, "items") else path_probs
+    for k, (path, prob) in enumerate(items, start=1):
+        last = path[-1] if path else None
+        stmts = last[1] if last and last[0] == "Statements" else ()
+        yield {"id": k, "prob": prob, "outcome": statements_outcome(stmts), "path": path}
+
+def export_path_probabilities(path_probs, filename="paths_embedded.prism", model_name="paths_embedded",
+                              lump=False, explicit=False):
+    """
+    Write the DTMC for in-memory path probabilities; returns the records used.
+    lump=True writes the outcome-aggregated model plus '<filename>.paths.csv'
+    mapping every path to its lumped state.
+    explicit=True writes .tra/.sta/.lab files next to 'filename' instead (write_prism_explicit).
+    """
+    records = list(path_records(path_probs))
+    if explicit:
+        write_prism_explicit(records, os.path.splitext(filename)[0])
+        return records
+    with open(filename, "w") as f:
+        if lump:
+            with open(filename + ".paths.csv", "w") as mapping:
+                write_prism_lumped(records, f, model_name=model_name, mapping_out=mapping)
         else:
-            i += 1
-    return paths
+            write_prism(records, f, model_name=model_name)
+    return records
 
 
 # ============================
@@ -1095,95 +1159,350 @@ def parse_dump(text: str):
 def sanitize_comment(s: str) -> str:
     return s.replace(";", "").replace("\n", " ").strip()
 
-def emit_branches_fixed(norm_items):
+DIGITS = 12  # decimals per emitted branch probability
+
+def normalize_units(probs, digits=DIGITS):
+    """
+    Probabilities divided by their total, in integer units of 10**-digits that
+    sum to exactly 10**digits: every value is floored, and the units still
+    missing go to the largest remainders (ties to the earlier path).
+
+    All int/Fraction inputs (counts, exact probabilities) are normalized exactly;
+    otherwise the total is an fsum and the division is done in float64.
+    Returns an int64 array, one entry per prob.
+    """
+    scale = 10 ** digits
+    if not isinstance(probs, np.ndarray) and all(isinstance(p, numbers.Rational) for p in probs):
+        total = sum(Fraction(p) for p in probs)
+        floors, rems = [], []
+        for p in probs:
+            q, r = divmod(Fraction(p) * scale, total)
+            floors.append(int(q))
+            rems.append(float(r / total))
+        floors, rems = np.array(floors, dtype=np.int64), np.array(rems)
+    else:
+        x = np.asarray(probs, dtype=float)
+        x = x / math.fsum(x) * scale
+        floors = np.floor(x).astype(np.int64)
+        rems = x - floors
+    deficit = scale - int(floors.sum())
+    if deficit > 0:
+        floors[np.argsort(-rems, kind="stable")[:deficit]] += 1
+    elif deficit < 0:
+        # float rounding overshot: take units back from the smallest remainders
+        order = [k for k in np.argsort(rems, kind="stable") if floors[k] > 0]
+        floors[order[:-deficit]] -= 1
+    return floors
+
+def format_units(u, digits=DIGITS):
+    """Fixed-point string for u units of 10**-digits, e.g. 507297234307 -> '0.507297234307'."""
+    scale = 10 ** digits
+    return f"{u // scale}.{u % scale:0{digits}d}"
+
+def branch_line(i, n, pid, p, desc, kind="path"):
     """
-    norm_items: list of tuples (pid:int, prob:Decimal, desc:str) in order.
+    One branch of the s=0 command; p is the formatted probability (format_units).
     Output formatting:
-      - First N-1: 12 decimals, '+' prefix (except first), no semicolon
-      - Last: 15 decimals, semicolon BEFORE comment
+      - '+' prefix (except first), no semicolon
+      - Last: semicolon BEFORE comment
     """
-    lines = []
+    comment = sanitize_comment(f"{kind} {pid}: {desc}")
+    lead = "      " if i == 0 else "    + "
+    if i < n - 1:
+        return f"{lead}{p} : (s'={pid})  // {comment} "
+    return f"{lead}{p} : (s'={pid});  // {comment}"
+
+def emit_branches_fixed(norm_items):
+    """norm_items: list of tuples (pid:int, prob:str, desc:str) in order, probs already normalized."""
     n = len(norm_items)
-    for i, (pid, p, desc) in enumerate(norm_items):
-        comment = sanitize_comment(f"path {pid}: {desc}")
-        if i == 0:
-            prob_txt = f"{p:.12f}"
-            lines.append(f"      {prob_txt} : (s'={pid})  // {comment} ")
-        elif i < n - 1:
-            prob_txt = f"{p:.12f}"
-            lines.append(f"    + {prob_txt} : (s'={pid})  // {comment} ")
-        else:
-            prob_txt = f"{p:.15f}"
-            lines.append(f"    + {prob_txt} : (s'={pid});  // {comment}")
-    return "\n".join(lines)
+    return "\n".join(branch_line(i, n, pid, p, desc) for i, (pid, p, desc) in enumerate(norm_items))
+
+def range_guard(lo, hi):
+    return f"s={lo}" if lo == hi else f"s>={lo} & s<={hi}"
 
 
 # ============================
-# 4) Build PRISM text
+# 4) Build PRISM text (streamed)
 # ============================
-def build_prism(paths, model_name="paths_embedded"):
-    # drop zero-probability paths
-    nz = [p for p in paths if p["prob"] > 0]
-    if not nz:
-        raise ValueError("All paths have zero probability.")
+CHUNK_LINES = 10000  # lines buffered before each write
 
-    # normalize and make last prob the exact remainder
-    total = sum(p["prob"] for p in nz)
-    norm_probs = [p["prob"] / total for p in nz]
-    norm_items = []
-    running = Decimal("0")
-    for idx, p in enumerate(nz):
-        pid = p["id"]
-        desc = p["outcome"]
-        if idx < len(nz) - 1:
-            prob = norm_probs[idx]
-            norm_items.append((pid, prob, desc))
-            running += prob
+class _LabelRuns:
+    """
+    Runs of terminal states per outcome. Ids of zero-probability paths are
+    unreachable from s=0, so a run may span them: only reachable terminals matter.
+    """
+    def __init__(self):
+        self.runs = {"win": [], "lose": []}
+        self.last = None  # (outcome, id) of the previous terminal
+
+    def add(self, sid, outcome):
+        runs = self.runs.setdefault(outcome, [])
+        if self.last and self.last[0] == outcome and runs:
+            runs[-1][1] = sid
         else:
-            remainder = Decimal("1") - running
-            norm_items.append((pid, remainder, desc))
+            runs.append([sid, sid])
+        self.last = (outcome, sid)
 
-    max_state = max(p["id"] for p in nz)
-    branches_text = emit_branches_fixed(norm_items)
-    loops = "\n".join([f"  [] s={p['id']} -> (s'={p['id']});" for p in nz])
+    def guard(self, outcome):
+        runs = self.runs.get(outcome)
+        return " | ".join(range_guard(lo, hi) for lo, hi in runs) if runs else "false"
 
-    win_states  = [str(p["id"]) for p in nz if p["outcome"] == "win"]
-    lose_states = [str(p["id"]) for p in nz if p["outcome"] == "lose"]
-    win_label  = " | ".join([f"s={w}" for w in win_states]) if win_states else "false"
-    lose_label = " | ".join([f"s={l}" for l in lose_states]) if lose_states else "false"
-
-    prism = f"""dtmc
+def _spool(records):
+    """
+    First pass: probabilities (for normalize_units), state bound and label runs.
+    Lists are reused as-is; one-shot iterators have their (id, outcome) pairs
+    spooled to a temp file so only the probability array stays in RAM.
+    Probabilities come back as a float64 array, or as the exact values when
+    every one is an int/Fraction.
+    """
+    import tempfile
+    from array import array
+    spool = None
+    if iter(records) is records:
+        spool = tempfile.TemporaryFile("w+")
+    probs, exact, max_state = array("d"), [], 0
+    labels = _LabelRuns()
+    for r in records:
+        if r["prob"] > 0:
+            p = r["prob"]
+            if exact is not None and isinstance(p, numbers.Rational):
+                exact.append(p)
+            else:
+                exact = None
+            probs.append(float(p))
+            max_state = max(max_state, r["id"])
+            labels.add(r["id"], r["outcome"])
+            if spool is not None:
+                spool.write(f"{r['id']} {r['outcome']}\n")
+    if spool is not None:
+        spool.seek(0)
+        source = ({"id": int(i), "outcome": o} for i, o in (ln.split() for ln in spool))
+    else:
+        source = (r for r in records if r["prob"] > 0)
+    return source, (exact if exact is not None else np.frombuffer(probs)), max_state, labels, spool
+
+def write_prism(paths, out, model_name="paths_embedded"):
+    """
+    Stream the DTMC for 'paths' (records as from parse_dump / path_records) to the
+    file handle 'out' in chunks of CHUNK_LINES lines. Terminal self-loops are one
+    command and labels are range guards (s>=1 & s<=230), so nothing proportional
+    to the model size is built as a single string.
+    """
+    source, probs, max_state, labels, spool = _spool(paths)
+    n = len(probs)
+    if not n:
+        raise ValueError("All paths have zero probability.")
+    try:
+        units = normalize_units(probs)
+        del probs
+        out.write(f"""dtmc
 
 module {model_name}
   // s=0 is start. Terminals are the path indices that had non-zero probability.
   s : [0..{max_state}] init 0;
 
   [] s=0 ->
-{branches_text}
-{loops}
+""")
+        buf = []
+        for i, (r, u) in enumerate(zip(source, units)):
+            buf.append(branch_line(i, n, r["id"], format_units(int(u)), r["outcome"]))
+            if len(buf) >= CHUNK_LINES:
+                out.write("\n".join(buf) + "\n")
+                buf = []
+        if buf:
+            out.write("\n".join(buf) + "\n")
+    finally:
+        if spool is not None:
+            spool.close()
+
+    out.write(f"""  [] s>0 -> (s'=s);
 endmodule
 
-label "win"  = {win_label};
-label "lose" = {lose_label};
-"""
-    return prism
+label "win"  = {labels.guard("win")};
+label "lose" = {labels.guard("lose")};
+""")
+
+def write_prism_lumped(paths, out, model_name="paths_embedded", mapping_out=None, outcome_of=None):
+    """
+    Compact mode: paths are lumped by outcome before emission, so the model has
+    one terminal state per distinct outcome instead of one per path (3 states
+    instead of 255 for birthday23). Enough for P=? [ F "win" ]-style properties.
+
+    outcome_of: record -> label name (default: record["outcome"], i.e. win/lose).
+    mapping_out: optional file handle; receives a CSV of path_id,state,outcome,prob
+                 so every original path stays traceable to its lumped state.
+    """
+    outcome_of = outcome_of or (lambda r: r["outcome"])
+    if mapping_out is not None:
+        mapping_out.write("path_id,state,outcome,prob\n")
+
+    states = {}  # outcome -> [state id, [probs]]
+    for r in paths:
+        if r["prob"] <= 0:
+            continue
+        label = outcome_of(r)
+        if label not in states:
+            states[label] = [len(states) + 1, []]
+        states[label][1].append(r["prob"])
+        if mapping_out is not None:
+            mapping_out.write(f"{r['id']},{states[label][0]},{label},{r['prob']}\n")
+    if not states:
+        raise ValueError("All paths have zero probability.")
+
+    # exact sums stay exact; float masses are fsum'd
+    masses = [sum(ps, Fraction(0)) if all(isinstance(p, numbers.Rational) for p in ps) else math.fsum(ps)
+              for _, ps in states.values()]
+    units = normalize_units(masses)
+    n = len(states)
+    lines = [branch_line(i, n, sid, format_units(int(u)), label, kind="outcome")
+             for i, ((label, (sid, _)), u) in enumerate(zip(states.items(), units))]
+
+    label_names = list(states) + [l for l in ("win", "lose") if l not in states]
+    label_lines = "\n".join(
+        f'label "{l}" = {"s=" + str(states[l][0]) if l in states else "false"};' for l in label_names)
+    out.write(f"""dtmc
+
+module {model_name}
+  // s=0 is start. Terminals are the distinct outcomes; see the path mapping for per-path detail.
+  s : [0..{n}] init 0;
+
+  [] s=0 ->
+""")
+    out.write("\n".join(lines) + "\n")
+    out.write(f"""  [] s>0 -> (s'=s);
+endmodule
+
+{label_lines}
+""")
+
+def write_prism_explicit(paths, basename="paths_embedded"):
+    """
+    Same DTMC as write_prism in PRISM's explicit import format:
+      <basename>.tra  transitions ('states transitions' header, then 'src dst prob')
+      <basename>.sta  state values of s (the path id), state 0 is the start
+      <basename>.lab  init / deadlock / win / lose
+    States are numbered compactly (0 = start, 1..n = terminals in path order), so
+    zero-probability paths take no state. Rows come from NumPy arrays and are
+    written in CHUNK_LINES blocks (faster than savetxt's per-row formatting).
+    Load with: prism -importtrans x.tra -importstates x.sta -importlabels x.lab -dtmc
+    (or prism_solver.load_explicit). Returns the three file names.
+    """
+    source, probs, _, _, spool = _spool(paths)
+    n = len(probs)
+    if not n:
+        raise ValueError("All paths have zero probability.")
+    try:
+        units = normalize_units(probs)
+        del probs
+        pids = np.empty(n, dtype=np.int64)
+        win = np.empty(n, dtype=bool)
+        for i, r in enumerate(source):
+            pids[i] = r["id"]
+            win[i] = r["outcome"] == "win"
+    finally:
+        if spool is not None:
+            spool.close()
+
+    def rows(f, line, *cols):
+        for k in range(0, n, CHUNK_LINES):
+            f.write("".join(line(*vals) for vals in zip(*(c[k:k + CHUNK_LINES].tolist() for c in cols))))
+
+    terms = np.arange(1, n + 1)
+    files = tuple(f"{basename}.{ext}" for ext in ("tra", "sta", "lab"))
+    with open(files[0], "w") as f:
+        f.write(f"{n + 1} {2 * n}\n")
+        rows(f, lambda t, u: f"0 {t} {format_units(u)}\n", terms, units)
+        rows(f, lambda t: f"{t} {t} 1\n", terms)
+    with open(files[1], "w") as f:
+        f.write("(s)\n0:(0)\n")
+        rows(f, lambda t, pid: f"{t}:({pid})\n", terms, pids)
+    with open(files[2], "w") as f:
+        f.write('0="init" 1="deadlock" 2="win" 3="lose"\n0: 0\n')
+        rows(f, lambda t, lab: f"{t}: {lab}\n", terms, np.where(win, 2, 3))
+    return files
+
+def poly_expr(coeffs, param="p"):
+    """PRISM expression for a polynomial (coefficients lowest order first), in Horner form."""
+    coeffs = [float(c) for c in coeffs]
+    while len(coeffs) > 1 and coeffs[-1] == 0.0:
+        coeffs.pop()
+    expr = f"{coeffs[-1]:.15g}"
+    for c in reversed(coeffs[:-1]):
+        expr = f"{param}*({expr})" if c == 0.0 else f"{c:.15g} + {param}*({expr})"
+    return expr
+
+def write_prism_parametric(paths, out, param="p", model_name="paths_param"):
+    """
+    Parametric DTMC for path probabilities that are polynomials in one parameter
+    (records whose "prob" is a numpy Polynomial, a coefficient array, or anything
+    with a prism_expr(param) method such as pathbranch.parametric.BernsteinPoly,
+    e.g. from a ParametricPaths via parametric_records). The model
+    declares 'const double <param>;' and every branch weight is its polynomial,
+    so one file covers a whole sweep: prism ... -const p=0.1:0.1:0.9, or
+    prism_solver.load_prism(text, constants={'p': 0.3}).
+    """
+    items = []
+    labels = _LabelRuns()
+    for r in paths:
+        coeffs = getattr(r["prob"], "coef", r["prob"])
+        if not np.any(coeffs):
+            continue
+        expr = r["prob"].prism_expr(param) if hasattr(r["prob"], "prism_expr") else poly_expr(coeffs, param)
+        items.append((r["id"], f"({expr})", r["outcome"]))
+        labels.add(r["id"], r["outcome"])
+    if not items:
+        raise ValueError("All paths have zero probability.")
+    n = len(items)
+    out.write(f"""dtmc
+
+const double {param};
+
+module {model_name}
+  // s=0 is start. Branch weights are polynomials in {param}; terminals are path indices.
+  s : [0..{max(pid for pid, _, _ in items)}] init 0;
+
+  [] s=0 ->
+""")
+    out.write("\n".join(branch_line(i, n, pid, expr, outcome) for i, (pid, expr, outcome) in enumerate(items)) + "\n")
+    out.write(f"""  [] s>0 -> (s'=s);
+endmodule
+
+label "win"  = {labels.guard("win")};
+label "lose" = {labels.guard("lose")};
+""")
+
+def parametric_records(param_paths):
+    """path_records for a ParametricPaths: "prob" is each path's polynomial (see ParametricPaths.items)."""
+    return path_records(list(param_paths.items()))
+
+def build_prism(paths, model_name="paths_embedded"):
+    """Whole model as a string (small models); see write_prism for streaming to a file."""
+    import io
+    out = io.StringIO()
+    write_prism(paths, out, model_name=model_name)
+    return out.getvalue()
 
 
 # ============================
 # 5) Run
 # ============================
 if __name__ == "__main__":
-    parsed = parse_dump(birthday23)
-    prism_text = build_prism(parsed, model_name="paths_embedded")
-    with open("paths_embedded.prism", "w") as f:
-        f.write(prism_text)
+    from pathbranch.limitedpathmin import build_birthday_paths
+    from pathbranch.limitpathfix import ProbabilityCalculator
+
+    # birthday23: people b0..b22 over 365 days, straight from the calculator
+    K, S = 22, 365
+    variables = [f"b{i}" for i in range(K + 1)]
+    calc = ProbabilityCalculator(variables, {v: range(S) for v in variables})
+    probs = calc.calculate_path_probabilities(build_birthday_paths(K))
+    parsed = export_path_probabilities(probs, "paths_embedded.prism", model_name="paths_embedded")
 
-    p_win  = sum(p["prob"] for p in parsed if p["outcome"] == "win")
-    p_lose = sum(p["prob"] for p in parsed if p["outcome"] == "lose")
+    p_win  = math.fsum(p["prob"] for p in parsed if p["outcome"] == "win")
+    p_lose = math.fsum(p["prob"] for p in parsed if p["outcome"] == "lose")
 
     print("Wrote paths_embedded.prism")
-    print(f"P(win)  = {p_win} ({p_win.normalize()})")
-    print(f"P(lose) = {p_lose} ({p_lose.normalize()})")
+    print(f"P(win)  = {p_win:.15f}")
+    print(f"P(lose) = {p_lose:.15f}")
 
 
 #
@@ -4,7 +4,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
 from condition_tree_builder import ConditionTreeBuilder
-from path_extractor import extract_paths
+from symbolic_store import extract_paths_with_store
 
 example_code = """
 
@@ -63,7 +63,9 @@ def monty_hall(choice, door_switch):
 builder = ConditionTreeBuilder()
 condition_tree = builder.build_tree(example_code)
 
-paths = extract_paths(condition_tree)
+# Assignments such as host_door = 1 and choice = 3 are substituted into the
+# later conditions, so every path only mentions choice and car_door.
+paths = extract_paths_with_store(condition_tree, bindings={'door_switch': 1})
 
 print("\nExtracted Paths:")
 for path in paths:
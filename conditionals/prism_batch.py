@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Check the same PCTL properties against a whole parameter sweep of generated models.
+
+- Each sweep point is turned into PRISM text (build_prism on the in-memory path
+  probabilities, or any callable returning model text).
+- Properties are parsed once per model vocabulary and reused.
+- Models whose state graph matches an earlier point (same variables, guards,
+  assignments, labels, rewards; only update probabilities differ) reuse that
+  point's explored state space, so only the transition weights are rebuilt.
+- Results go to a CSV table: one row per point, one column per property.
+
+Usage:
+  python prism_batch.py --family birthday --values 10,20,22,30 -pf 'P=? [ F "win" ]'
+  python prism_batch.py --family pi --values 50,100,200 --props ../prism-examples/montyprop
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import csv
+import time
+import argparse
+
+import numpy as np
+
+from conditionals.prism_solver import PrismModel, parse_property
+
+# ============================
+# 1) Property lists
+# ============================
+def load_properties(path):
+    """One property per non-blank line (the prism-examples/*prop layout); '//' comments skipped."""
+    with open(path) as f:
+        return [ln.strip() for ln in f if ln.strip() and not ln.strip().startswith("//")]
+
+
+# ============================
+# 2) Batch checker
+# ============================
+class BatchChecker:
+    def __init__(self, properties, method="solve"):
+        self.properties = list(properties)
+        self.method = method
+        self._spaces = {}     # model signature -> StateSpace
+        self._parsed = {}     # (property, model vocabulary) -> Property
+        self.reused = 0
+        self.built = 0
+
+    def _property(self, prop, dtmc):
+        key = (prop, tuple(sorted(dtmc._names.items())))
+        if key not in self._parsed:
+            self._parsed[key] = parse_property(prop, dtmc)
+        return self._parsed[key]
+
+    def check_text(self, text, constants=None):
+        """Values of every property for one model text; returns (results, info)."""
+        t0 = time.perf_counter()
+        model = PrismModel(text, constants=constants)
+        sig = model.signature()
+        space = self._spaces.get(sig)
+        if space is None:
+            space = model.explore()
+            self._spaces[sig] = space
+            self.built += 1
+            reused = False
+        else:
+            self.reused += 1
+            reused = True
+        dtmc = model.build(space)
+        results = {p: self._property(p, dtmc).evaluate(dtmc, method=self.method) for p in self.properties}
+        info = {"states": dtmc.n, "transitions": dtmc.P.nnz, "reused": reused,
+                "seconds": round(time.perf_counter() - t0, 6)}
+        return results, info
+
+    def sweep(self, points, make_model, out=None):
+        """
+        points: iterable of dicts of parameters;
+        make_model: point -> PRISM text, or (text, constants) for models with undefined consts.
+        Writes a CSV table to 'out' (path or file handle) when given; returns the rows.
+        """
+        rows = []
+        for point in points:
+            made = make_model(**point)
+            text, constants = made if isinstance(made, tuple) else (made, None)
+            results, info = self.check_text(text, constants=constants)
+            rows.append({**point, **results, **info})
+        if out is not None:
+            write_table(rows, out)
+        return rows
+
+
+def write_table(rows, out):
+    if not rows:
+        return
+    fields = list(rows[0])
+    if isinstance(out, str):
+        with open(out, "w", newline="") as f:
+            write_table(rows, f)
+        return
+    w = csv.DictWriter(out, fieldnames=fields)
+    w.writeheader()
+    w.writerows(rows)
+
+
+# ============================
+# 3) Model families (sweep point -> PRISM text)
+# ============================
+def birthday_model(K, S=365):
+    """build_prism for the unrolled birthday chain over b0..bK with S equally likely days."""
+    from conditionals.SymPrismIntegration import build_prism, path_records
+    from pathbranch.limitedpathmin import build_birthday_paths
+    from pathbranch.limitpathfix import ProbabilityCalculator
+
+    variables = [f"b{i}" for i in range(K + 1)]
+    calc = ProbabilityCalculator(variables, {v: range(S) for v in variables})
+    return build_prism(list(path_records(calc.calculate_path_probabilities(build_birthday_paths(K)))))
+
+
+def pi_model(R):
+    """build_prism for the quarter-circle test on the (R+1)x(R+1) grid (pathrunner EX_PI)."""
+    from conditionals.SymPrismIntegration import build_prism, path_records
+    from conditionals.pathrunner import EX_PI, ConditionTreeBuilder, extract_paths
+    from pathbranch.limitpathfix import ProbabilityCalculator
+
+    code = EX_PI.replace("R2", str(R * R))
+    domain = {"x": range(R + 1), "y": range(R + 1)}
+    calc = ProbabilityCalculator(["x", "y"], domain)
+    paths = extract_paths(ConditionTreeBuilder().build_tree(code))
+    return build_prism(list(path_records(calc.calculate_path_probabilities(paths))))
+
+
+def freivalds_model(N, MOD=2, seed=0):
+    """
+    build_prism for one Freivalds round on a seeded N x N instance with AB != C
+    (one entry of C perturbed). 'win' is the false positive (the check returns True).
+    """
+    from conditionals.SymPrismIntegration import build_prism, path_records
+    from conditionals.pathrunner import ConditionTreeBuilder, extract_paths
+    from pathbranch.modmain import generate_freivalds_code
+    from pathbranch.limitpathfix import ProbabilityCalculator
+
+    rng = np.random.default_rng(seed)
+    A = rng.integers(0, MOD, size=(N, N))
+    B = rng.integers(0, MOD, size=(N, N))
+    C = (A @ B) % MOD
+    C[0, 0] = (C[0, 0] + 1) % MOD
+    code, variables = generate_freivalds_code(A, B, C, N, MOD=MOD)
+    calc = ProbabilityCalculator(variables, {v: [0, 1] for v in variables})
+    paths = extract_paths(ConditionTreeBuilder().build_tree(code))
+    records = list(path_records(calc.calculate_path_probabilities(paths)))
+    for r in records:
+        r["outcome"] = "win" if "return True" in r["path"][-1][1] else "lose"
+    return build_prism(records)
+
+
+FAMILIES = {
+    "birthday": (birthday_model, "K"),
+    "pi": (pi_model, "R"),
+    "freivalds": (freivalds_model, "N"),
+}
+
+
+# ============================
+# 4) Run
+# ============================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Batch PCTL checks over a parameter sweep")
+    ap.add_argument("--family", choices=sorted(FAMILIES), required=True)
+    ap.add_argument("--values", required=True, help="comma-separated sweep values, e.g. 10,20,22")
+    ap.add_argument("-pf", dest="props", action="append", default=[], help="property (repeatable)")
+    ap.add_argument("--props-file", action="append", default=[], help="property file, one per line")
+    ap.add_argument("--extra", default="", help="fixed parameters, e.g. S=366 or MOD=3")
+    ap.add_argument("--out", default="batch_results.csv")
+    args = ap.parse_args()
+
+    make, param = FAMILIES[args.family]
+    fixed = {k: int(v) for k, v in (kv.split("=") for kv in filter(None, args.extra.split(",")))}
+    props = args.props + [p for path in args.props_file for p in load_properties(path)]
+    if not props:
+        props = ['P=? [ F "win" ]']
+
+    checker = BatchChecker(props)
+    points = [{param: int(v), **fixed} for v in args.values.split(",")]
+    rows = checker.sweep(points, make, out=args.out)
+    for row in rows:
+        print(row)
+    print(f"State spaces built: {checker.built}, reused: {checker.reused}; table -> {args.out}")
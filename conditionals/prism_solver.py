@@ -0,0 +1,739 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the PRISM model checker on the DTMC subset we generate.
+
+- Parses: dtmc, const (int/double/bool, defined or passed in), formula, global
+  and module variables ([lo..hi] / bool), single or multiple modules with
+  unlabelled or synchronised [action] commands, labels and state rewards.
+- Builds the reachable state space with vectorised NumPy evaluation and keeps
+  transitions as a SciPy sparse matrix.
+- Answers P=? [ F phi ], P=? [ F<=k phi ], P=? [ phi U psi ], R{"r"}=? [ F phi ]
+  (and P~b / R~b bound checks) at the initial state via sparse linear solves,
+  or value iteration with method="iter".
+
+Usage:
+  python prism_solver.py model.prism -pf 'P=? [ F "win" ]'
+  python prism_solver.py model.tra -pf 'P=? [ F "win" ]'   (explicit .tra/.sta/.lab)
+"""
+
+import re
+import argparse
+from functools import reduce
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# ============================
+# 1) Tokenizer
+# ============================
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*)
+  | (?P<num>\d+\.(?!\.)\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|\d+(?:[eE][-+]?\d+)?)
+  | (?P<str>"[^"]*")
+  | (?P<primed>[A-Za-z_][A-Za-z_0-9]*')
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<op><=>|=>|->|<=|>=|!=|\.\.|=\?|[=<>+\-*/()\[\]{}?:&|!,;])
+""", re.VERBOSE)
+
+
+def tokenize(text):
+    out, pos = [], 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            raise SyntaxError(f"Unexpected character {text[pos]!r} at offset {pos}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind != "ws":
+            out.append((kind, m.group(kind)))
+    out.append(("eof", ""))
+    return out
+
+
+# ============================
+# 2) Expressions -> vectorised Python source
+# ============================
+def _and(*xs):
+    return reduce(np.logical_and, xs)
+
+def _or(*xs):
+    return reduce(np.logical_or, xs)
+
+EXPR_HELPERS = {
+    "np": np, "_and": _and, "_or": _or, "_not": np.logical_not,
+    "_ite": np.where, "_min": np.minimum, "_max": np.maximum,
+    "_floor": np.floor, "_ceil": np.ceil, "_pow": np.power, "_mod": np.mod,
+    "_log": np.log,
+}
+FUNCS = {"min": "_min", "max": "_max", "floor": "_floor", "ceil": "_ceil",
+         "pow": "_pow", "mod": "_mod", "log": "_log"}
+
+# binding powers (PRISM precedence, loosest first)
+BINARY = {
+    "<=>": (2, lambda a, b: f"np.equal(np.asarray({a}, dtype=bool), np.asarray({b}, dtype=bool))"),
+    "=>": (3, lambda a, b: f"_or(_not({a}), {b})"),
+    "|": (4, lambda a, b: f"_or({a}, {b})"),
+    "&": (5, lambda a, b: f"_and({a}, {b})"),
+    "=": (7, lambda a, b: f"({a} == {b})"),
+    "!=": (7, lambda a, b: f"({a} != {b})"),
+    "<": (7, lambda a, b: f"({a} < {b})"),
+    "<=": (7, lambda a, b: f"({a} <= {b})"),
+    ">": (7, lambda a, b: f"({a} > {b})"),
+    ">=": (7, lambda a, b: f"({a} >= {b})"),
+    "+": (8, lambda a, b: f"({a} + {b})"),
+    "-": (8, lambda a, b: f"({a} - {b})"),
+    "*": (9, lambda a, b: f"({a} * {b})"),
+    "/": (9, lambda a, b: f"({a} / {b})"),
+}
+
+
+class Parser:
+    def __init__(self, tokens, names):
+        """names: name -> Python source (variables map to themselves, constants to literals)."""
+        self.toks = tokens
+        self.i = 0
+        self.names = names
+
+    # ---------- token helpers ----------
+    def peek(self, k=0):
+        return self.toks[self.i + k]
+
+    def next(self):
+        tok = self.toks[self.i]
+        self.i += 1
+        return tok
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] in ("op", "name"):
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, value):
+        tok = self.next()
+        if tok[1] != value:
+            raise SyntaxError(f"Expected {value!r}, got {tok[1]!r}")
+        return tok
+
+    # ---------- expressions ----------
+    def expr(self, min_bp=0):
+        left = self.unary()
+        while True:
+            kind, tok = self.peek()
+            if kind == "op" and tok == "?" and min_bp <= 1:
+                self.next()
+                a = self.expr(1)
+                self.expect(":")
+                b = self.expr(1)
+                left = f"_ite({left}, {a}, {b})"
+                continue
+            if kind != "op" or tok not in BINARY:
+                return left
+            bp, build = BINARY[tok]
+            if bp < min_bp or bp == min_bp:
+                return left
+            self.next()
+            if tok in ("|", "&"):
+                # flatten a | b | c ... into one call; long label guards would nest too deep otherwise
+                args = [left, self.expr(bp)]
+                while self.peek() == ("op", tok):
+                    self.next()
+                    args.append(self.expr(bp))
+                left = f"{'_or' if tok == '|' else '_and'}({', '.join(args)})"
+                continue
+            right = self.expr(bp)
+            left = build(left, right)
+
+    def unary(self):
+        kind, tok = self.next()
+        if kind == "op" and tok == "!":
+            return f"_not({self.expr(6)})"
+        if kind == "op" and tok == "-":
+            return f"(-{self.expr(10)})"
+        if kind == "op" and tok == "(":
+            inner = self.expr()
+            self.expect(")")
+            return f"({inner})"
+        if kind == "num":
+            return tok
+        if kind == "str":
+            label = tok.strip('"')
+            if f'"{label}"' not in self.names:
+                raise NameError(f"Unknown label {label!r}")
+            return self.names[f'"{label}"']
+        if kind == "name":
+            if tok == "true":
+                return "True"
+            if tok == "false":
+                return "False"
+            if tok in FUNCS and self.peek()[1] == "(":
+                self.next()
+                args = [self.expr()]
+                while self.accept(","):
+                    args.append(self.expr())
+                self.expect(")")
+                return f"{FUNCS[tok]}({', '.join(args)})"
+            if tok not in self.names:
+                raise NameError(f"Unknown identifier {tok!r}")
+            return self.names[tok]
+        raise SyntaxError(f"Unexpected token {tok!r}")
+
+
+# ============================
+# 3) Model structure
+# ============================
+class Command:
+    def __init__(self, module, action, guard, updates):
+        self.module = module
+        self.action = action      # None for unlabelled
+        self.guard = guard        # Python source
+        self.updates = updates    # [(prob_src, {var: value_src})]
+
+
+class PrismModel:
+    """Parsed PRISM DTMC (the subset above)."""
+
+    def __init__(self, text, constants=None):
+        self.constants = {}
+        self.variables = []       # [(name, lo, hi, init)]
+        self.commands = []
+        self.labels = {}          # name -> Python source
+        self.rewards = {}         # name -> [(guard_src, value_src)]
+        self._names = {}
+        self._given = dict(constants or {})
+        toks = tokenize(text)
+        # formulas and labels may mention variables declared further down
+        for k in range(len(toks) - 2):
+            if toks[k][0] == "name" and toks[k + 1][1] == ":" and toks[k + 2][1] in ("[", "bool"):
+                self._names[toks[k][1]] = toks[k][1]
+        self._parse(toks)
+
+    # ---------- helpers ----------
+    def _const_eval(self, src):
+        value = eval(src, dict(EXPR_HELPERS), {})
+        return value.item() if hasattr(value, "item") else value
+
+    def _parser(self, toks, i):
+        p = Parser(toks, self._names)
+        p.i = i
+        return p
+
+    # ---------- top level ----------
+    def _parse(self, toks):
+        p = self._parser(toks, 0)
+        module = None
+        while p.peek()[0] != "eof":
+            kind, tok = p.peek()
+            if tok in ("dtmc", "probabilistic"):
+                p.next()
+            elif tok in ("mdp", "ctmc", "pta", "nondeterministic", "stochastic"):
+                raise NotImplementedError(f"Only DTMCs are supported, got {tok!r}")
+            elif tok == "const":
+                p.next()
+                if p.peek()[1] in ("int", "double", "bool"):
+                    ctype = p.next()[1]
+                else:
+                    ctype = "int"
+                name = p.next()[1]
+                if p.accept("="):
+                    value = self._const_eval(p.expr())
+                elif name in self._given:
+                    value = self._given[name]
+                else:
+                    raise ValueError(f"Undefined constant {name!r}: pass it in constants=")
+                if name in self._given:
+                    value = self._given[name]
+                value = {"int": int, "double": float, "bool": bool}[ctype](value)
+                self.constants[name] = value
+                self._names[name] = repr(value)
+                p.expect(";")
+            elif tok == "formula":
+                p.next()
+                name = p.next()[1]
+                p.expect("=")
+                self._names[name] = f"({p.expr()})"
+                p.expect(";")
+            elif tok == "label":
+                p.next()
+                name = p.next()[1].strip('"')
+                p.expect("=")
+                self.labels[name] = f"({p.expr()})"
+                self._names[f'"{name}"'] = self.labels[name]
+                p.expect(";")
+            elif tok == "global":
+                p.next()
+                self._var_decl(p)
+            elif tok == "module":
+                p.next()
+                module = p.next()[1]
+                if p.peek()[1] == "=":
+                    raise NotImplementedError("Module renaming is not supported")
+            elif tok == "endmodule":
+                p.next()
+                module = None
+            elif tok == "rewards":
+                p.next()
+                name = p.next()[1].strip('"') if p.peek()[0] == "str" else ""
+                self._rewards(p, name)
+            elif module is not None and tok == "[":
+                self._command(p, module)
+            elif module is not None and kind == "name" and p.peek(1)[1] == ":":
+                self._var_decl(p)
+            else:
+                raise SyntaxError(f"Unexpected token {tok!r}")
+
+    def _var_decl(self, p):
+        name = p.next()[1]
+        p.expect(":")
+        if p.accept("bool"):
+            lo, hi = 0, 1
+        else:
+            p.expect("[")
+            lo = int(self._const_eval(p.expr()))
+            p.expect("..")
+            hi = int(self._const_eval(p.expr()))
+            p.expect("]")
+        init = lo
+        if p.accept("init"):
+            init = int(self._const_eval(p.expr()))
+        p.expect(";")
+        self.variables.append((name, lo, hi, init))
+        self._names[name] = name
+
+    def _assignments(self, p):
+        assign = {}
+        if p.accept("true"):
+            return assign
+        while True:
+            p.expect("(")
+            kind, tok = p.next()
+            if kind != "primed":
+                raise SyntaxError(f"Expected x' in update, got {tok!r}")
+            p.expect("=")
+            assign[tok[:-1]] = p.expr()
+            p.expect(")")
+            if not p.accept("&"):
+                return assign
+
+    def _update(self, p):
+        # '(x'=..)' or 'true' starts a probability-1 update; otherwise 'prob : assignments'
+        if p.peek()[1] == "true" or (p.peek()[1] == "(" and p.peek(1)[0] == "primed"):
+            return "1.0", self._assignments(p)
+        prob = p.expr()
+        p.expect(":")
+        return prob, self._assignments(p)
+
+    def _command(self, p, module):
+        p.expect("[")
+        action = None
+        if p.peek()[1] != "]":
+            action = p.next()[1]
+        p.expect("]")
+        guard = p.expr()
+        p.expect("->")
+        updates = [self._update(p)]
+        while p.accept("+"):
+            updates.append(self._update(p))
+        p.expect(";")
+        self.commands.append(Command(module, action, guard, updates))
+
+    def _rewards(self, p, name):
+        items = []
+        while not p.accept("endrewards"):
+            if p.peek()[1] == "[":
+                raise NotImplementedError("Transition rewards are not supported")
+            guard = p.expr()
+            p.expect(":")
+            value = p.expr()
+            p.expect(";")
+            items.append((guard, value))
+        self.rewards[name] = items
+
+    # ---------- synchronisation ----------
+    def global_commands(self):
+        """Unlabelled commands as-is; [a] commands combined across the modules that use a."""
+        out = [(c.guard, c.updates) for c in self.commands if c.action is None]
+        actions = sorted({c.action for c in self.commands if c.action is not None})
+        for a in actions:
+            by_module = {}
+            for c in self.commands:
+                if c.action == a:
+                    by_module.setdefault(c.module, []).append(c)
+            combos = [[]]
+            for cmds in by_module.values():
+                combos = [prev + [c] for prev in combos for c in cmds]
+            for combo in combos:
+                guard = "_and(" + ", ".join(c.guard for c in combo) + ")" if len(combo) > 1 else combo[0].guard
+                updates = [("1.0", {})]
+                for c in combo:
+                    updates = [(f"({p1}) * ({p2})", {**u1, **u2}) for p1, u1 in updates for p2, u2 in c.updates]
+                out.append((guard, updates))
+        return out
+
+    # ---------- state space ----------
+    def signature(self):
+        """Everything that shapes the state graph; update probabilities are left out."""
+        cmds = tuple((g, tuple(tuple(sorted(asg.items())) for _, asg in ups)) for g, ups in self.global_commands())
+        return (tuple(self.variables), cmds, tuple(sorted(self.labels.items())),
+                tuple((k, tuple(v)) for k, v in sorted(self.rewards.items())))
+
+    def explore(self):
+        """Reachable states and the (command, update) edge pattern; no weights yet."""
+        names = [v[0] for v in self.variables]
+        lo = np.array([v[1] for v in self.variables], dtype=np.int64)
+        hi = np.array([v[2] for v in self.variables], dtype=np.int64)
+        radix = hi - lo + 1
+        stride = np.ones(len(names), dtype=np.int64)
+        for k in range(len(names) - 2, -1, -1):
+            stride[k] = stride[k + 1] * radix[k + 1]
+
+        def decode(codes):
+            return {n: (codes // stride[k]) % radix[k] + lo[k] for k, n in enumerate(names)}
+
+        def encode(vals):
+            return sum((vals[n] - lo[k]) * stride[k] for k, n in enumerate(names))
+
+        compiled = []
+        for guard, updates in self.global_commands():
+            compiled.append((compile(guard, "<guard>", "eval"),
+                             [{v: compile(e, "<upd>", "eval") for v, e in asg.items()} for _, asg in updates]))
+
+        init = np.array([sum((v[3] - v[1]) * stride[k] for k, v in enumerate(self.variables))], dtype=np.int64)
+        index = {int(init[0]): 0}
+        codes = [init]
+        edges = {}                # (command, update) -> [(src codes, dst codes)]
+        enabled_parts, dead_parts = [], []
+        frontier = init
+        genv = dict(EXPR_HELPERS)
+        while len(frontier):
+            env = decode(frontier)
+            n = len(frontier)
+            masks = [np.broadcast_to(np.asarray(eval(g, genv, env), dtype=bool), (n,)) for g, _ in compiled]
+            enabled = np.sum(masks, axis=0) if masks else np.zeros(n, dtype=np.int64)
+            enabled_parts.append((frontier, enabled))
+            new_codes = []
+            for ci, ((g, updates), mask) in enumerate(zip(compiled, masks)):
+                if not mask.any():
+                    continue
+                rows = np.nonzero(mask)[0]
+                sub = {k: v[rows] for k, v in env.items()}
+                for ui, asg in enumerate(updates):
+                    nxt = dict(sub)
+                    for var, code in asg.items():
+                        val = np.broadcast_to(np.asarray(eval(code, genv, sub)), (len(rows),))
+                        nxt[var] = np.rint(val).astype(np.int64)
+                    for k, nme in enumerate(names):
+                        bad = (nxt[nme] < lo[k]) | (nxt[nme] > hi[k])
+                        if bad.any():
+                            raise ValueError(f"Update takes {nme} out of range [{lo[k]}..{hi[k]}]")
+                    dst = encode(nxt)
+                    edges.setdefault((ci, ui), []).append((frontier[rows], dst))
+                    new_codes.append(dst)
+            # deadlocks get a self-loop, as PRISM does by default
+            if (enabled == 0).any():
+                dead_parts.append(frontier[enabled == 0])
+            fresh = []
+            if new_codes:
+                for c in np.unique(np.concatenate(new_codes)).tolist():
+                    if c not in index:
+                        index[c] = len(index)
+                        fresh.append(c)
+            frontier = np.array(fresh, dtype=np.int64)
+            if len(frontier):
+                codes.append(frontier)
+
+        codes = np.concatenate(codes)
+        lookup = np.vectorize(index.__getitem__, otypes=[np.int64])
+        space = StateSpace()
+        space.names = names
+        space.n = len(codes)
+        space.edges = {key: (lookup(np.concatenate([s for s, _ in parts])),
+                             lookup(np.concatenate([d for _, d in parts])))
+                       for key, parts in edges.items()}
+        space.enabled = np.zeros(space.n, dtype=np.int64)
+        for fr, en in enabled_parts:
+            space.enabled[lookup(fr)] = en
+        space.dead = lookup(np.concatenate(dead_parts)) if dead_parts else np.zeros(0, dtype=np.int64)
+
+        env = decode(codes)
+        space.states = np.stack([env[n] for n in names], axis=1) if names else np.zeros((space.n, 0), dtype=np.int64)
+        space.labels = {k: np.broadcast_to(np.asarray(eval(v, genv, env), dtype=bool), (space.n,)).copy()
+                        for k, v in self.labels.items()}
+        space.rewards = {}
+        for name, items in self.rewards.items():
+            r = np.zeros(space.n)
+            for guard, value in items:
+                mask = np.broadcast_to(np.asarray(eval(guard, genv, env), dtype=bool), (space.n,))
+                r += np.where(mask, np.broadcast_to(np.asarray(eval(value, genv, env), dtype=float), (space.n,)), 0.0)
+            space.rewards[name] = r
+        return space
+
+    def weights(self, space):
+        """Transition matrix for this model's update probabilities over an explored StateSpace."""
+        genv = dict(EXPR_HELPERS)
+        probs = [[compile(pr, "<prob>", "eval") for pr, _ in updates] for _, updates in self.global_commands()]
+        src_all, dst_all, w_all = [space.dead], [space.dead], [np.ones(len(space.dead))]
+        for (ci, ui), (src, dst) in space.edges.items():
+            sub = {n: space.states[src, k] for k, n in enumerate(space.names)}
+            prob = np.broadcast_to(np.asarray(eval(probs[ci][ui], genv, sub), dtype=float), (len(src),))
+            src_all.append(src)
+            dst_all.append(dst)
+            w_all.append(prob / space.enabled[src])
+        P = sp.csr_matrix((np.concatenate(w_all), (np.concatenate(src_all), np.concatenate(dst_all))),
+                          shape=(space.n, space.n))
+        P.sum_duplicates()
+        return P
+
+    def build(self, space=None):
+        """Explore reachable states (or reuse 'space' from a model with the same signature); return a DTMC."""
+        space = space if space is not None else self.explore()
+        # labels are looked up from the state arrays, so property sources stay model-independent
+        names = {k: v for k, v in self._names.items() if not k.startswith('"')}
+        return DTMC(self.weights(space), init=0, labels=space.labels, rewards=space.rewards,
+                    var_names=space.names, states=space.states, expr_names=names)
+
+
+class StateSpace:
+    """Reachable states of a PrismModel: decoded values, edge pattern per (command, update), labels, rewards."""
+
+
+# ============================
+# 4) DTMC + property checking
+# ============================
+class DTMC:
+    def __init__(self, P, init=0, labels=None, rewards=None, var_names=None, states=None, expr_names=None):
+        self.P = sp.csr_matrix(P)
+        self.n = self.P.shape[0]
+        self.init = init
+        self.labels = labels or {}
+        self.rewards = rewards or {}
+        self.var_names = var_names or []
+        self.states = states
+        self._names = expr_names or {}
+        for k in self.labels:
+            self._names.setdefault(f'"{k}"', f"__label_{re.sub(r'[^0-9A-Za-z_]', '_', k)}")
+
+    # ---------- state sets ----------
+    def _env(self):
+        env = {f"__label_{re.sub(r'[^0-9A-Za-z_]', '_', k)}": v for k, v in self.labels.items()}
+        if self.states is not None:
+            env.update({n: self.states[:, k] for k, n in enumerate(self.var_names)})
+        return env
+
+    def states_where(self, toks_or_src):
+        src = toks_or_src
+        val = eval(src, dict(EXPR_HELPERS), self._env())
+        return np.broadcast_to(np.asarray(val, dtype=bool), (self.n,)).copy()
+
+    def _backward_reach(self, target, allowed):
+        """States in 'allowed' (or target) that can reach 'target' with positive probability."""
+        reach = target.copy()
+        frontier = target.copy()
+        while frontier.any():
+            pre = (self.P @ frontier.astype(float)) > 0
+            new = pre & allowed & ~reach
+            reach |= new
+            frontier = new
+        return reach
+
+    # ---------- reachability ----------
+    def prob_until(self, phi, psi, method="solve", tol=1e-12, max_iter=100000):
+        """Vector of P(phi U psi) for every state."""
+        can = self._backward_reach(psi, phi)
+        x = psi.astype(float)
+        maybe = can & ~psi
+        if not maybe.any():
+            return x
+        idx = np.nonzero(maybe)[0]
+        A = self.P[idx][:, idx]
+        b = np.asarray(self.P[idx][:, np.nonzero(psi)[0]].sum(axis=1)).ravel()
+        if method == "solve":
+            x[idx] = spla.spsolve((sp.identity(len(idx), format="csc") - A).tocsc(), b)
+        else:
+            y = np.zeros(len(idx))
+            for _ in range(max_iter):
+                y_new = A @ y + b
+                if np.max(np.abs(y_new - y)) < tol:
+                    y = y_new
+                    break
+                y = y_new
+            x[idx] = y
+        return np.clip(x, 0.0, 1.0)
+
+    def prob_bounded_eventually(self, target, k):
+        x = target.astype(float)
+        for _ in range(k):
+            x = np.where(target, 1.0, self.P @ x)
+        return x
+
+    def reward_reach(self, target, reward, method="solve", tol=1e-12, max_iter=100000):
+        """Expected cumulative state reward until reaching 'target' (inf where not almost sure)."""
+        p = self.prob_until(np.ones(self.n, dtype=bool), target, method=method)
+        sure = p >= 1.0 - 1e-10
+        x = np.full(self.n, np.inf)
+        x[target] = 0.0
+        idx = np.nonzero(sure & ~target)[0]
+        if len(idx):
+            A = self.P[idx][:, idx]
+            r = reward[idx]
+            if method == "solve":
+                x[idx] = spla.spsolve((sp.identity(len(idx), format="csc") - A).tocsc(), r)
+            else:
+                y = np.zeros(len(idx))
+                for _ in range(max_iter):
+                    y_new = A @ y + r
+                    if np.max(np.abs(y_new - y)) < tol * max(1.0, np.max(np.abs(y_new))):
+                        y = y_new
+                        break
+                    y = y_new
+                x[idx] = y
+        return x
+
+    # ---------- properties ----------
+    def check(self, prop, method="solve"):
+        """Evaluate one property at the initial state; returns float (=?) or bool (bound)."""
+        return parse_property(prop, self).evaluate(self, method=method)
+
+
+class Property:
+    def __init__(self, kind, op, bound, path, reward=None):
+        self.kind = kind          # 'P' or 'R'
+        self.op = op              # '=?' or comparison
+        self.bound = bound
+        self.path = path          # ('F', target_src, k) or ('U', phi_src, psi_src)
+        self.reward = reward
+
+    def values(self, dtmc, method="solve"):
+        if self.kind == "P":
+            if self.path[0] == "F":
+                target = dtmc.states_where(self.path[1])
+                if self.path[2] is not None:
+                    return dtmc.prob_bounded_eventually(target, self.path[2])
+                return dtmc.prob_until(np.ones(dtmc.n, dtype=bool), target, method=method)
+            phi, psi = dtmc.states_where(self.path[1]), dtmc.states_where(self.path[2])
+            return dtmc.prob_until(phi, psi, method=method)
+        if self.path[0] != "F" or self.path[2] is not None:
+            raise NotImplementedError("Only R=? [ F phi ] is supported")
+        name = self.reward if self.reward is not None else next(iter(dtmc.rewards))
+        return dtmc.reward_reach(dtmc.states_where(self.path[1]), dtmc.rewards[name], method=method)
+
+    def evaluate(self, dtmc, method="solve"):
+        v = float(self.values(dtmc, method=method)[dtmc.init])
+        if self.op == "=?":
+            return v
+        return {"<": v < self.bound, "<=": v <= self.bound, ">": v > self.bound, ">=": v >= self.bound}[self.op]
+
+
+def parse_property(text, dtmc):
+    """Parse P=? [ F phi ], P=? [ F<=k phi ], P=? [ phi U psi ], R{"r"}=? [ F phi ] and bound forms."""
+    toks = tokenize(text)
+    p = Parser(toks, dtmc._names)
+    kind = p.next()[1]
+    if kind not in ("P", "R"):
+        raise SyntaxError(f"Unsupported property {text!r}")
+    reward = None
+    if kind == "R" and p.accept("{"):
+        reward = p.next()[1].strip('"')
+        p.expect("}")
+    op_tok = p.next()[1]
+    bound = None
+    if op_tok == "=?":
+        op = "=?"
+    elif op_tok == "=" and p.accept("?"):
+        op = "=?"
+    else:
+        op = op_tok
+        bound = float(p.next()[1])
+    p.expect("[")
+    if p.accept("F"):
+        k = None
+        if p.accept("<="):
+            k = int(p.next()[1])
+        path = ("F", p.expr(), k)
+    else:
+        phi = p.expr()
+        p.expect("U")
+        path = ("U", phi, p.expr())
+    p.expect("]")
+    return Property(kind, op, bound, path, reward)
+
+
+def load_prism(path_or_text, constants=None):
+    """Parse a .prism file (or model text) and build its DTMC."""
+    text = path_or_text
+    if "\n" not in path_or_text and not path_or_text.lstrip().startswith("dtmc"):
+        with open(path_or_text) as f:
+            text = f.read()
+    return PrismModel(text, constants=constants).build()
+
+
+def load_explicit(basename):
+    """
+    Build a DTMC from PRISM explicit files: <basename>.tra (required), .sta and
+    .lab when present (e.g. from SymPrismIntegration.write_prism_explicit).
+    The initial state is the one labelled "init" (state 0 without a .lab).
+    """
+    import os
+    basename = basename[:-4] if basename.endswith(".tra") else basename
+    with open(basename + ".tra") as f:
+        n = int(f.readline().split()[0])
+        tra = np.loadtxt(f, ndmin=2)
+    P = sp.csr_matrix((tra[:, 2], (tra[:, 0].astype(np.int64), tra[:, 1].astype(np.int64))), shape=(n, n))
+
+    var_names, states = [], None
+    if os.path.exists(basename + ".sta"):
+        with open(basename + ".sta") as f:
+            var_names = [v.strip() for v in f.readline().strip().strip("()").split(",") if v.strip()]
+            body = re.sub(r"[:(),]", " ", f.read().replace("true", "1").replace("false", "0"))
+        rows = np.array(body.split(), dtype=np.int64).reshape(-1, len(var_names) + 1)
+        states = np.zeros((n, len(var_names)), dtype=np.int64)
+        states[rows[:, 0]] = rows[:, 1:]
+
+    labels, init = {}, 0
+    if os.path.exists(basename + ".lab"):
+        with open(basename + ".lab") as f:
+            names = dict(re.findall(r'(\d+)="([^"]*)"', f.readline()))
+            members = {k: [] for k in names}
+            for ln in f:
+                st, _, rest = ln.partition(":")
+                for k in rest.split():
+                    members[k].append(int(st))
+        for k, name in names.items():
+            mask = np.zeros(n, dtype=bool)
+            mask[members[k]] = True
+            if name == "init":
+                init = int(np.argmax(mask)) if mask.any() else 0
+            elif name != "deadlock":
+                labels[name] = mask
+    return DTMC(P, init=init, labels=labels, var_names=var_names, states=states,
+                expr_names={v: v for v in var_names})
+
+
+def parse_constants(spec):
+    """'N=10,p=0.5' -> {'N': 10, 'p': 0.5}"""
+    out = {}
+    for item in filter(None, (spec or "").split(",")):
+        k, v = item.split("=")
+        out[k.strip()] = float(v) if any(c in v for c in ".eE") else int(v)
+    return out
+
+
+# ============================
+# 5) Run
+# ============================
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Check PCTL properties on a PRISM DTMC locally")
+    ap.add_argument("model")
+    ap.add_argument("-pf", dest="props", action="append", required=True, help="property, e.g. 'P=? [ F \"win\" ]'")
+    ap.add_argument("-const", default="", help="undefined constants, e.g. N=10,p=0.5")
+    ap.add_argument("--iter", action="store_true", help="value iteration instead of sparse solves")
+    args = ap.parse_args()
+
+    if args.model.endswith(".tra"):
+        dtmc = load_explicit(args.model)
+    else:
+        dtmc = load_prism(args.model, constants=parse_constants(args.const))
+    print(f"States: {dtmc.n}, transitions: {dtmc.P.nnz}")
+    for prop in args.props:
+        print(f"{prop}  ->  {dtmc.check(prop, method='iter' if args.iter else 'solve')}")
@@ -0,0 +1,232 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import ast
+
+from conditionals.SymPrismIntegration import format_units, normalize_units
+from conditionals.condition_tree_builder import ConditionTreeBuilder
+from conditionals.symbolic_store import SymbolicStore
+from pathbranch.limitpathfix import ProbabilityCalculator
+
+NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
+
+# ============================
+# Tree-shaped DTMC from a ConditionTree
+# ============================
+#
+# Instead of one s=0 star over all path probabilities (SymPrismIntegration.build_prism),
+# every visit of a condition node becomes a DTMC state whose two transitions carry
+# P(cond | conditions so far). Terminals are shared per return value.
+#
+# Two visits of the same node are merged into one state when they would behave
+# identically from there on: same pending continuation, same symbolic store, and
+# the same conditions on the variables the rest of the program can observe.
+# Inputs are independent, so a condition whose variables never connect to the
+# remaining program cannot change any later branch probability and is dropped
+# from the merge key.
+
+def _names(expr):
+    return set(NAME_RE.findall(expr))
+
+
+def _tree_nodes(root):
+    """All ConditionNodes reachable from root, in DFS order."""
+    out, stack, seen = [], [root], set()
+    while stack:
+        node = stack.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        out.append(node)
+        stack.extend([node.next_condition, node.false_branch, node.true_branch])
+    return out
+
+
+def _subtree_names(node, cache):
+    """Names mentioned by conditions/statements from 'node' on (branches and sequel)."""
+    if node is None:
+        return frozenset()
+    if id(node) in cache:
+        return cache[id(node)]
+    names = _names(node.condition)
+    for s in node.true_statements + node.false_statements:
+        names |= _names(s)
+    names |= _subtree_names(node.true_branch, cache)
+    names |= _subtree_names(node.false_branch, cache)
+    names |= _subtree_names(node.next_condition, cache)
+    cache[id(node)] = frozenset(names)
+    return cache[id(node)]
+
+
+class TreeModel:
+    def __init__(self, root, calc, bindings=None):
+        self.root = root
+        self.calc = calc
+        self.bindings = bindings
+        self.node_index = {id(n): k for k, n in enumerate(_tree_nodes(root))}
+        self._names_cache = {}
+        self.states = {}        # merge key -> state id
+        self.state_node = {}    # state id -> tree node index (None for terminals)
+        self.transitions = {}   # state id -> [(prob, target)]
+        self.terminals = {}     # return value (str) -> state id
+
+    # ---------- Merge keys ----------
+    def _relevant_givens(self, givens, names):
+        """Givens connected (through shared variables) to the names still observable."""
+        live = set(names)
+        kept, rest = [], list(givens)
+        changed = True
+        while changed:
+            changed = False
+            for g in list(rest):
+                if _names(g) & live:
+                    kept.append(g)
+                    rest.remove(g)
+                    live |= _names(g)
+                    changed = True
+        return frozenset(kept)
+
+    def _state(self, node, cont, store, givens):
+        names = set()
+        for n in (node,) + cont:
+            names |= _subtree_names(n, self._names_cache)
+        for var, expr in store.env.items():
+            if var in names:
+                names |= _names(ast.unparse(expr))
+        env_key = tuple(sorted((k, ast.unparse(v)) for k, v in store.env.items() if k in names))
+        key = (id(node), tuple(id(c) for c in cont), env_key,
+               self._relevant_givens(givens, names & self.calc.varset))
+        if key not in self.states:
+            sid = len(self.states) + len(self.terminals) + 1
+            self.states[key] = sid
+            self.state_node[sid] = self.node_index[id(node)]
+            self._pending.append((sid, node, cont, store, givens))
+        return self.states[key]
+
+    def _terminal(self, value):
+        if value not in self.terminals:
+            sid = len(self.states) + len(self.terminals) + 1
+            self.terminals[value] = sid
+            self.state_node[sid] = None
+            self.transitions[sid] = []
+        return self.terminals[value]
+
+    # ---------- Probabilities ----------
+    def _prob(self, cond, givens):
+        if givens:
+            return self.calc.compute_conditional_probability(cond, " and ".join(givens))
+        return self.calc.compute_probability(cond)
+
+    def _continue(self, cont, store, givens):
+        """Target for falling off the end of a block: next pending node, or the 'none' terminal."""
+        cont = tuple(c for c in cont if c is not None)
+        if not cont:
+            return [(1.0, self._terminal("none"))]
+        return [(1.0, self._state(cont[0], cont[1:], store, givens))]
+
+    def _return(self, expr, givens):
+        is_const, value = SymbolicStore().constant_value(expr)
+        if is_const:
+            return [(1.0, self._terminal(str(int(value)) if isinstance(value, bool) else str(value)))]
+        p = self._prob(expr, givens)
+        return [(p, self._terminal("1")), (1.0 - p, self._terminal("0"))]
+
+    def _branch(self, node, cont, store, givens, outcome):
+        stmts = node.true_statements if outcome else node.false_statements
+        sub = node.true_branch if outcome else node.false_branch
+        bstore = store.copy()
+        for s in stmts:
+            rewritten = bstore.rewrite_statement(s).strip()
+            if rewritten.startswith("return"):
+                return self._return(rewritten[len("return"):].strip() or "None", givens)
+            bstore.assign(s)
+        if sub is not None:
+            return [(1.0, self._state(sub, (node.next_condition,) + cont, bstore, givens))]
+        return self._continue((node.next_condition,) + cont, bstore, givens)
+
+    # ---------- Build ----------
+    def build(self):
+        self._pending = []
+        self.start = self._state(self.root, (), SymbolicStore(self.bindings), ())
+        while self._pending:
+            sid, node, cont, store, givens = self._pending.pop()
+            is_const, value = store.constant_value(node.condition)
+            if is_const:
+                out = self._branch(node, cont, store, givens, bool(value))
+            else:
+                cond = store.substitute(node.condition)
+                p = self._prob(cond, givens)
+                out = []
+                if p > 0:
+                    out += [(p * q, t) for q, t in self._branch(node, cont, store, givens + (cond,), True)]
+                if p < 1:
+                    neg = f"not ({cond})"
+                    out += [((1 - p) * q, t) for q, t in self._branch(node, cont, store, givens + (neg,), False)]
+            merged = {}
+            for q, t in out:
+                if q > 0:
+                    merged[t] = merged.get(t, 0.0) + q
+            self.transitions[sid] = [(q, t) for t, q in sorted(merged.items())]
+        return self
+
+    # ---------- Emit ----------
+    def write(self, out, model_name="paths_tree"):
+        n_states = len(self.states) + len(self.terminals)
+        out.write(f"""dtmc
+
+module {model_name}
+  // one state per (merged) condition-node visit; terminals per return value
+  s : [0..{n_states}] init {self.start};
+
+""")
+        nodes = _tree_nodes(self.root)
+        for sid in sorted(self.transitions):
+            succ = self.transitions[sid]
+            if not succ:
+                out.write(f"  [] s={sid} -> (s'={sid});\n")
+                continue
+            k = self.state_node[sid]
+            comment = f"  // {nodes[k].condition}" if k is not None else ""
+            # largest-remainder units, so each row sums to exactly 1 and no weight goes negative
+            units = normalize_units([q for q, _ in succ])
+            rhs = " + ".join(f"{format_units(u)} : (s'={t})" for u, (_, t) in zip(units, succ))
+            out.write(f"  [] s={sid} -> {rhs};{comment}\n")
+        out.write("endmodule\n\n")
+
+        for value, sid in self.terminals.items():
+            out.write(f'label "ret_{re.sub(r"[^0-9A-Za-z_]", "_", value)}" = s={sid};\n')
+        win = self.terminals.get("1")
+        lose = [sid for v, sid in self.terminals.items() if v != "1"]
+        out.write(f'label "win" = {"s=" + str(win) if win else "false"};\n')
+        out.write(f'label "lose" = {" | ".join(f"s={x}" for x in lose) or "false"};\n')
+        # one label per tree node, for PCTL queries about intermediate branches
+        by_node = {}
+        for sid, k in self.state_node.items():
+            if k is not None:
+                by_node.setdefault(k, []).append(sid)
+        for k, sids in sorted(by_node.items()):
+            out.write(f'label "node_{k}" = {" | ".join(f"s={x}" for x in sorted(sids))};  // {nodes[k].condition}\n')
+
+
+def build_prism_tree(code, variables, domain, pmf=None, bindings=None, model_name="paths_tree"):
+    """PRISM text for the tree-shaped DTMC of 'code' (see TreeModel)."""
+    import io
+    root = ConditionTreeBuilder().build_tree(code)
+    calc = ProbabilityCalculator(variables, domain, pmf=pmf)
+    out = io.StringIO()
+    TreeModel(root, calc, bindings).build().write(out, model_name=model_name)
+    return out.getvalue()
+
+
+# ============================
+# Run
+# ============================
+if __name__ == "__main__":
+    from conditionals.pathrunner import EX_MONTY, MONTY_VARS, MONTY_DOMAIN
+
+    prism_text = build_prism_tree(EX_MONTY, MONTY_VARS, MONTY_DOMAIN, model_name="monty_tree")
+    with open("paths_tree.prism", "w") as f:
+        f.write(prism_text)
+    print(prism_text)
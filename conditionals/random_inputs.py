@@ -0,0 +1,276 @@
+import ast
+import re
+import warnings
+from collections import defaultdict
+
+# ---------- Random input discovery ----------
+#
+# Finds the random draws in a program's source and derives, for every sampled
+# variable, its exact support and pmf:
+#
+#   x = random.randint(a, b)        -> uniform on a..b
+#   x = random.randrange(a, b, s)   -> uniform on range(a, b, s)
+#   x = ran.randint(a, b)           -> 'random', 'ran' or any alias imported in the code
+#   x = sample_uniform(a, b)        -> uniform on a..b (pWhile sampler)
+#   x = random.choice([..])         -> uniform over the listed values
+#   x = 0.1 * random.randint(0, 9)  -> pushforward of the draw through the expression
+#   if random.random() < p:         -> Bernoulli(p) over the two constants
+#       a = 0                          assigned to the same name
+#   else:
+#       a = 1
+#
+# The result is a (variables, domain, pmf) triple ready for ProbabilityCalculator.
+# A draw whose arguments use a name with no value (a parameter without a
+# default and no binding) is left out with a warning naming the parameter.
+
+NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
+
+UNIFORM_SAMPLERS = ('sample_uniform',)
+RANDOM_MODULES = ('random', 'ran')  # snippets usually omit their imports
+
+
+def _random_aliases(tree):
+    """Names bound to the random module (RANDOM_MODULES plus imported aliases), and names imported from it."""
+    modules, funcs = set(RANDOM_MODULES), {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for a in node.names:
+                if a.name == 'random':
+                    modules.add(a.asname or a.name)
+        elif isinstance(node, ast.ImportFrom) and node.module == 'random':
+            for a in node.names:
+                funcs[a.asname or a.name] = a.name
+    return modules, funcs
+
+
+def _constants_env(tree, bindings):
+    """Module-level constants and function defaults, overridden by explicit bindings."""
+    env = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                env[node.targets[0].id] = ast.literal_eval(node.value)
+            except (ValueError, SyntaxError):
+                pass
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            args = node.args.args
+            for arg, default in zip(args[len(args) - len(node.args.defaults):], node.args.defaults):
+                try:
+                    env.setdefault(arg.arg, ast.literal_eval(default))
+                except (ValueError, SyntaxError):
+                    pass
+    env.update(bindings or {})
+    return env
+
+
+class RandomInputFinder:
+    def __init__(self, code, bindings=None):
+        self.tree = ast.parse(code)
+        self.modules, self.funcs = _random_aliases(self.tree)
+        self.env = _constants_env(self.tree, bindings)
+        self.variables = []
+        self.pmf = {}
+        self.unresolved = {}  # source of a skipped draw -> the unbound name it needs
+
+    def _unresolved(self, source, err):
+        self.unresolved[source] = err.name
+        warnings.warn(f"Skipping random input '{source}': '{err.name}' has no value; "
+                      f"pass it in bindings, e.g. {{'{err.name}': ...}}", stacklevel=3)
+
+    # ---------- Recognizers ----------
+    def _sampler_name(self, call):
+        f = call.func
+        if isinstance(f, ast.Attribute) and isinstance(f.value, ast.Name) and f.value.id in self.modules:
+            return f.attr
+        if isinstance(f, ast.Name):
+            if f.id in self.funcs:
+                return self.funcs[f.id]
+            if f.id in UNIFORM_SAMPLERS:
+                return f.id
+        return None
+
+    def _eval(self, node):
+        return eval(compile(ast.Expression(node), "<arg>", "eval"), {}, dict(self.env))
+
+    def _call_support(self, call):
+        """Return a list of equally likely values for a recognized sampler call, else None."""
+        name = self._sampler_name(call)
+        if name is None:
+            return None
+        args = [self._eval(a) for a in call.args]
+        if name in ('randint', 'sample_uniform'):
+            return list(range(args[0], args[1] + 1))
+        if name == 'randrange':
+            return list(range(*args))
+        if name == 'choice':
+            return list(args[0])
+        return None
+
+    def _bernoulli_test(self, test):
+        """Match 'random.random() < p' (or 'p > random.random()'); return p or None."""
+        if not (isinstance(test, ast.Compare) and len(test.ops) == 1):
+            return None
+        left, op, right = test.left, test.ops[0], test.comparators[0]
+        if isinstance(op, ast.Gt):
+            left, right, op = right, left, ast.Lt()
+        if not isinstance(op, ast.Lt):
+            return None
+        if isinstance(left, ast.Call) and self._sampler_name(left) == 'random' and not left.args:
+            try:
+                return float(self._eval(right))
+            except NameError as e:
+                self._unresolved(ast.unparse(test), e)
+        return None
+
+    # ---------- Discovery ----------
+    def _add(self, name, weighted):
+        pmf = defaultdict(float)
+        for value, w in weighted:
+            pmf[value] += w
+        if name not in self.pmf:
+            self.variables.append(name)
+        self.pmf[name] = dict(sorted(pmf.items()))
+
+    def _visit_assign(self, node):
+        if not (len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)):
+            return
+        calls = [c for c in ast.walk(node.value) if isinstance(c, ast.Call) and self._sampler_name(c)]
+        if len(calls) != 1:
+            return
+        call = calls[0]
+        name = node.targets[0].id
+        try:
+            support = self._call_support(call)
+            if not support:
+                return
+            if node.value is call:
+                self._add(name, [(v, 1 / len(support)) for v in support])
+                return
+            # Push the draw through the surrounding expression, e.g. 0.1 * random.randint(0, 9)
+            expr = ast.unparse(node.value).replace(ast.unparse(call), "__draw__", 1)
+            weighted = []
+            for v in support:
+                value = eval(expr, {}, dict(self.env, __draw__=v))
+                weighted.append((round(value, 12) if isinstance(value, float) else value, 1 / len(support)))
+        except NameError as e:
+            self._unresolved(ast.unparse(node), e)
+            return
+        self._add(name, weighted)
+
+    def _visit_if(self, node):
+        p = self._bernoulli_test(node.test)
+        if p is None:
+            return False
+        branches = []
+        for block in (node.body, node.orelse):
+            if not (len(block) == 1 and isinstance(block[0], ast.Assign)
+                    and len(block[0].targets) == 1 and isinstance(block[0].targets[0], ast.Name)):
+                return False
+            try:
+                branches.append((block[0].targets[0].id, ast.literal_eval(block[0].value)))
+            except (ValueError, SyntaxError):
+                return False
+        (name_t, val_t), (name_f, val_f) = branches
+        if name_t != name_f:
+            return False
+        self._add(name_t, [(val_t, p), (val_f, 1 - p)])
+        return True
+
+    def find(self):
+        handled = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.If) and self._visit_if(node):
+                handled.update(id(n) for n in node.body + node.orelse)
+            elif isinstance(node, ast.Assign) and id(node) not in handled:
+                self._visit_assign(node)
+        return self.variables, self.pmf
+
+
+def discover_random_inputs(code, bindings=None, paths=None):
+    """
+    Return (variables, domain, pmf) for the random inputs sampled in 'code'.
+
+    bindings: values for parameters/constants used in sampler arguments (e.g. {'N': 365}).
+    paths: optional extracted paths; when given, variables never mentioned in a
+           condition or a path's statements (e.g. 'return y == 1') are dropped,
+           since enumerating them only multiplies the work.
+
+    pmf is None when every variable is uniform, so the calculator keeps its
+    plain counting path; otherwise it holds the full product pmf.
+    """
+    variables, pmf = RandomInputFinder(code, bindings).find()
+
+    if paths is not None:
+        used = set()
+        for path in paths:
+            for cond, stmts in path:
+                if cond != 'Statements':
+                    used.update(NAME_RE.findall(cond))
+                else:
+                    for st in (stmts if isinstance(stmts, (list, tuple)) else [stmts]):
+                        used.update(NAME_RE.findall(st))
+        variables = [v for v in variables if v in used]
+
+    domain = {v: list(pmf[v]) for v in variables}
+    pmf = {v: pmf[v] for v in variables}
+    uniform = all(len({round(w, 15) for w in pmf[v].values()}) == 1 for v in variables)
+    return variables, domain, (None if uniform else pmf)
+
+
+# -------------------- Demo --------------------
+if __name__ == "__main__":
+    VON_NEUMANN = """
+import random
+def von_neumann_fair_coin(p=0.8):
+    while True:
+        if random.random() < p :
+            a = 0
+        else:
+            a = 1
+        if random.random() < p :
+            b = 0
+        else :
+            b = 1
+        if a == 0 and b == 1:
+            return 0
+        elif a == 1 and b == 0:
+            return 1
+        else :
+            return -1
+"""
+    MONTY = """
+import random
+def monty_hall(choice, door_switch):
+    car_door = random.randint(1, 3)
+    host_door = None
+    if choice == car_door:
+        return not door_switch
+"""
+    WALK = """
+def step(prob_step_left):
+    X = 0.1 * random.randint(0,9)
+    unused = random.randint(1, 100)
+    if X < prob_step_left:
+        return -1
+"""
+    ALIAS = """
+def pick(n):
+    x = ran.randint(1, 3)
+    y = random.randint(1, n)
+    if x < y:
+        return 1
+"""
+    for label, code, kw in (("von_neumann", VON_NEUMANN, {}),
+                            ("monty", MONTY, {}),
+                            ("randomwalk", WALK, {'paths': [[('X < prob_step_left', 'True')]]}),
+                            ("alias, n unbound (warns, y skipped)", ALIAS, {}),
+                            ("alias, n bound", ALIAS, {'bindings': {'n': 4}}),
+                            ("y only in a return", ALIAS.replace("x < y", "x == 1").replace("return 1", "return y == 1"),
+                             {'bindings': {'n': 2},
+                              'paths': [[('x == 1', 'True'), ('Statements', ['return y == 1'])]]})):
+        variables, domain, pmf = discover_random_inputs(code, **kw)
+        print(f"== {label} ==")
+        print("variables:", variables)
+        print("domain:", domain)
+        print("pmf:", pmf, "\n")
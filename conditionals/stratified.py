@@ -0,0 +1,187 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+import math
+import time
+
+import numpy as np
+
+from conditionals.vector_kernel import VectorKernel
+from pathbranch.limitpathfix import ProbabilityCalculator
+from pathbranch.vector_eval import VECTOR_HELPERS, compile_vectorized
+
+# ============================
+# Stratified sampling by top-level branch
+# ============================
+#
+# The first if/elif/.../else chain of a branch-only program partitions the
+# inputs into strata (c1; not c1 and c2; ...; else). Their masses w_h are
+# exact and cheap (ProbabilityCalculator on the branch conditions), so only
+# the outcome within each stratum is simulated:
+#   estimate = sum_h w_h * mean_h,   Var = sum_h w_h^2 * s_h^2 / n_h
+# Draws for a stratum come from the ordinary input sampler, keeping those that
+# fall in it. Trials are allocated proportionally (n_h ~ w_h) or Neyman-optimally
+# (n_h ~ w_h * s_h, s_h from a pilot run whose draws are kept).
+
+def top_level_strata(code, names):
+    """Conditions of the first if/elif chain whose tests only use 'names' (one per stratum, else last)."""
+    tree = ast.parse(code)
+    funcs = [n for n in tree.body if isinstance(n, ast.FunctionDef)]
+    body = funcs[0].body if funcs else tree.body
+    for node in body:
+        if not isinstance(node, ast.If):
+            continue
+        used = {n.id for n in ast.walk(node.test) if isinstance(n, ast.Name)}
+        if not used <= set(names):
+            continue
+        tests = []
+        while True:
+            tests.append(ast.unparse(node.test))
+            if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+                node = node.orelse[0]
+            else:
+                break
+        strata, earlier = [], []
+        for t in tests + [None]:
+            parts = [f"not ({e})" for e in earlier] + ([f"({t})"] if t else [])
+            strata.append(" and ".join(parts) if parts else "True")
+            earlier.append(t)
+        return strata
+    raise ValueError("No top-level if/elif chain over the random inputs")
+
+
+class StratifiedSampler:
+    MAX_BATCH = 1 << 20  # rejection draws per round; a tiny stratum loops instead of allocating n / mass
+
+    def __init__(self, code, variables=None, domain=None, pmf=None, bindings=None):
+        """Same arguments as VectorKernel; the strata come from the first if/elif chain."""
+        self.kernel = VectorKernel(code, variables, domain, pmf, bindings)
+        k = self.kernel
+        full_pmf = None
+        if k.pmf:
+            full_pmf = {v: k.pmf.get(v) or {x: 1 / len(k.domain[v]) for x in k.domain[v]} for v in k.variables}
+        calc = ProbabilityCalculator(k.variables, k.domain, pmf=full_pmf)
+        # a redrawn name in a branch test is not its first draw: such a chain cannot be a stratum
+        names = [v for v in k.variables if v not in k.redrawn] + list(k.constants)
+        self.conditions = top_level_strata(code, names)
+        env = dict(k.constants)
+        self.masses = [calc.compute_probability(self._bind(c, env)) for c in self.conditions]
+        self._codes = [compile_vectorized(c) for c in self.conditions]
+
+    @staticmethod
+    def _bind(cond, env):
+        # constants (function defaults, bindings) are substituted so the calculator only sees inputs
+        tree = ast.parse(cond, mode="eval")
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id in env:
+                node.__class__, node.value = ast.Constant, env[node.id]
+        return ast.unparse(tree)
+
+    def _draw_stratum(self, rng, h, n):
+        """Outcome indicators (return value == 1) of n draws inside stratum h."""
+        k = self.kernel
+        out, have = [], 0
+        batch = min(max(256, int(1.2 * n / self.masses[h])), self.MAX_BATCH)
+        while have < n:
+            env = k.sample(rng, batch)
+            inside = np.broadcast_to(np.asarray(eval(self._codes[h], dict(VECTOR_HELPERS), env), dtype=bool), (batch,))
+            m = int(inside.sum())
+            if m:
+                sub = {name: (x[inside] if isinstance(x, np.ndarray) and x.shape == (batch,) else x)
+                       for name, x in env.items()}
+                out.append(k.run(sub, m) == 1)
+                have += m
+        return np.concatenate(out)[:n]
+
+    def simulate(self, trials, seed=None, allocation="proportional", pilot=0.1):
+        """
+        Stratified estimate of P(return 1) with 'trials' draws in total.
+        allocation: 'proportional' or 'neyman' (a 'pilot' fraction is spent estimating s_h,
+        with one pseudo-hit and one pseudo-miss per stratum so no stratum gets s_h = 0).
+        Returns the simulate() fields plus 'plain_stderr' (same trials, no strata),
+        'variance_ratio' (plain / stratified) and per-stratum 'strata' rows.
+        """
+        t0 = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        live = [h for h, w in enumerate(self.masses) if w > 0]
+        draws = {h: np.zeros(0, dtype=bool) for h in live}
+        budget = trials
+        if allocation == "neyman":
+            per = max(2, int(pilot * trials / len(live)))
+            for h in live:
+                draws[h] = self._draw_stratum(rng, h, per)
+            budget = trials - per * len(live)
+            # add-one estimate of s_h: a pilot with no hits (or no misses) in a rare
+            # stratum would otherwise get s_h = 0 and never be sampled again
+            rate = {h: (draws[h].sum() + 1) / (len(draws[h]) + 2) for h in live}
+            weight = {h: self.masses[h] * math.sqrt(rate[h] * (1 - rate[h])) for h in live}
+        elif allocation == "proportional":
+            weight = {h: self.masses[h] for h in live}
+        else:
+            raise ValueError(f"Unknown allocation: {allocation}")
+        total = sum(weight.values())
+        for h in live:
+            extra = max(int(round(budget * weight[h] / total)), 2 - len(draws[h]), 0)
+            if extra:
+                draws[h] = np.concatenate([draws[h], self._draw_stratum(rng, h, extra)])
+
+        est = sum(self.masses[h] * draws[h].mean() for h in live)
+        var = sum(self.masses[h] ** 2 * draws[h].var(ddof=1) / len(draws[h]) for h in live)
+        used = sum(len(draws[h]) for h in live)
+        plain = est * (1 - est) / used
+        return {
+            "trials": used,
+            "estimate": float(est),
+            "stderr": math.sqrt(var),
+            "plain_stderr": math.sqrt(plain),
+            "variance_ratio": plain / var if var else math.inf,
+            "allocation": allocation,
+            "strata": [{"condition": self.conditions[h], "mass": self.masses[h],
+                        "trials": int(len(draws[h])) if h in draws else 0,
+                        "mean": float(draws[h].mean()) if h in draws else float("nan")}
+                       for h in range(len(self.masses))],
+            "seconds": time.perf_counter() - t0,
+        }
+
+
+# ============================
+# Run: Monty chain from examples/montyc.py
+# ============================
+if __name__ == "__main__":
+    path = os.path.join(os.path.dirname(__file__), '..', 'examples', 'montyc.py')
+    src = open(path).read()
+    fn = next(n for n in ast.parse(src).body if isinstance(n, ast.FunctionDef) and n.name == "monty_hall")
+    monty = ast.get_source_segment(src, fn)
+
+    sampler = StratifiedSampler(monty, variables=['choice'], domain={'choice': [1, 2, 3]})
+    for c, w in zip(sampler.conditions, sampler.masses):
+        print(f"  stratum {w:.4f}: {c}")
+    for allocation in ("proportional", "neyman"):
+        r = sampler.simulate(30_000, seed=1, allocation=allocation)
+        print(f"{allocation:>12}: {r['estimate']:.5f} ± {r['stderr']:.5f} (plain ± {r['plain_stderr']:.5f}, "
+              f"{r['variance_ratio']:.2f}x less variance)  exact 0.66667  "
+              f"n_h={[s['trials'] for s in r['strata']]}")
+
+    # uneven strata: x, y in 1..10, first branch x < 3 then a rare inner event
+    uneven = """import random
+def f():
+    x = random.randint(1, 10)
+    y = random.randint(1, 10)
+    if x < 3:
+        if y == 1:
+            return 1
+        return 0
+    elif x < 9:
+        if y < 6:
+            return 1
+        return 0
+    else:
+        return 1
+"""
+    sampler = StratifiedSampler(uneven)
+    for allocation in ("proportional", "neyman"):
+        r = sampler.simulate(30_000, seed=1, allocation=allocation)
+        print(f"{allocation:>12}: {r['estimate']:.5f} ± {r['stderr']:.5f} (plain ± {r['plain_stderr']:.5f})  "
+              f"exact {0.2 * 0.1 + 0.6 * 0.5 + 0.2:.5f}  n_h={[s['trials'] for s in r['strata']]}")
@@ -0,0 +1,218 @@
+import ast
+import copy
+
+# ---------- Symbolic store ----------
+
+def _contains_call(node):
+    """True for right-hand sides like random.randint(..), ran.randrange(..), sample_uniform(..)."""
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Call):
+            return True
+    return False
+
+
+class _Substituter(ast.NodeTransformer):
+    def __init__(self, bindings):
+        self.bindings = bindings
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.bindings:
+            return copy.deepcopy(self.bindings[node.id])
+        return node
+
+
+class _Folder(ast.NodeTransformer):
+    """Collapse sub-expressions whose operands are all constants."""
+
+    @staticmethod
+    def _const(node):
+        return isinstance(node, ast.Constant)
+
+    def _try_eval(self, node):
+        try:
+            value = eval(compile(ast.Expression(node), "<fold>", "eval"), {}, {})
+        except Exception:
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        is_and = isinstance(node.op, ast.And)
+        kept = []
+        for v in node.values:
+            if self._const(v):
+                # True in an 'and' / False in an 'or' is neutral
+                if bool(v.value) == is_and:
+                    continue
+                # False in an 'and' / True in an 'or' decides the whole expression
+                return ast.copy_location(ast.Constant(not is_and), node)
+            kept.append(v)
+        if not kept:
+            return ast.copy_location(ast.Constant(is_and), node)
+        if len(kept) == 1:
+            return kept[0]
+        node.values = kept
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return self._try_eval(node) if self._const(node.operand) else node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if self._const(node.left) and self._const(node.right):
+            return self._try_eval(node)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if self._const(node.left) and all(self._const(c) for c in node.comparators):
+            return self._try_eval(node)
+        return node
+
+
+class SymbolicStore:
+    """
+    Maps program variables to expressions over the true random inputs.
+
+    Assignments seen along a path (e.g. 'choice = 3' or 'host_door = 1') are
+    recorded here, and every later condition is rewritten through the store
+    before it reaches the probability engine, so conditions only mention
+    sampled variables (or parameters that were left unbound).
+    """
+
+    def __init__(self, bindings=None):
+        self.env = {}
+        for name, value in (bindings or {}).items():
+            self.env[name] = ast.parse(repr(value), mode="eval").body
+
+    def copy(self):
+        new = SymbolicStore()
+        new.env = dict(self.env)
+        return new
+
+    # ---------- Expressions ----------
+    def substitute_node(self, expr: str):
+        tree = ast.parse(expr.strip(), mode="eval")
+        tree = _Substituter(self.env).visit(tree)
+        tree = _Folder().visit(tree)
+        return ast.fix_missing_locations(tree).body
+
+    def substitute(self, expr: str) -> str:
+        return ast.unparse(self.substitute_node(expr))
+
+    def constant_value(self, expr: str):
+        """Return (True, value) if expr folds to a constant under the store, else (False, None)."""
+        node = self.substitute_node(expr)
+        if isinstance(node, ast.Constant):
+            return True, node.value
+        return False, None
+
+    # ---------- Statements ----------
+    def assign(self, stmt: str):
+        """Apply one statement (as text) to the store. Non-assignments are ignored."""
+        try:
+            tree = ast.parse(stmt.strip())
+        except SyntaxError:
+            return
+        for node in tree.body:
+            if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+                value = ast.BinOp(left=ast.Name(id=node.target.id, ctx=ast.Load()),
+                                  op=node.op, right=node.value)
+                self._bind([node.target], value)
+            elif isinstance(node, ast.Assign):
+                self._bind(node.targets, node.value)
+            elif isinstance(node, ast.AnnAssign) and node.value is not None:
+                self._bind([node.target], node.value)
+
+    def _bind(self, targets, value):
+        if _contains_call(value):
+            # A fresh draw: the name becomes a random input in its own right
+            rhs = None
+        else:
+            rhs = _Folder().visit(_Substituter(self.env).visit(copy.deepcopy(value)))
+        for target in targets:
+            if isinstance(target, ast.Name):
+                if rhs is None:
+                    self.env.pop(target.id, None)
+                else:
+                    self.env[target.id] = rhs
+            else:
+                # Tuple/attribute/subscript targets: stop tracking what they touch
+                for sub in ast.walk(target):
+                    if isinstance(sub, ast.Name):
+                        self.env.pop(sub.id, None)
+
+    def rewrite_statement(self, stmt: str) -> str:
+        """Rewrite 'return <expr>' through the store; other statements are kept verbatim."""
+        s = stmt.strip()
+        if s.startswith("return ") or s.startswith("return("):
+            expr = s[len("return"):].strip()
+            if expr:
+                return f"return {self.substitute(expr)}"
+        return stmt
+
+
+# ---------- Path extraction with the store threaded through ----------
+
+def _has_return(stmts):
+    return any(s.strip().startswith("return") for s in stmts)
+
+
+def extract_paths_with_store(root, bindings=None):
+    """
+    Extract paths from a ConditionTree, evaluating each condition on the values
+    assigned earlier on the same path.
+
+    bindings: optional dict of non-random parameters to fix (e.g. {'door_switch': 1}).
+
+    Conditions that fold to a constant are dropped from the path, and branches
+    whose constant condition contradicts the outcome are pruned. Sequential ifs
+    at the same level continue every fall-through path, carrying its store.
+    """
+    def walk(node, prefix, store):
+        # returns (returned, fallthrough); each item is (path, store)
+        returned, fallthrough = [], []
+
+        for outcome, stmts, branch in (
+            ("True", node.true_statements, node.true_branch),
+            ("False", node.false_statements, node.false_branch),
+        ):
+            is_const, value = store.constant_value(node.condition)
+            if is_const:
+                if bool(value) != (outcome == "True"):
+                    continue
+                path = list(prefix)
+            else:
+                path = prefix + [(store.substitute(node.condition), outcome)]
+
+            bstore = store.copy()
+            rewritten = []
+            for s in stmts:
+                rewritten.append(bstore.rewrite_statement(s))
+                bstore.assign(s)
+
+            if _has_return(stmts):
+                returned.append((path + [("Statements", rewritten)], bstore))
+            elif branch:
+                r, f = walk(branch, path, bstore)
+                returned += r
+                fallthrough += f
+            else:
+                fallthrough.append((path + [("Statements", rewritten or ["pass"])], bstore))
+
+        if node.next_condition:
+            continued = []
+            for path, pstore in fallthrough:
+                prefix2 = path[:-1] if path and path[-1][0] == "Statements" else path
+                r, f = walk(node.next_condition, prefix2, pstore)
+                returned += r
+                continued += f
+            fallthrough = continued
+
+        return returned, fallthrough
+
+    if not root:
+        return []
+    returned, fallthrough = walk(root, [], SymbolicStore(bindings))
+    return [p for p, _ in returned] + [p for p, _ in fallthrough]
@@ -0,0 +1,204 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+
+import numpy as np
+
+from conditionals.random_inputs import RandomInputFinder, _constants_env
+from pathbranch.vector_eval import VECTOR_HELPERS, vectorize_expr
+
+# ============================
+# Branch-only programs -> batched NumPy kernels
+# ============================
+#
+# The sources the analyzer consumes (pathrunner.EX_MONTY, EX_FREIVALDS, the
+# code from autobdy.gen_birthday_chain_source) are straight-line draws,
+# assignments and if/elif/else chains ending in returns. They are compiled to
+# one Python function over arrays of n trials:
+#   - every draw site is drawn up front as its own array (draws are independent,
+#     so drawing before or at the site gives the same distribution); the first
+#     site of a name is the input 'x', a later site k (a redraw) is the input
+#     'x__k' and becomes x = where(mask, x__k, x) where it stands;
+#   - each statement runs under a boolean mask of the trials that reach it;
+#   - if/elif/else splits the mask with the vectorized test;
+#   - x = e becomes x = where(mask, e, x); return e writes 'out' under the mask
+#     and marks those trials done.
+# Falling off the end returns NaN for that trial.
+
+class _KernelWriter:
+    def __init__(self, skip, redraws=None):
+        self.skip = skip          # ids of statements handled by input sampling
+        self.redraws = redraws or {}  # id of a redraw site -> (name, input array)
+        self.lines = []
+        self.k = 0
+        self.defined = set()
+
+    def _fresh(self, prefix="m"):
+        self.k += 1
+        return f"{prefix}{self.k}"
+
+    def emit(self, line):
+        self.lines.append("    " + line)
+
+    def block(self, stmts, m):
+        stmts = [st for st in stmts
+                 if id(st) not in self.skip and not isinstance(st, (ast.Pass, ast.Import, ast.ImportFrom, ast.Expr))]
+        for i, st in enumerate(stmts):
+            self.stmt(st, m)
+            if i + 1 < len(stmts) and any(isinstance(x, ast.Return) for x in ast.walk(st)):
+                live = self._fresh()
+                self.emit(f"{live} = {m} & ~done")
+                m = live
+
+    def stmt(self, st, m):
+        if id(st) in self.redraws:
+            name, src = self.redraws[id(st)]
+            self.emit(f"{name} = _where({m}, {src}, {name})")
+        elif isinstance(st, ast.Return):
+            value = "np.nan" if st.value is None else vectorize_expr(ast.unparse(st.value))
+            self.emit(f"out = _where({m}, {value}, out)")
+            self.emit(f"done = done | {m}")
+        elif isinstance(st, (ast.Assign, ast.AugAssign)):
+            if isinstance(st, ast.Assign) and len(st.targets) != 1:
+                raise NotImplementedError(f"Unsupported assignment: {ast.unparse(st)}")
+            target = st.target if isinstance(st, ast.AugAssign) else st.targets[0]
+            if not isinstance(target, ast.Name):
+                raise NotImplementedError(f"Unsupported assignment target: {ast.unparse(st)}")
+            if isinstance(st, ast.AugAssign):
+                value = ast.BinOp(left=ast.Name(id=target.id, ctx=ast.Load()), op=st.op, right=st.value)
+            else:
+                value = st.value
+            prev = target.id if target.id in self.defined else "0"
+            self.emit(f"{target.id} = _where({m}, {vectorize_expr(ast.unparse(value))}, {prev})")
+            self.defined.add(target.id)
+        elif isinstance(st, ast.If):
+            c = self._fresh("c")
+            self.emit(f"{c} = _mask({vectorize_expr(ast.unparse(st.test))})")
+            mt, mf = self._fresh(), self._fresh()
+            self.emit(f"{mt} = {m} & {c}")
+            self.block(st.body, mt)
+            if st.orelse:
+                self.emit(f"{mf} = {m} & ~{c}")
+                self.block(st.orelse, mf)
+        else:
+            raise NotImplementedError(f"Not branch-only code: {ast.unparse(st).splitlines()[0]}")
+
+
+class VectorKernel:
+    def __init__(self, code, variables=None, domain=None, pmf=None, bindings=None):
+        """
+        code: branch-only source (optionally inside one function definition).
+        variables/domain/pmf: inputs not drawn in the code (e.g. MONTY_VARS,
+            MONTY_DOMAIN); drawn inputs are discovered as in the analyzer.
+        bindings: constants/parameters (function defaults are picked up too).
+        """
+        tree = ast.parse(code)
+        finder = RandomInputFinder(code, bindings)
+        skip, redraws, drawn_pmf = set(), {}, {}
+        sites = {}  # name -> number of draw sites seen so far
+        handled = set()
+        nodes = [n for n in ast.walk(tree) if isinstance(n, (ast.If, ast.Assign))]
+        for node in sorted(nodes, key=lambda n: (n.lineno, n.col_offset)):
+            if id(node) in handled:
+                continue
+            finder.variables, finder.pmf = [], {}
+            if isinstance(node, ast.If):
+                if not finder._visit_if(node):
+                    continue
+                handled.update(id(n) for n in node.body + node.orelse)
+            else:
+                finder._visit_assign(node)
+            if not finder.variables:
+                continue
+            name = finder.variables[0]
+            k = sites.get(name, 0)
+            sites[name] = k + 1
+            src = name if k == 0 else f"{name}__{k}"
+            drawn_pmf[src] = finder.pmf[name]
+            if k == 0:
+                skip.add(id(node))
+            else:
+                redraws[id(node)] = (name, src)
+        drawn = list(drawn_pmf)
+        self.redrawn = {name for name, k in sites.items() if k > 1}
+        given = [v for v in (variables or []) if v not in drawn]
+        self.variables = list(drawn) + given
+        self.domain = {v: list(drawn_pmf[v]) for v in drawn}
+        self.domain.update({v: list(domain[v]) for v in given})
+        # uniform inputs are drawn with integers(); only weighted ones need their pmf
+        self.pmf = {v: drawn_pmf[v] for v in drawn if len({round(w, 15) for w in drawn_pmf[v].values()}) > 1}
+        self.pmf.update({v: pmf[v] for v in given if pmf and v in pmf})
+        self.constants = _constants_env(tree, bindings)
+
+        funcs = [n for n in tree.body if isinstance(n, ast.FunctionDef)]
+        body = funcs[0].body if funcs else tree.body
+        w = _KernelWriter(skip, redraws)
+        w.defined.update(self.variables)
+        w.block(body, "m0")
+        head = ["def kernel(env, n):"]
+        head += [f"    {name} = env[{name!r}]" for name in list(self.constants) + self.variables]
+        head += ["    done = np.zeros(n, dtype=bool)",
+                 "    out = np.full(n, np.nan)",
+                 "    m0 = np.ones(n, dtype=bool)",
+                 "    _mask = lambda x: np.broadcast_to(np.asarray(x, dtype=bool), (n,))"]
+        self.source = "\n".join(head + w.lines + ["    return out"])
+        ns = dict(VECTOR_HELPERS, np=np)
+        exec(compile(self.source, "<kernel>", "exec"), ns)
+        self._kernel = ns["kernel"]
+
+    def sample(self, rng, n):
+        """Arrays of n independent draws for every input, plus the constants."""
+        env = dict(self.constants)
+        for v in self.variables:
+            values = np.asarray(self.domain[v])
+            if v in self.pmf:
+                w = np.array([self.pmf[v].get(x, 0.0) for x in self.domain[v]], dtype=float)
+                env[v] = values[rng.choice(len(values), size=n, p=w / w.sum())]
+            else:
+                env[v] = values[rng.integers(0, len(values), n)]
+        return env
+
+    def run(self, env, n):
+        """Return values for n given input draws (arrays of length n in 'env')."""
+        return self._kernel(env, n)
+
+    def batch(self, rng, n):
+        """Return values of n simulated runs (NaN where the program returns nothing)."""
+        return self._kernel(self.sample(rng, n), n)
+
+
+def register_kernel(name, code, **kwargs):
+    """Compile 'code' and register it with examples/simulate.py, so simulate(name, trials, seed) runs it."""
+    from examples.simulate import MODELS
+    kernel = VectorKernel(code, **kwargs)
+    MODELS[name] = lambda rng, n: kernel.batch(rng, n)
+    return kernel
+
+
+# ============================
+# Run: simulate vs exact for the analyzer examples
+# ============================
+if __name__ == "__main__":
+    from conditionals.pathrunner import (EX_MONTY, MONTY_VARS, MONTY_DOMAIN, EX_FREIVALDS, FREV_VARS, FREV_DOMAIN,
+                                         ConditionTreeBuilder, ProbabilityCalculator, extract_paths)
+    from examples.autobdy import gen_birthday_chain_source
+    from examples.simulate import simulate
+    from pathbranch.birthday_engine import BirthdayEngine
+
+    def analyzer_win(code, variables, domain):
+        paths = extract_paths(ConditionTreeBuilder().build_tree(code))
+        probs = ProbabilityCalculator(variables, domain).path_probabilities(paths)
+        return sum(p for path, p in probs.items() if 'return 1' in path[-1][1])
+
+    k = register_kernel("ex_monty", EX_MONTY, variables=MONTY_VARS, domain=MONTY_DOMAIN)
+    print(k.source)
+    register_kernel("ex_freivalds", EX_FREIVALDS, variables=FREV_VARS, domain=FREV_DOMAIN)
+    register_kernel("bday_chain", gen_birthday_chain_source(23, 365))
+
+    for name, exact in [("ex_monty", analyzer_win(EX_MONTY, MONTY_VARS, MONTY_DOMAIN)),
+                        ("ex_freivalds", analyzer_win(EX_FREIVALDS, FREV_VARS, FREV_DOMAIN)),
+                        ("bday_chain", BirthdayEngine(S=365).shared(23))]:
+        r = simulate(name, 1_000_000, seed=1)
+        print(f"{name:>12}: {r['estimate']:.5f} ± {r['stderr']:.5f}  (exact {exact:.5f})  {r['seconds']:.3f}s")
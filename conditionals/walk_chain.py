@@ -0,0 +1,210 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from conditionals.prism_solver import DTMC
+
+# ============================
+# Random walks with absorbing barriers as sparse DTMCs
+# ============================
+#
+# A walk on the integer points of a box (1-D or 2-D) with a fixed step
+# distribution {offset: probability} is a DTMC with one state per point.
+# Barrier points are absorbing (self-loop) and labelled:
+#   absorption(b)  P(F "b")            first-step equations, as prism_solver.prob_until
+#   hitting_time   E[steps to barrier] reward 1 per step, as reward_reach
+#   within(b, k)   P(F<=k "b")          k steps of x <- P x, as prob_bounded_eventually
+# Steps leaving the box stay in place. The transition structure is built once
+# per offset (P = loops + sum_k p_k M_k), so a sweep over step distributions
+# stacks every row into one block-diagonal system and solves it in one call;
+# within() applies each M_k once per step to all rows together.
+#
+# A barrier can stand in for an unbounded side (open_ends): when the walk
+# reaches it, a tail function gives what the untruncated walk does from there
+# ({barrier: P(reach it eventually)}, expected further steps), and the
+# absorption probabilities and hitting time include that tail instead of
+# counting the open end as a place to stop. within() is exact as long as the
+# open end cannot be reached inside the horizon.
+
+def randint_step_prob(p, lo=0, hi=9, scale=0.1):
+    """Exact P(scale * randint(lo, hi) < p), as randomwalk.py draws its left step (float compare included)."""
+    return sum(scale * k < p for k in range(lo, hi + 1)) / (hi - lo + 1)
+
+
+class WalkChain:
+    def __init__(self, box, offsets, barriers, open_ends=None):
+        """
+        box: [(lo, hi), ...] inclusive bounds per dimension, e.g. [(-1, 500)] or [(0, 9), (0, 9)]
+        offsets: list of step vectors (ints for 1-D, tuples for 2-D), e.g. [-1, +1]
+        barriers: {name: predicate(coords) -> bool array}; coords is an (n, d) int array
+        open_ends: {barrier name: tail(probs) -> ({real barrier: P}, expected steps)} for
+            barriers that truncate an unbounded side (see cliff_walk)
+        """
+        self.box = [tuple(b) for b in box]
+        self.dim = len(self.box)
+        self.offsets = [np.atleast_1d(np.asarray(o, dtype=np.int64)) for o in offsets]
+        shape = tuple(hi - lo + 1 for lo, hi in self.box)
+        lo = np.array([b[0] for b in self.box])
+        self.shape = shape
+        self.coords = np.indices(shape).reshape(self.dim, -1).T + lo   # (n, d)
+        self.n = len(self.coords)
+        self.labels = {name: np.asarray(pred(self.coords), dtype=bool) for name, pred in barriers.items()}
+        self.open_ends = dict(open_ends or {})
+        self.absorbing = np.zeros(self.n, dtype=bool)
+        for mask in self.labels.values():
+            self.absorbing |= mask
+
+        # one 0/1 move matrix per offset over the transient rows; absorbing rows get the self-loop
+        src = np.nonzero(~self.absorbing)[0]
+        self._moves = []
+        for off in self.offsets:
+            dst = self.coords[src] + off
+            inside = np.all((dst >= lo) & (dst < lo + np.array(shape)), axis=1)
+            dst_idx = src.copy()
+            dst_idx[inside] = np.ravel_multi_index(tuple((dst[inside] - lo).T), shape)
+            self._moves.append(sp.csr_matrix((np.ones(len(src)), (src, dst_idx)), shape=(self.n, self.n)))
+        a = np.nonzero(self.absorbing)[0]
+        self._loops = sp.csr_matrix((np.ones(len(a)), (a, a)), shape=(self.n, self.n))
+        self._transient = src
+        self._inner = [M[src][:, src].tocsr() for M in self._moves]  # transient -> transient
+
+    def index(self, point):
+        lo = np.array([b[0] for b in self.box])
+        return int(np.ravel_multi_index(tuple(np.atleast_1d(point) - lo), self.shape))
+
+    def _rows(self, prob_rows):
+        W = np.atleast_2d(np.asarray(prob_rows, dtype=float))
+        if W.shape[1] != len(self.offsets) or np.any(np.abs(W.sum(axis=1) - 1) > 1e-12):
+            raise ValueError("Step probabilities must match the offsets and sum to 1")
+        return W
+
+    def dtmc(self, probs, start):
+        """The walk as a prism_solver.DTMC for step probabilities 'probs' (aligned with offsets)."""
+        W = self._rows([probs])
+        P = self._loops + sum(w * M for w, M in zip(W[0], self._moves))
+        names = ["x", "y", "z"][:self.dim]
+        return DTMC(P, init=self.index(start), labels=dict(self.labels), states=self.coords, var_names=names)
+
+    def _step(self, W, X):
+        """P_r @ X[:, r] for every row r at once."""
+        return self._loops @ X + sum((M @ X) * W[:, k] for k, M in enumerate(self._moves))
+
+    def _reaches_barrier(self, W):
+        """(n_transient, R): transient states that reach some barrier with positive probability under row r."""
+        reach = np.zeros((self.n, len(W)), dtype=bool)
+        reach[self.absorbing] = True
+        frontier = reach.copy()
+        live = W > 0
+        while frontier.any():
+            pre = np.zeros_like(reach)
+            for k, M in enumerate(self._moves):
+                pre |= ((M @ frontier.astype(float)) > 0) & live[:, k]
+            new = pre & ~reach
+            reach |= new
+            frontier = new
+        return reach[self._transient]
+
+    def sweep(self, prob_rows, start, horizon=None):
+        """
+        {'absorption': {real barrier: P}, 'hitting_time': E[steps], 'open_end': {end: P(reached)},
+         'within': {barrier: P(within horizon)}} from 'start', one array entry per row of
+        step probabilities. hitting_time is inf when absorption is not almost sure.
+        """
+        W = self._rows(prob_rows)
+        R, t = len(W), len(self._transient)
+        s = self.index(start)
+        real = [b for b in self.labels if b not in self.open_ends]
+
+        # one block-diagonal system: unknowns ordered (row, transient state); states that
+        # cannot reach any barrier under a row keep the identity row (value 0, inf time below)
+        ok = self._reaches_barrier(W)                       # (t, R)
+        keep = ok.T.ravel().astype(float)
+        A = sum(sp.kron(sp.diags(W[:, k]), Mi, format="csr") for k, Mi in enumerate(self._inner))
+        system = (sp.identity(R * t, format="csr") - sp.diags(keep) @ A).tocsc()
+        cols = []
+        for b in self.labels:
+            into = np.stack([M[self._transient] @ self.labels[b].astype(float) for M in self._moves])
+            cols.append((W @ into).ravel() * keep)          # one step into b, per (row, state)
+        cols.append(keep)                                   # reward 1 per step
+        sol = np.asarray(spla.spsolve(system, np.column_stack(cols))).reshape(R, t, len(cols))
+
+        if self.absorbing[s]:
+            trunc = {b: np.full(R, float(self.labels[b][s])) for b in self.labels}
+            steps = np.zeros(R)
+        else:
+            i = int(np.searchsorted(self._transient, s))
+            trunc = {b: sol[:, i, j] for j, b in enumerate(self.labels)}
+            steps = sol[:, i, -1]
+
+        absorption = {b: trunc[b].copy() for b in real}
+        for end, tail in self.open_ends.items():
+            for r in range(R):
+                probs, more = tail(W[r])
+                for b in real:
+                    absorption[b][r] += trunc[end][r] * probs.get(b, 0.0)
+                if trunc[end][r] > 0:
+                    steps[r] += trunc[end][r] * more
+        sure = sum(absorption.values()) >= 1.0 - 1e-10 if real else np.zeros(R, dtype=bool)
+        out = {
+            "absorption": {b: np.clip(v, 0.0, 1.0) for b, v in absorption.items()},
+            "hitting_time": np.where(sure, steps, np.inf),
+            "open_end": {e: trunc[e] for e in self.open_ends},
+        }
+        if horizon is not None:
+            out["within"] = {}
+            for b, mask in self.labels.items():
+                X = np.repeat(mask[:, None].astype(float), R, axis=1)
+                for _ in range(horizon):
+                    X = np.where(mask[:, None], 1.0, self._step(W, X))
+                out["within"][b] = X[s]
+        return out
+
+    def solve(self, probs, start, horizon=None):
+        """sweep() for a single step distribution, with scalar entries."""
+        res = self.sweep([probs], start, horizon)
+        return {key: ({b: float(v[0]) for b, v in val.items()} if isinstance(val, dict) else float(val[0]))
+                for key, val in res.items()}
+
+
+def cliff_walk(right=2000):
+    """
+    randomwalk.py's walk: start at 0, fall at -1. The unbounded right side is cut at
+    'right' and closed with the gambler's-ruin tail: from x, with left step q, the
+    walk falls with probability min(1, q / (1 - q)) ** (x + 1) and, when q > 1/2,
+    takes (x + 1) / (2q - 1) more steps on average.
+    """
+    def tail(probs):
+        q = probs[0]
+        fall = 1.0 if q >= 0.5 else (q / (1 - q)) ** (right + 1)
+        return {"fall": fall}, ((right + 1) / (2 * q - 1) if q > 0.5 else np.inf)
+
+    return WalkChain([(-1, right)], [-1, +1],
+                     {"fall": lambda c: c[:, 0] == -1, "away": lambda c: c[:, 0] == right},
+                     open_ends={"away": tail})
+
+
+# ============================
+# Run: randomwalk.py exactly, and a 2-D walk
+# ============================
+if __name__ == "__main__":
+    from examples.randomwalk import theoretical_fall_probability
+
+    walk = cliff_walk()
+    ps = [round(0.1 * i, 1) for i in range(1, 10)]
+    lefts = [randint_step_prob(p) for p in ps]
+    res = walk.sweep([[q, 1 - q] for q in lefts], start=0, horizon=1000)
+    print(f"{'P(left)':>8} | {'step':>5} | {'<=1000 steps':>12} | {'absorption':>10} | {'E[steps]':>10} | {'formula':>8}")
+    for i, p in enumerate(ps):
+        print(f"{p:>8.1f} | {lefts[i]:>5.2f} | {res['within']['fall'][i]:>12.6f} | {res['absorption']['fall'][i]:>10.6f} | "
+              f"{res['hitting_time'][i]:>10.1f} | {theoretical_fall_probability(p):>8.4f}")
+
+    # 2-D: drunkard in a 21 x 21 yard, cliff along x = 0, home along x = 20, other edges are walls
+    yard = WalkChain([(0, 20), (0, 20)], [(-1, 0), (1, 0), (0, -1), (0, 1)],
+                     {"cliff": lambda c: c[:, 0] == 0, "home": lambda c: c[:, 0] == 20})
+    r = yard.solve([0.3, 0.2, 0.25, 0.25], start=(5, 10), horizon=200)
+    print(f"2-D yard from (5, 10): P(cliff) = {r['absorption']['cliff']:.6f}, P(home) = {r['absorption']['home']:.6f}, "
+          f"E[steps] = {r['hitting_time']:.2f}, P(cliff within 200) = {r['within']['cliff']:.6f}")
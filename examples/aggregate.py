@@ -0,0 +1,233 @@
+import math
+
+import numpy as np
+
+# -------------------- Streaming, mergeable aggregates of simulation output --------------------
+#
+# A simulation batch is an array of per-trial values (hit flags, collision
+# indices, step counts). Each aggregate folds a batch in with NumPy and keeps
+# a fixed-size state, so nothing per trial is stored, and two states built on
+# different trials merge into the state of the combined trials (workers,
+# blocks, resumed runs). NaN is a trial without a value (a value model's "no
+# event"): Counts tallies those under the key None, the other aggregates skip
+# them, so moments and quantiles are conditional on the event.
+#   Counts         exact count per distinct outcome
+#   Welford        count / mean / variance (Chan et al. pairwise combination)
+#   Histogram      fixed bins over [lo, hi) plus under/overflow
+#   QuantileSketch log-spaced buckets with relative accuracy 'alpha' (DDSketch-style)
+# An Aggregate groups named aggregates fed from the same batches.
+
+
+def _present(values):
+    """Values as a flat float array without the NaN (no event) entries."""
+    x = np.asarray(values, dtype=float).ravel()
+    return x[~np.isnan(x)]
+
+
+class Counts:
+    def __init__(self):
+        self.counts = {}
+        self.missing = 0  # NaN trials
+
+    def update(self, values):
+        x = np.asarray(values).ravel()
+        if x.dtype.kind == "f":
+            nan = np.isnan(x)
+            self.missing += int(np.count_nonzero(nan))
+            x = x[~nan]
+        keys, n = np.unique(x, return_counts=True)
+        for k, c in zip(keys.tolist(), n.tolist()):
+            self.counts[k] = self.counts.get(k, 0) + c
+        return self
+
+    def merge(self, other):
+        for k, c in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + c
+        self.missing += other.missing
+        return self
+
+    def summary(self):
+        """{value: (count, fraction of all trials)}, plus None for the NaN trials if any."""
+        total = sum(self.counts.values()) + self.missing
+        out = {k: (c, c / total) for k, c in sorted(self.counts.items())}
+        if self.missing:
+            out[None] = (self.missing, self.missing / total)
+        return out
+
+
+class Welford:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _combine(self, n, mean, m2):
+        if not n:
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        return self
+
+    def update(self, values):
+        x = _present(values)
+        if not len(x):
+            return self
+        mean = x.mean()
+        return self._combine(len(x), mean, float(((x - mean) ** 2).sum()))
+
+    def merge(self, other):
+        return self._combine(other.n, other.mean, other.m2)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else float("nan")
+
+    def summary(self):
+        sd = math.sqrt(self.variance) if self.n > 1 else float("nan")
+        return {"n": self.n, "mean": self.mean, "variance": self.variance,
+                "stderr": sd / math.sqrt(self.n) if self.n > 1 else float("nan")}
+
+
+class Histogram:
+    def __init__(self, lo, hi, bins):
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.under = 0
+        self.over = 0
+
+    def update(self, values):
+        x = _present(values)
+        self.under += int(np.count_nonzero(x < self.edges[0]))
+        self.over += int(np.count_nonzero(x >= self.edges[-1]))
+        inside = x[(x >= self.edges[0]) & (x < self.edges[-1])]
+        idx = np.searchsorted(self.edges, inside, side="right") - 1
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms with different bins cannot be merged")
+        self.counts += other.counts
+        self.under += other.under
+        self.over += other.over
+        return self
+
+    def summary(self):
+        return {"edges": self.edges.tolist(), "counts": self.counts.tolist(),
+                "under": self.under, "over": self.over}
+
+
+class QuantileSketch:
+    """Quantiles of non-negative values within relative error 'alpha' (0 is kept exactly)."""
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.buckets = {}  # i -> count of values in (gamma^(i-1), gamma^i]
+        self.zeros = 0
+        self.n = 0
+
+    def update(self, values):
+        x = _present(values)
+        if (x < 0).any():
+            raise ValueError("QuantileSketch takes non-negative values")
+        pos = x[x > 0]
+        self.zeros += len(x) - len(pos)
+        self.n += len(x)
+        keys, n = np.unique(np.ceil(np.log(pos) / math.log(self.gamma)).astype(np.int64), return_counts=True)
+        for k, c in zip(keys.tolist(), n.tolist()):
+            self.buckets[k] = self.buckets.get(k, 0) + c
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Sketches with different accuracy cannot be merged")
+        for k, c in other.buckets.items():
+            self.buckets[k] = self.buckets.get(k, 0) + c
+        self.zeros += other.zeros
+        self.n += other.n
+        return self
+
+    def quantile(self, q):
+        if not self.n:
+            return float("nan")
+        rank = q * (self.n - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if rank < seen:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def summary(self, qs=(0.01, 0.25, 0.5, 0.75, 0.99)):
+        return {q: self.quantile(q) for q in qs}
+
+
+class Aggregate:
+    """Named aggregates fed from the same batches: Aggregate(mean=Welford(), dist=Counts())."""
+
+    def __init__(self, **parts):
+        self.parts = parts
+
+    def update(self, values):
+        for part in self.parts.values():
+            part.update(values)
+        return self
+
+    def merge(self, other):
+        for name, part in self.parts.items():
+            part.merge(other.parts[name])
+        return self
+
+    def __getitem__(self, name):
+        return self.parts[name]
+
+    def summary(self):
+        return {name: part.summary() for name, part in self.parts.items()}
+
+
+# -------------------- Demo --------------------
+def _birthday_stats():
+    return Aggregate(counts=Counts(), moments=Welford(), hist=Histogram(0, 60, 12))
+
+
+def _walk_stats():
+    return Aggregate(counts=Counts(), moments=Welford(), quantiles=QuantileSketch(0.01))
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from examples.parallel import parallel_stream
+    from examples.simulate import simulate_stream
+    from pathbranch.birthday_engine import BirthdayEngine
+
+    # first repeated birthday among K = 60 people: NaN = none
+    K = 60
+    agg = simulate_stream("birthday_index", 2_000_000, _birthday_stats(), seed=1, K=K)
+    counts = agg["counts"].summary()
+    engine = BirthdayEngine(S=365)
+    print("first repeat at person i (simulated vs exact):")
+    for i in (5, 10, 20, 23, 30, 40):
+        print(f"  i={i:>2}: {counts.get(i, (0, 0.0))[1]:.5f}  {i * engine.hit(i):.5f}")  # i paths (i, j<i)
+    m = agg["moments"].summary()
+    print(f"  mean index given a repeat {m['mean']:.3f} ± {m['stderr']:.3f}, "
+          f"P(no repeat) {counts.get(None, (0, 0.0))[1]:.2e} (exact {engine.distinct(K):.2e})")
+    print(f"  histogram [0, 60) in 5s: {agg['hist'].counts.tolist()}")
+
+    # steps until the walk falls, merged over worker processes: identical summary for 1 and 4 workers
+    runs = [parallel_stream("walk_steps", 200_000, _walk_stats, seed=7, workers=w, block=1 << 14, prob_step_left=0.3)
+            for w in (1, 4)]
+    one, four = (r.summary() for r in runs)
+    # 3/7 is the fall probability with no step limit; walks still up after 1000 steps
+    # and later falling have probability below 1e-30, so it is also the 1000-step value
+    print(f"walk: P(fall) {1 - one['counts'].get(None, (0, 0.0))[1]:.5f} (exact 3/7 = 0.42857), "
+          f"steps given a fall: mean {one['moments']['mean']:.3f}, "
+          f"quantiles {[round(v, 1) for v in one['quantiles'].values()]}")
+    print(f"  same summary for 1 and 4 workers: {one == four}")
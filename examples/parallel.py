@@ -0,0 +1,144 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from examples.autobdy import build_birthday_chain_fn
+from examples.randomwalk import simulate_fall_probability
+from examples.simulate import MODELS, hit_model, stream_model
+
+# -------------------- Reproducible multi-process simulation --------------------
+#
+# Trials are cut into fixed-size blocks and block i always gets the i-th child
+# of SeedSequence(seed).spawn(n_blocks). How many worker processes run the
+# blocks only changes who computes them, not what they compute, and the merge
+# is an integer sum of per-block hit counts, so the result for a given seed is
+# bit-identical for any worker count (including the in-process run with
+# workers=1).
+#
+# Two kinds of block runner:
+#   vectorized  any model in simulate.MODELS, fed a Generator on the block's stream
+#   loop        the original per-trial functions (autobdy's generated chain,
+#               randomwalk.simulate_fall_probability); they use the global
+#               'random' module, which is reseeded from the block's stream
+
+BLOCK = 1 << 16  # trials per stream; part of the result's definition, keep fixed across runs
+
+LOOP_MODELS = {}
+
+
+def loop_model(name):
+    def register(fn):
+        LOOP_MODELS[name] = fn
+        return fn
+    return register
+
+
+@lru_cache(maxsize=None)
+def _chain_fn(K, N):
+    return build_birthday_chain_fn(K, N)
+
+
+@loop_model("autobdy")
+def autobdy_loop(n, K=4, N=365):
+    f = _chain_fn(K, N)
+    return sum(f() for _ in range(n))
+
+
+@loop_model("walk")
+def walk_loop(n, prob_step_left=0.3, max_steps_per_trial=1000):
+    return round(simulate_fall_probability(prob_step_left, n, max_steps_per_trial) * n)
+
+
+def _run_block(task):
+    model, loop, n, seed_seq, params = task
+    if loop:
+        random.seed(int.from_bytes(seed_seq.generate_state(4).tobytes(), "little"))
+        return int(LOOP_MODELS[model](n, **params))
+    rng = np.random.default_rng(seed_seq)
+    return int(np.count_nonzero(MODELS[model](rng, n, **params) == 1))
+
+
+def _blocks(trials, seed, block):
+    """(size, SeedSequence) per block; depends only on trials, seed and block."""
+    sizes = [block] * (trials // block) + ([trials % block] if trials % block else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def _map_blocks(fn, tasks, workers):
+    """Block results in block order, in-process for one worker."""
+    if workers == 1 or len(tasks) <= 1:
+        return [fn(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return list(pool.map(fn, tasks))
+
+
+def _stream_block(task):
+    model, make_aggregate, n, seed_seq, params = task
+    return make_aggregate().update(stream_model(model)(np.random.default_rng(seed_seq), n, **params))
+
+
+def parallel_simulate(model, trials, seed=0, workers=None, loop=False, block=BLOCK, **params):
+    """
+    Run 'trials' trials of a model sharded over worker processes.
+    loop=False uses the vectorized simulate.MODELS entry, loop=True the per-trial
+    Python function in LOOP_MODELS. workers=None uses os.cpu_count(); workers=1
+    runs in-process. Returns the simulate() dict plus 'workers' and 'blocks'.
+    """
+    if loop and model not in LOOP_MODELS:
+        raise KeyError(f"Unknown loop model: {model}")
+    if not loop:
+        hit_model(model)
+    tasks = [(model, loop, n, ss, params) for n, ss in _blocks(trials, seed, block)]
+    workers = workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    hits = sum(_map_blocks(_run_block, tasks, workers))
+    est = hits / trials if trials else float("nan")
+    return {
+        "model": model,
+        "trials": trials,
+        "hits": hits,
+        "estimate": est,
+        "stderr": math.sqrt(est * (1 - est) / trials) if trials else float("nan"),
+        "seconds": time.perf_counter() - t0,
+        "workers": workers,
+        "blocks": len(tasks),
+    }
+
+
+def parallel_stream(model, trials, make_aggregate, seed=0, workers=None, block=BLOCK, **params):
+    """
+    Per-trial values of a vectorized model folded into aggregates (aggregate.py) on
+    worker processes. make_aggregate() builds an empty Aggregate (a module-level
+    function, so workers can unpickle it); block results are merged in block
+    order, so the summary is the same for any worker count.
+    """
+    tasks = [(model, make_aggregate, n, ss, params) for n, ss in _blocks(trials, seed, block)]
+    parts = _map_blocks(_stream_block, tasks, workers or os.cpu_count() or 1)
+    total = make_aggregate()
+    for part in parts:
+        total.merge(part)
+    return total
+
+
+# -------------------- Demo --------------------
+if __name__ == "__main__":
+    for model, loop, trials, block, params in [
+        ("autobdy", True, 200_000, 1 << 14, {"K": 23, "N": 365}),
+        ("walk", True, 10_000, 1 << 10, {"prob_step_left": 0.3}),
+        ("birthday", False, 4_000_000, BLOCK, {"K": 23, "N": 365}),
+    ]:
+        runs = [parallel_simulate(model, trials, seed=2024, workers=w, loop=loop, block=block, **params)
+                for w in (1, 2, 4)]
+        same = len({r["hits"] for r in runs}) == 1
+        print(f"{model:>9} ({'loop' if loop else 'vectorized'}): hits {runs[0]['hits']} / {trials}"
+              f"  estimate {runs[0]['estimate']:.5f}  identical for 1/2/4 workers: {same}  "
+              + "  ".join(f"{r['workers']}w {r['seconds']:.2f}s" for r in runs))
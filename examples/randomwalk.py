@@ -54,13 +54,23 @@ def theoretical_fall_probability(prob_step_left):
         return prob_step_left / (1 - prob_step_left)
 
 
-# Simulate and compare for multiple values of left step probability
-probabilities = [round(0.1 * i, 1) for i in range(1, 10)]  # p in [0.1, 0.9]
+if __name__ == "__main__":
+    import os
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from conditionals.walk_chain import cliff_walk, randint_step_prob
 
-print(f"{'P(left)':>8} | {'Simulated':>12} | {'Theoretical':>12}")
-print("-" * 38)
+    # Simulate and compare for multiple values of left step probability
+    probabilities = [round(0.1 * i, 1) for i in range(1, 10)]  # p in [0.1, 0.9]
 
-for p in probabilities:
-    simulated = simulate_fall_probability(p)
-    theoretical = theoretical_fall_probability(p)
-    print(f"{p:>8.1f} | {simulated:>12.4f} | {theoretical:>12.4f}")
+    # exact fall probability within the same 1000-step limit (sparse Markov chain, one sweep)
+    lefts = [randint_step_prob(p) for p in probabilities]
+    exact = cliff_walk().sweep([[q, 1 - q] for q in lefts], start=0, horizon=1000)["within"]["fall"]
+
+    print(f"{'P(left)':>8} | {'Simulated':>12} | {'Exact':>12} | {'Theoretical':>12}")
+    print("-" * 53)
+
+    for p, ex in zip(probabilities, exact):
+        simulated = simulate_fall_probability(p)
+        theoretical = theoretical_fall_probability(p)
+        print(f"{p:>8.1f} | {simulated:>12.4f} | {ex:>12.4f} | {theoretical:>12.4f}")
@@ -0,0 +1,279 @@
+import math
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+# -------------------- Vectorized Monte Carlo for the example programs --------------------
+#
+# Each model draws a whole batch of trials at once with a NumPy Generator and
+# returns one outcome per trial (1 = the event the example counts), instead of
+# calling the per-trial Python function `trials` times:
+#   pi        piestimate.py   x, y ~ U{0..R}; inside iff x^2 + y^2 <= R^2
+#   birthday  bdyn.py         (trials x K) matrix of days; hit iff a row has a repeat
+#   autobdy   autobdy.py      same event as the generated if/elif chain
+#   monty     montyc.py       choice, car_door ~ U{1..3}; montyc's branches as masks
+#   walk      randomwalk.py   all walks stepped together until they fall or time out
+#   vonneumann VonNeumann.py  two biased flips; outcome 0/1/-1 per trial
+# Value models (VALUE_MODELS) return a number per trial instead of an outcome
+# and only feed the aggregate runners (simulate_stream, parallel_stream); NaN
+# marks a trial where the event did not happen:
+#   birthday_index, walk_steps  first repeat index, steps to fall
+#
+# Usage: simulate("birthday", 1_000_000, seed=1, K=23, N=365)
+#        simulate_until("birthday", half_width=1e-3, seed=1, K=23, N=365)
+
+CHUNK = 1 << 20  # trials drawn per block (bounds memory for large runs)
+
+MODELS = {}
+VALUE_MODELS = {}
+
+
+def model(name):
+    def register(fn):
+        MODELS[name] = fn
+        return fn
+    return register
+
+
+def value_model(name):
+    def register(fn):
+        VALUE_MODELS[name] = fn
+        return fn
+    return register
+
+
+def hit_model(name):
+    """Batch function of a hit/miss model; value models are rejected, their 1s are not events."""
+    if name in VALUE_MODELS:
+        raise KeyError(f"{name} is a value model: use simulate_stream / parallel_stream")
+    return MODELS[name]
+
+
+def stream_model(name):
+    """Batch function behind an aggregate run: a value model, or the outcomes of a hit/miss model."""
+    if name in VALUE_MODELS:
+        return VALUE_MODELS[name]
+    if name in MODELS:
+        return MODELS[name]
+    raise KeyError(f"Unknown model: {name}")
+
+
+@model("pi")
+def pi_batch(rng, n, R=315):
+    x = rng.integers(0, R + 1, n)
+    y = rng.integers(0, R + 1, n)
+    return x * x + y * y <= R * R
+
+
+@model("birthday")
+def birthday_batch(rng, n, K=4, N=365):
+    days = np.sort(rng.integers(0, N, (n, K)), axis=1)
+    return (days[:, 1:] == days[:, :-1]).any(axis=1)
+
+
+MODELS["autobdy"] = birthday_batch  # the generated chain returns 1 on the first repeat: same event
+
+
+@model("monty")
+def monty_batch(rng, n):
+    choice = rng.integers(1, 4, n)
+    car_door = rng.integers(1, 4, n)
+    # montyc.monty_hall: which goat door the host can open decides the branch
+    b1 = (choice != 1) & (car_door != 1)
+    b2 = ~b1 & (choice != 2) & (car_door != 2)
+    b3 = ~b1 & ~b2 & (choice != 3) & (car_door != 3)
+    win = (b1 & np.where(choice == 2, car_door == 3, car_door == 2)) \
+        | (b2 & np.where(choice == 1, car_door == 3, car_door == 1)) \
+        | (b3 & np.where(choice == 1, car_door == 2, car_door == 1))
+    return win
+
+
+def _walk_fall_steps(rng, n, prob_step_left, max_steps_per_trial):
+    """Step at which each walk first reaches -1 (NaN if it never does within the limit)."""
+    position = np.zeros(n, dtype=np.int64)
+    fell_at = np.full(n, np.nan)
+    active = np.arange(n)
+    for step in range(1, max_steps_per_trial + 1):
+        if not len(active):
+            break
+        # same draw as randomwalk.py: X = 0.1 * randint(0, 9), left iff X < p
+        left = 0.1 * rng.integers(0, 10, len(active)) < prob_step_left
+        position[active] += np.where(left, -1, 1)
+        down = position[active] == -1
+        fell_at[active[down]] = step
+        active = active[~down]
+    return fell_at
+
+
+@model("walk")
+def walk_batch(rng, n, prob_step_left=0.3, max_steps_per_trial=1000):
+    return ~np.isnan(_walk_fall_steps(rng, n, prob_step_left, max_steps_per_trial))
+
+
+@model("vonneumann")
+def vonneumann_batch(rng, n, p=0.8):
+    a = np.where(rng.random(n) < p, 0, 1)
+    b = np.where(rng.random(n) < p, 0, 1)
+    return np.select([(a == 0) & (b == 1), (a == 1) & (b == 0)], [0, 1], -1)
+
+
+# Value models: one number per trial instead of a hit flag (0 = the event did not happen),
+# meant for simulate_stream and the aggregates in aggregate.py.
+
+@value_model("birthday_index")
+def birthday_index_batch(rng, n, K=23, N=365):
+    """Index i of the first person whose day repeats an earlier one (NaN if all K differ)."""
+    days = rng.integers(0, N, (n, K))
+    order = np.argsort(days, axis=1, kind="stable")
+    ranked = np.take_along_axis(days, order, axis=1)
+    # within a run of equal days the stable order lists people by index: the 2nd is that day's first repeat
+    repeat_at = np.where(ranked[:, 1:] == ranked[:, :-1], order[:, 1:], K)
+    first = repeat_at.min(axis=1)
+    return np.where(first < K, first, np.nan)
+
+
+@value_model("walk_steps")
+def walk_steps_batch(rng, n, prob_step_left=0.3, max_steps_per_trial=1000):
+    """Steps until the walk falls (NaN if it does not within the limit)."""
+    return _walk_fall_steps(rng, n, prob_step_left, max_steps_per_trial)
+
+
+def simulate(model, trials, seed=None, **params):
+    """
+    Run 'trials' independent trials of a registered model in NumPy batches.
+    Returns {'model', 'trials', 'hits', 'estimate', 'stderr', 'seconds'}; 'hits'
+    counts outcomes equal to 1 (estimate = hits / trials). The same seed gives
+    the same result.
+    """
+    fn = hit_model(model)
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    hits = 0
+    done = 0
+    while done < trials:
+        n = min(CHUNK, trials - done)
+        hits += int(np.count_nonzero(fn(rng, n, **params) == 1))
+        done += n
+    est = hits / trials if trials else float("nan")
+    return {
+        "model": model,
+        "trials": trials,
+        "hits": hits,
+        "estimate": est,
+        "stderr": math.sqrt(est * (1 - est) / trials) if trials else float("nan"),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def simulate_stream(model, trials, aggregate, seed=None, **params):
+    """Feed the per-trial values of a model into 'aggregate' (see aggregate.py) chunk by chunk."""
+    fn = stream_model(model)
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < trials:
+        n = min(CHUNK, trials - done)
+        aggregate.update(fn(rng, n, **params))
+        done += n
+    return aggregate
+
+
+def wilson_interval(hits, trials, confidence=0.95):
+    """Wilson score interval for a binomial proportion (sensible at 0 or 'trials' hits)."""
+    if not trials:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = hits / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+def simulate_until(model, half_width=None, rel_error=None, confidence=0.95, max_trials=10**9,
+                   deadline=None, seed=None, first_batch=1 << 14, **params):
+    """
+    Run batches of a registered model until the confidence interval is tight enough:
+    its half-width <= 'half_width' and/or half-width / estimate <= 'rel_error'.
+    Stops early at 'max_trials' or after 'deadline' seconds; 'stopped' says which
+    ('target', 'budget' or 'deadline') and the achieved precision is reported either way.
+    Batch sizes follow the 1/sqrt(n) rule from the current interval, at most doubling the total.
+    """
+    if half_width is None and rel_error is None:
+        raise ValueError("Give half_width and/or rel_error")
+    fn = hit_model(model)
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    hits = trials = 0
+    n = min(first_batch, max_trials)
+    while True:
+        while n > 0:
+            m = min(CHUNK, n)
+            hits += int(np.count_nonzero(fn(rng, m, **params) == 1))
+            trials += m
+            n -= m
+        lo, hi = wilson_interval(hits, trials, confidence)
+        est = hits / trials
+        hw = (hi - lo) / 2
+        rel = hw / est if est else math.inf
+        ratios = [hw / half_width] if half_width is not None else []
+        ratios += [rel / rel_error] if rel_error is not None else []
+        worst = max(ratios)
+        if worst <= 1:
+            stopped = "target"
+        elif trials >= max_trials:
+            stopped = "budget"
+        elif deadline is not None and time.perf_counter() - t0 >= deadline:
+            stopped = "deadline"
+        else:
+            # half-width ~ 1/sqrt(n): aim just past the target, no more than double per step
+            want = trials * (1.1 * worst * worst if math.isfinite(worst) else 2)
+            n = int(min(max(want - trials, first_batch), trials, max_trials - trials))
+            continue
+        return {
+            "model": model,
+            "trials": trials,
+            "hits": hits,
+            "estimate": est,
+            "ci": (lo, hi),
+            "half_width": hw,
+            "rel_error": rel,
+            "confidence": confidence,
+            "stopped": stopped,
+            "seconds": time.perf_counter() - t0,
+        }
+
+
+# -------------------- Demo --------------------
+if __name__ == "__main__":
+    from bdyn import birthday_paradox
+
+    trials = 1_000_000
+    for name, params, exact in [
+        ("pi", {"R": 315}, sum(math.isqrt(315 * 315 - x * x) + 1 for x in range(316)) / 316 ** 2),
+        ("birthday", {"K": 23, "N": 365}, 1 - math.prod((365 - i) / 365 for i in range(23))),
+        ("monty", {}, 2 / 3),
+        ("walk", {"prob_step_left": 0.3}, 0.3 / 0.7),   # p / (1 - p), randomwalk.theoretical_fall_probability
+        ("vonneumann", {"p": 0.8}, 0.16),
+    ]:
+        n = trials if name != "walk" else trials // 10
+        r = simulate(name, n, seed=1, **params)
+        print(f"{name:>10}: {r['estimate']:.5f} ± {r['stderr']:.5f}  (exact ≈ {exact:.5f})  {r['seconds']:.3f}s")
+
+    # per-trial Python loop for comparison (bdyn.py)
+    t0 = time.perf_counter()
+    loop_trials = 100_000
+    hits = sum(birthday_paradox(23, 365) for _ in range(loop_trials))
+    loop = time.perf_counter() - t0
+    vec = simulate("birthday", loop_trials, seed=1, K=23, N=365)["seconds"]
+    print(f"birthday K=23, {loop_trials} trials: loop {loop:.3f}s, vectorized {vec:.3f}s ({loop / vec:.0f}x)")
+
+    # fixed precision instead of a fixed trial count: easy and rare estimates alike
+    for name, params, target in [
+        ("monty", {}, {"half_width": 1e-3}),
+        ("pi", {"R": 315}, {"half_width": 5e-4}),
+        ("birthday", {"K": 2, "N": 365}, {"rel_error": 0.02}),   # p ~ 0.0027
+    ]:
+        r = simulate_until(name, seed=1, max_trials=50_000_000, deadline=30, **target, **params)
+        print(f"{name:>10}: {r['estimate']:.6f} ± {r['half_width']:.2e} (rel {r['rel_error']:.3f}) "
+              f"after {r['trials']} trials, stopped on {r['stopped']} in {r['seconds']:.2f}s")
@@ -1,20 +1,23 @@
-import math
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-def birthday_shared_prob(k, days=365):
-    if k > days:
+from pathbranch.birthday_engine import BirthdayEngine
+
+def birthday_shared_prob(k, days=365, pmf=None):
+    """P(shared birthday among k people); log-space, so large k/days do not underflow."""
+    if pmf is None and k > days:
         return 1.0
-    prob_no_shared = 1.0
-    for i in range(k):
-        prob_no_shared *= (days - i) / days
-    return 1.0 - prob_no_shared
+    return BirthdayEngine(S=days, pmf=pmf).shared(k)
 
-def make_birthday_paths(k, days=365):
+def make_birthday_paths(k, days=365, pmf=None):
     """
     Return two paths in the same structure as your other examples,
     with 'return 1' meaning shared-birthday found, 'return 0' otherwise.
     Probabilities are computed analytically (no enumeration).
+    pmf: optional day probabilities for a non-uniform calendar.
     """
-    p_shared = birthday_shared_prob(k, days)
+    p_shared = birthday_shared_prob(k, days, pmf)
     p_no_shared = 1.0 - p_shared
 
     extracted_birthday_paths = [
@@ -0,0 +1,153 @@
+import re
+import math
+
+import numpy as np
+
+# -------------------- Birthday / occupancy closed forms --------------------
+#
+# For the unrolled first-collision chain over people b0..bK:
+#   - a 'return 1' path ends with ('b_i == b_j', 'True') after all earlier
+#     comparisons were False, i.e. b0..b_{i-1} distinct and b_i equal to b_j;
+#   - the 'return 0' path has every comparison False, i.e. b0..bK distinct.
+#
+# With D_t = P(b0..b_{t-1} pairwise distinct):
+#   P(hit at i against a fixed j) = (D_i - D_{i+1}) / i   (= D_i / S when uniform)
+#   P(all distinct over K people) = D_K
+#
+# D_t is kept as a prefix array of log-probabilities, built once and extended on
+# demand, so each path is answered in O(1) and nothing underflows for large K.
+
+BDAY_EQ_RE = re.compile(r'\s*b(\d+)\s*==\s*b(\d+)\s*')
+
+
+class BirthdayEngine:
+    def __init__(self, S=None, pmf=None):
+        """
+        S: number of equally likely days, or
+        pmf: day probabilities (sequence, or dict day -> prob) for a non-uniform calendar.
+        """
+        if pmf is not None:
+            q = np.array(list(pmf.values()) if isinstance(pmf, dict) else list(pmf), dtype=float)
+            q = q[q > 0]
+            self.q = q / q.sum()
+            self.S = len(self.q)
+        elif S is not None:
+            self.q = None
+            self.S = int(S)
+        else:
+            raise ValueError("BirthdayEngine needs S or pmf")
+        self._log_d = np.zeros(1)  # log D_t for t = 0 .. len-1
+
+    # ---------- Prefix table ----------
+    def _extend(self, t: int):
+        """Make sure log D_0 .. log D_t are available."""
+        have = len(self._log_d)
+        if t < have:
+            return
+        want = max(t + 1, 2 * have)
+        if self.q is None:
+            u = np.arange(have - 1, want - 1, dtype=float)
+            with np.errstate(divide='ignore'):
+                steps = np.where(u < self.S, np.log1p(-u / self.S), -np.inf)
+            self._log_d = np.concatenate([self._log_d, self._log_d[-1] + np.cumsum(steps)])
+        else:
+            # g[t] = t! * e_t(q), built one day at a time; g[t] is D_t once all days are in
+            g = np.zeros(want)
+            g[0] = 1.0
+            idx = np.arange(1, want, dtype=float)
+            for qd in self.q:
+                g[1:] = g[1:] + idx * qd * g[:-1]
+            with np.errstate(divide='ignore'):
+                self._log_d = np.log(np.minimum(g, 1.0))
+
+    def log_distinct(self, t: int) -> float:
+        """log P(first t people have pairwise distinct days)."""
+        self._extend(t)
+        return float(self._log_d[t])
+
+    def distinct(self, t: int) -> float:
+        return math.exp(self.log_distinct(t))
+
+    def shared(self, k: int) -> float:
+        """P(at least two of k people share a day)."""
+        return -math.expm1(self.log_distinct(k))
+
+    def collision_at(self, i: int) -> float:
+        """P(the first repeated day is person i's), i.e. D_i - D_{i+1}."""
+        self._extend(i + 1)
+        a, b = self._log_d[i], self._log_d[i + 1]
+        if a == -np.inf:
+            return 0.0
+        return float(math.exp(a) * -math.expm1(b - a))
+
+    def hit(self, i: int) -> float:
+        """Probability of one 'return 1' path: first i distinct, then b_i == b_j for a fixed j < i."""
+        if self.q is None:
+            return math.exp(self.log_distinct(i) - math.log(self.S))
+        return self.collision_at(i) / i if i > 0 else 0.0
+
+    # ---------- Path matching ----------
+    @staticmethod
+    def _eq_indices(cond: str):
+        m = BDAY_EQ_RE.fullmatch(cond)
+        if not m:
+            return None
+        i, j = int(m.group(1)), int(m.group(2))
+        return (i, j) if i > j else None
+
+    @staticmethod
+    def _returns(path, value: str):
+        last = path[-1]
+        return isinstance(last, tuple) and last[0] == 'Statements' and (f'return {value}' in last[1])
+
+    def path_probability(self, path):
+        """
+        Exact probability of a path from the unrolled birthday chain, or None if
+        the path does not have that shape.
+        'return 1' paths are recognized from their final comparison alone (O(1));
+        the all-distinct 'return 0' path needs every step checked once.
+        """
+        if not path:
+            return None
+        if self._returns(path, 1):
+            if len(path) < 2 or path[-2][0] == 'Statements' or path[-2][1] != 'True':
+                return None
+            hit = self._eq_indices(path[-2][0])
+            return self.hit(hit[0]) if hit else None
+        if self._returns(path, 0):
+            max_idx = -1
+            for cond, outcome in path[:-1]:
+                hit = self._eq_indices(cond) if outcome == 'False' else None
+                if not hit:
+                    return None
+                max_idx = max(max_idx, hit[0])
+            return self.distinct(max_idx + 1) if max_idx >= 0 else None
+        return None
+
+    def chain_probabilities(self, K: int):
+        """
+        Yield (i, j, p) for every 'return 1' path of the chain over b0..bK in
+        build order, then (None, None, p) for the all-distinct path. O(K^2) total.
+        """
+        for i in range(1, K + 1):
+            p = self.hit(i)
+            for j in range(i):
+                yield i, j, p
+        yield None, None, self.distinct(K + 1)
+
+
+# -------------------- Demo --------------------
+if __name__ == "__main__":
+    eng = BirthdayEngine(S=365)
+    print(f"P(shared) k=23, S=365: {eng.shared(23):.12f}")
+    total = sum(p for _, _, p in eng.chain_probabilities(22))
+    print(f"Chain K=22 total mass: {total:.15f}")
+
+    big = BirthdayEngine(S=1_000_000)
+    print(f"P(shared) k=5000, S=1e6: {big.shared(5000):.12f}")
+    print(f"log P(all distinct) k=5000: {big.log_distinct(5000):.6f}")
+
+    # Non-uniform calendar: Feb 29 at a quarter weight
+    days = [1.0] * 365 + [0.25]
+    skew = BirthdayEngine(pmf=days)
+    print(f"P(shared) k=23, 366 days w/ leap day: {skew.shared(23):.12f}")
@@ -0,0 +1,421 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+from collections import Counter
+
+import numpy as np
+
+from pathbranch.birthday_engine import BirthdayEngine
+
+# -------------------- Closed-form path families --------------------
+#
+# Each recognizer is fn(path, calc) -> float | None. It inspects one extracted
+# path (list of (condition, 'True'/'False') plus the final ('Statements', ...))
+# and returns the exact path probability when the path belongs to its family,
+# or None to let the next recognizer (and finally enumeration) try.
+#
+# ProbabilityCalculator.calculate_path_probabilities consults CLOSED_FORMS in
+# order and records hits in a ClosedFormStats so we can see which programs
+# still escape to brute force.
+
+CLOSED_FORMS = []
+
+
+def closed_form(name):
+    """Decorator: register a recognizer under 'name' (appended, so order is priority)."""
+    def deco(fn):
+        CLOSED_FORMS.append((name, fn))
+        return fn
+    return deco
+
+
+class ClosedFormStats:
+    def __init__(self):
+        self.hits = Counter()
+        self.enumerated = 0
+
+    def record(self, name):
+        if name is None:
+            self.enumerated += 1
+        else:
+            self.hits[name] += 1
+
+    def report(self):
+        total = sum(self.hits.values()) + self.enumerated
+        rows = {name: n for name, n in self.hits.most_common()}
+        rows['enumeration'] = self.enumerated
+        rows['hit_rate'] = (sum(self.hits.values()) / total) if total else 0.0
+        return rows
+
+
+def match_closed_form(path, calc):
+    """Return (name, probability) from the first recognizer that accepts 'path', else None."""
+    for name, fn in CLOSED_FORMS:
+        p = fn(path, calc)
+        if p is not None:
+            return name, p
+    return None
+
+
+# -------------------- Shared helpers --------------------
+
+def _predicates(path):
+    return [(c, o) for c, o in path if c != 'Statements']
+
+
+def _parse(cond):
+    try:
+        return ast.parse(cond.strip(), mode='eval').body
+    except SyntaxError:
+        return None
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, SyntaxError, TypeError):
+        return None
+
+
+def _weights(calc, var):
+    """(values, probs) arrays for one variable under the calculator's domain/pmf; None without a pmf entry."""
+    if calc.pmf and var not in calc.pmf:
+        return None
+    values = list(calc.domain[var])
+    if calc.pmf:
+        probs = np.array([calc.pmf[var].get(x, 0.0) for x in values], dtype=float)
+    else:
+        probs = np.full(len(values), 1.0 / len(values)) if values else np.zeros(0)
+    return values, probs
+
+
+def _uniform_size(calc, variables):
+    """Common support size if all 'variables' are uniform over equal-size domains, else None."""
+    if any(v not in calc.domain for v in variables):
+        return None
+    sizes = {len(list(calc.domain[v])) for v in variables}
+    if len(sizes) != 1:
+        return None
+    if calc.pmf:
+        for v in variables:
+            if v not in calc.pmf:
+                return None
+            ws = {round(w, 15) for w in calc.pmf[v].values()}
+            if len(ws) != 1 or len(calc.pmf[v]) != len(list(calc.domain[v])):
+                return None
+    return sizes.pop()
+
+
+# -------------------- Birthday first-collision chain --------------------
+
+def _birthday_pair(cond):
+    """(i, j) with i > j for a condition 'b<i> == b<j>', else None."""
+    node = _parse(cond)
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], ast.Eq)):
+        return None
+    names = (node.left, node.comparators[0])
+    if not all(isinstance(n, ast.Name) and n.id[:1] == 'b' and n.id[1:].isdigit() for n in names):
+        return None
+    i, j = (int(n.id[1:]) for n in names)
+    return (i, j) if i > j else None
+
+
+def _is_birthday_chain(path):
+    """
+    True when the path is a prefix of the unrolled first-collision chain: every
+    predicate is 'b<i> == b<j>', all False except possibly the last, and the
+    False ones cover every pair before the final hit (or every pair of b0..bK
+    for the all-distinct path), so the chain formula applies.
+    """
+    preds = _predicates(path)
+    if not preds:
+        return False
+    pairs = [_birthday_pair(cond) for cond, _ in preds]
+    if None in pairs or any(o != 'False' for _, o in preds[:-1]):
+        return False
+    if preds[-1][1] == 'True':
+        (i, j), earlier = pairs[-1], set(pairs[:-1])
+        need = {(k, l) for k in range(i) for l in range(k)}
+        return need <= earlier and all(k < i or (k == i and l != j) for k, l in earlier)
+    top = max(i for i, _ in pairs)
+    return set(pairs) == {(k, l) for k in range(top + 1) for l in range(k)}
+
+
+@closed_form('birthday_chain')
+def birthday_chain(path, calc):
+    if not _is_birthday_chain(path):
+        return None
+    S = calc._uniform_domain_size()
+    if S is None:
+        return None
+    engine = calc._birthday_engine(S)
+    return engine.path_probability(path) if engine else None
+
+
+# -------------------- All-distinct chains --------------------
+
+def _inequality_pairs(cond, outcome):
+    """Pairs (a, b) asserted distinct by (cond, outcome), or None if it is anything else."""
+    node = _parse(cond)
+    if node is None:
+        return None
+    positive = outcome == 'True'
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        node, positive = node.operand, not positive
+    parts = node.values if (positive and isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And)) else [node]
+    pairs = []
+    for part in parts:
+        if not (isinstance(part, ast.Compare) and len(part.ops) == 1):
+            return None
+        left, op, right = part.left, part.ops[0], part.comparators[0]
+        distinct_op = ast.NotEq if positive else ast.Eq
+        if isinstance(op, distinct_op) and isinstance(left, ast.Name) and isinstance(right, ast.Name):
+            pairs.append((left.id, right.id))
+        elif (isinstance(op, ast.NotIn if positive else ast.In) and isinstance(left, ast.Name)
+              and isinstance(right, (ast.Tuple, ast.List, ast.Set))
+              and all(isinstance(e, ast.Name) for e in right.elts)):
+            pairs.extend((left.id, e.id) for e in right.elts)
+        else:
+            return None
+    return pairs
+
+
+@closed_form('all_distinct')
+def all_distinct(path, calc):
+    """
+    Paths whose every step asserts pairwise distinctness (x != y True, x == y False,
+    x not in (a, b)) covering all pairs of n identically distributed variables:
+    P = P(n draws pairwise distinct). Also covers coupon-style 'each draw is new' chains.
+    """
+    preds = _predicates(path)
+    if not preds:
+        return None
+    edges = set()
+    for cond, outcome in preds:
+        pairs = _inequality_pairs(cond, outcome)
+        if pairs is None:
+            return None
+        edges.update(frozenset(p) for p in pairs if p[0] != p[1])
+    names = sorted({v for e in edges for v in e})
+    n = len(names)
+    if len(edges) != n * (n - 1) // 2:
+        return None
+    if any(v not in calc.domain for v in names):
+        return None
+    if calc.pmf:
+        if any(v not in calc.pmf for v in names):
+            return None
+        tables = {tuple(sorted(calc.pmf[v].items())) for v in names}
+        if len(tables) != 1:
+            return None
+        return BirthdayEngine(pmf=dict(tables.pop())).distinct(n)
+    S = _uniform_size(calc, names)
+    if S is None or len({tuple(calc.domain[v]) for v in names}) != 1:
+        return None
+    return BirthdayEngine(S=S).distinct(n)
+
+
+# -------------------- Comparison of two independent inputs --------------------
+
+_CMP = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+        ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal}
+_NEG = {ast.Lt: ast.GtE, ast.LtE: ast.Gt, ast.Gt: ast.LtE, ast.GtE: ast.Lt,
+        ast.Eq: ast.NotEq, ast.NotEq: ast.Eq}
+
+
+@closed_form('two_input_compare')
+def two_input_compare(path, calc):
+    """
+    Single-step paths 'x op y' (min/max/eq of two draws, e.g. randminoftwo,
+    randmaxoftwo, randeqloftwo): P = sum_x P(x) * P(y op' x) via sorted cumulative
+    sums, O(n log n) instead of O(n^2).
+    """
+    preds = _predicates(path)
+    if len(preds) != 1:
+        return None
+    node = _parse(preds[0][0])
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1
+            and isinstance(node.left, ast.Name) and isinstance(node.comparators[0], ast.Name)):
+        return None
+    x, y = node.left.id, node.comparators[0].id
+    op = type(node.ops[0])
+    if x == y or op not in _CMP or x not in calc.domain or y not in calc.domain:
+        return None
+    if preds[0][1] == 'False':
+        op = _NEG[op]
+
+    wx, wy = _weights(calc, x), _weights(calc, y)
+    if wx is None or wy is None:
+        return None
+    (xv, xp), (yv, yp) = wx, wy
+    try:
+        xv, yv = np.asarray(xv, dtype=float), np.asarray(yv, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    order = np.argsort(yv, kind='stable')
+    ys, yps = yv[order], yp[order]
+    cum = np.concatenate([[0.0], np.cumsum(yps)])  # cum[k] = P(y among the k smallest values)
+    lo = cum[np.searchsorted(ys, xv, side='left')]   # P(y < x)
+    hi = cum[np.searchsorted(ys, xv, side='right')]  # P(y <= x)
+    eq = hi - lo
+    p_y_given_x = {
+        ast.Lt: 1.0 - hi,   # x < y
+        ast.LtE: 1.0 - lo,  # x <= y
+        ast.Gt: lo,         # x > y
+        ast.GtE: hi,        # x >= y
+        ast.Eq: eq,
+        ast.NotEq: 1.0 - eq,
+    }[op]
+    return float(np.dot(xp, p_y_given_x))
+
+
+# -------------------- Threshold tests on a single input --------------------
+
+def _single_var_test(cond, outcome):
+    """Return (var, op, const) for 'x op c' / 'c op x' (negated when outcome is False), else None."""
+    node = _parse(cond)
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1):
+        return None
+    left, op, right = node.left, type(node.ops[0]), node.comparators[0]
+    if op not in _CMP:
+        return None
+    if isinstance(left, ast.Name) and _literal(right) is not None:
+        var, const = left.id, _literal(right)
+    elif isinstance(right, ast.Name) and _literal(left) is not None:
+        flip = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE,
+                ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+        var, const, op = right.id, _literal(left), flip[op]
+    else:
+        return None
+    if outcome == 'False':
+        op = _NEG[op]
+    return var, op, const
+
+
+@closed_form('uniform_threshold')
+def uniform_threshold(path, calc):
+    """Conjunctions of 'x op c' on one input: mass of the matching values, O(n)."""
+    preds = _predicates(path)
+    if not preds:
+        return None
+    tests = [_single_var_test(c, o) for c, o in preds]
+    if any(t is None for t in tests) or len({t[0] for t in tests}) != 1:
+        return None
+    var = tests[0][0]
+    if var not in calc.domain:
+        return None
+    weights = _weights(calc, var)
+    if weights is None:
+        return None
+    values, probs = weights
+    try:
+        arr = np.asarray(values, dtype=float)
+        mask = np.ones(len(arr), dtype=bool)
+        for _, op, const in tests:
+            mask &= _CMP[op](arr, float(const))
+    except (TypeError, ValueError):
+        return None
+    return float(probs[mask].sum())
+
+
+# -------------------- Linear Freivalds rows over GF(p) --------------------
+
+def _linear_coeffs(node, mod):
+    """Coefficient dict {var: c, 1: const} (mod p) of a linear integer expression, else None."""
+    if isinstance(node, ast.Name):
+        return {node.id: 1}
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return {1: node.value % mod}
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        inner = _linear_coeffs(node.operand, mod)
+        if inner is None:
+            return None
+        sign = -1 if isinstance(node.op, ast.USub) else 1
+        return {k: (sign * v) % mod for k, v in inner.items()}
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            a, b = _linear_coeffs(node.left, mod), _linear_coeffs(node.right, mod)
+            if a is None or b is None:
+                return None
+            sign = 1 if isinstance(node.op, ast.Add) else -1
+            out = dict(a)
+            for k, v in b.items():
+                out[k] = (out.get(k, 0) + sign * v) % mod
+            return out
+        if isinstance(node.op, ast.Mult):
+            a, b = _linear_coeffs(node.left, mod), _linear_coeffs(node.right, mod)
+            if a is None or b is None:
+                return None
+            if set(a) <= {1}:
+                a, b = b, a
+            if not set(b) <= {1}:
+                return None  # product of two variables: not linear
+            c = b.get(1, 0)
+            return {k: (v * c) % mod for k, v in a.items()}
+    return None
+
+
+def _mod_row(cond, outcome):
+    """Match '((<linear>) % p) != 0' or '== 0'; return (coeffs, p, is_zero) or None."""
+    node = _parse(cond)
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1
+            and isinstance(node.ops[0], (ast.Eq, ast.NotEq)) and _literal(node.comparators[0]) == 0):
+        return None
+    lhs = node.left
+    if not (isinstance(lhs, ast.BinOp) and isinstance(lhs.op, ast.Mod)):
+        return None
+    mod = _literal(lhs.right)
+    if not (isinstance(mod, int) and mod >= 2 and all(mod % d for d in range(2, int(mod ** 0.5) + 1))):
+        return None
+    coeffs = _linear_coeffs(lhs.left, mod)
+    if coeffs is None:
+        return None
+    is_zero = isinstance(node.ops[0], ast.Eq) == (outcome == 'True')
+    return coeffs, mod, is_zero
+
+
+def _rank_mod(rows, mod):
+    """Rank over GF(mod) of a list of coefficient vectors."""
+    basis = []  # (pivot, row)
+    for row in rows:
+        row = [v % mod for v in row]
+        for pivot, b in basis:
+            if row[pivot]:
+                f = row[pivot]
+                row = [(r - f * x) % mod for r, x in zip(row, b)]
+        nz = next((i for i, v in enumerate(row) if v), None)
+        if nz is not None:
+            inv = pow(row[nz], mod - 2, mod)
+            basis.append((nz, [(v * inv) % mod for v in row]))
+    return len(basis)
+
+
+@closed_form('freivalds_rows')
+def freivalds_rows(path, calc):
+    """
+    Chains of Freivalds row checks '((d_i . r) % p) != 0' with r uniform over GF(p)
+    ({0,1} for p = 2). All rows zero has probability p^-rank(Z); with one final
+    nonzero row v it is p^-rank(Z) - p^-rank(Z + v).
+    """
+    preds = _predicates(path)
+    if not preds:
+        return None
+    rows = [_mod_row(c, o) for c, o in preds]
+    if any(r is None for r in rows) or len({r[1] for r in rows}) != 1:
+        return None
+    mod = rows[0][1]
+    names = sorted({k for coeffs, _, _ in rows for k in coeffs if k != 1})
+    if any(r[0].get(1, 0) for r in rows):
+        return None  # affine rows: not the homogeneous Freivalds test
+    if calc.pmf or any(v not in calc.domain or sorted(calc.domain[v]) != list(range(mod)) for v in names):
+        return None
+    zero = [[c.get(v, 0) for v in names] for c, _, z in rows if z]
+    nonzero = [[c.get(v, 0) for v in names] for c, _, z in rows if not z]
+    if len(nonzero) > 1:
+        return None
+    p_zero = float(mod) ** -_rank_mod(zero, mod)
+    if not nonzero:
+        return p_zero
+    return p_zero - float(mod) ** -_rank_mod(zero + nonzero, mod)
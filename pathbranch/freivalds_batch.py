@@ -0,0 +1,172 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import math
+import time
+
+import numpy as np
+
+# ---------- Batched Freivalds runner ----------
+#
+# frievaldss.freivald draws one 0/1 vector r per trial and forms B r, A(B r)
+# and C r with Python loops. Here a block of trials is one (n, t) random 0/1
+# matrix R, and every column is a trial:
+#   D = A @ (B @ R) - C @ R        (reduced mod MOD after each product if given)
+# A column passes when it is all zero; a K-round test (isProduct) passes when
+# its K columns all pass. The products run in float64 (BLAS) whenever every
+# partial sum stays below 2^53, so they are exact; otherwise in int64, or in
+# Python ints as a last resort.
+#
+# For MOD = 2, r is uniform over GF(2)^n and a round passes with probability
+# 2^-rank(AB - C mod 2), the value modmain.calculate_freivalds_k_prob gets by
+# enumerating r (closed_forms.freivalds_rows for the path analyzer).
+# exact_pass_prob computes that rank with NumPy, so the check scales to
+# n in the thousands.
+
+CHUNK = 1 << 22  # entries of R drawn per block
+EXACT_FLOAT = 2 ** 53
+
+
+def _dtype(bound):
+    if bound < EXACT_FLOAT:
+        return np.float64
+    if bound < 2 ** 62:
+        return np.int64
+    return object
+
+
+class FreivaldsBatch:
+    def __init__(self, A, B, C, MOD=2):
+        """
+        A, B, C: n x n integer matrices (lists or arrays); MOD=None checks AB = C over the integers.
+        """
+        A, B, C = (np.asarray(M) for M in (A, B, C))
+        if not (A.shape == B.shape == C.shape and A.ndim == 2 and A.shape[0] == A.shape[1]):
+            raise ValueError("A, B and C must be n x n matrices of the same size")
+        self.n = A.shape[0]
+        self.MOD = MOD
+        if MOD:
+            A, B, C = (np.mod(M.astype(object), MOD) for M in (A, B, C))
+            top = [MOD - 1] * 3
+        else:
+            top = [max(abs(int(x)) for x in M.flat) for M in (A, B, C)]
+        # largest partial sum of A @ (B @ R) and C @ R with R in {0, 1}
+        br = self.n * top[1] if not MOD else MOD - 1
+        self.dtype = _dtype(max(self.n * top[0] * max(br, 1), self.n * top[2]) + 1)
+        self.A, self.B, self.C = (M.astype(self.dtype) for M in (A, B, C))
+
+    def residual(self, R):
+        """A @ (B @ R) - C @ R for an (n, t) 0/1 block R; one column per trial."""
+        R = R.astype(self.dtype)
+        BR = self.B @ R
+        if self.MOD:
+            BR = np.mod(BR, self.MOD)
+            return np.mod(self.A @ BR - self.C @ R, self.MOD)
+        return self.A @ BR - self.C @ R
+
+    def run(self, trials, K=1, seed=None, chunk=CHUNK):
+        """
+        'trials' runs of the K-round test; 'hits' counts runs that pass (all K rounds
+        zero), so estimate is the false-positive rate when AB != C. Same fields as
+        simulate() plus n, K and modulus.
+        """
+        t0 = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        per_block = max(1, chunk // (self.n * K))  # runs per block
+        hits = 0
+        for start in range(0, trials, per_block):
+            t = min(per_block, trials - start)
+            R = rng.integers(0, 2, size=(self.n, t * K), dtype=np.int8)
+            passed = ~np.any(self.residual(R) != 0, axis=0)
+            hits += int(np.count_nonzero(passed.reshape(t, K).all(axis=1)))
+        est = hits / trials if trials else float("nan")
+        return {
+            "n": self.n,
+            "K": K,
+            "modulus": self.MOD,
+            "trials": trials,
+            "hits": hits,
+            "estimate": est,
+            "stderr": math.sqrt(est * (1 - est) / trials) if trials else float("nan"),
+            "seconds": time.perf_counter() - t0,
+        }
+
+    def exact_pass_prob(self, K=1):
+        """2^-(K * rank(AB - C mod 2)); only defined for MOD = 2."""
+        if self.MOD != 2:
+            raise ValueError("The rank formula needs r uniform over GF(p); with 0/1 draws that is MOD = 2")
+        return 2.0 ** -(K * rank_gf2(self.difference()))
+
+    def difference(self):
+        """AB - C (mod MOD), the matrix every round tests against r."""
+        D = self.A @ self.B
+        if self.MOD:
+            D = np.mod(D, self.MOD)
+            return np.mod(D - self.C, self.MOD).astype(np.int64)
+        return D - self.C
+
+
+def rank_gf2(M):
+    """Rank over GF(2) by elimination on bit-packed rows."""
+    rows = np.packbits(np.mod(np.asarray(M), 2).astype(np.uint8), axis=1)
+    n_rows, n_cols = np.shape(M)
+    rank = 0
+    for c in range(n_cols):
+        byte, bit = c >> 3, np.uint8(0x80 >> (c & 7))
+        below = np.flatnonzero(rows[rank:, byte] & bit) + rank
+        if not len(below):
+            continue
+        p = below[0]
+        rows[[rank, p]] = rows[[p, rank]]
+        rows[below[1:]] ^= rows[rank]
+        rank += 1
+        if rank == n_rows:
+            break
+    return rank
+
+
+def planted_instance(n, defect_rank, seed=None, high=2):
+    """(A, B, C) with entries in [0, high) and C = AB + X Y, X Y an n x n 0/1 product of inner size defect_rank."""
+    rng = np.random.default_rng(seed)
+    A = rng.integers(0, high, size=(n, n))
+    B = rng.integers(0, high, size=(n, n))
+    X = rng.integers(0, 2, size=(n, defect_rank))
+    Y = rng.integers(0, 2, size=(defect_rank, n))
+    C = A.astype(np.float64) @ B.astype(np.float64) + np.mod(X @ Y, 2)
+    return A, B, C.astype(np.int64)
+
+
+# --------------------- Demo: empirical false positives vs exact ---------------------
+if __name__ == "__main__":
+    from pathbranch.modmain import calculate_freivalds_k_prob
+
+    # small instances: against the enumeration in modmain
+    small = [
+        ("frievaldss demo", ([[1, 21], [3, 4]], [[1, 11], [1, 1]], [[1, 2], [1, 4]])),
+        ("modmain demo", ([[1, 2], [3, 4]], [[1, 1], [1, 1]], [[1, 2], [1, 4]])),
+        ("n=8 rank-2 defect", tuple(M.tolist() for M in planted_instance(8, 2, seed=3))),
+    ]
+    for name, (A, B, C) in small:
+        for K in (1, 3):
+            exact = calculate_freivalds_k_prob(A, B, C, len(A), K)["p_fp_k"]
+            r = FreivaldsBatch(A, B, C).run(200_000, K=K, seed=1)
+            print(f"{name:>18} K={K}: batch {r['estimate']:.5f} ± {r['stderr']:.5f}  "
+                  f"modmain {exact:.5f}  rank {FreivaldsBatch(A, B, C).exact_pass_prob(K):.5f}")
+
+    # n in the thousands: against the NumPy rank
+    for n, defect, trials in [(2000, 1, 20_000), (2000, 3, 20_000), (3000, 2, 10_000)]:
+        A, B, C = planted_instance(n, defect, seed=n + defect)
+        fb = FreivaldsBatch(A, B, C)
+        t0 = time.perf_counter()
+        exact = fb.exact_pass_prob()
+        t_exact = time.perf_counter() - t0
+        r = fb.run(trials, seed=1)
+        print(f"n={n} rank-{defect} defect: batch {r['estimate']:.5f} ± {r['stderr']:.5f} "
+              f"({trials / r['seconds']:,.0f} trials/s)  exact {exact:.5f} ({t_exact:.2f}s)")
+
+    # integer arithmetic, one perturbed entry: passes iff r_j = 0
+    A, B, C = planted_instance(2000, 0, seed=5, high=10)
+    C[17, 1234] += 7
+    r = FreivaldsBatch(A, B, C, MOD=None).run(20_000, K=2, seed=1)
+    print(f"n=2000 over Z, one entry off, K=2: batch {r['estimate']:.5f} ± {r['stderr']:.5f}  exact 0.25000")
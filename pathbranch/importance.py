@@ -0,0 +1,200 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import math
+import re
+import time
+import warnings
+
+import numpy as np
+
+from pathbranch.vector_eval import VECTOR_HELPERS, compile_vectorized
+
+# ---------- Importance sampling for rare paths ----------
+#
+# A path is a list of (condition, 'True'/'False') pairs. Plain Monte Carlo needs
+# ~100/P draws to see a path of probability P, so tail paths (P ~ 1e-12) are
+# never hit. Here the inputs are drawn one variable at a time from a proposal
+# tilted by the path itself: every condition is attached to the last of its
+# variables in draw order, and that variable is drawn from p restricted to the
+# values that keep all its attached conditions as the path requires. The
+# likelihood ratio p(x)/q(x) is the product of the restricted masses, so
+#   estimate = mean(prod_v P(v keeps its conditions | earlier draws))
+# is unbiased. When each condition is decided by its own last variable and
+# later ones can always be met (equality/inequality chains, Freivalds rows,
+# coin runs) every draw has the same weight and the estimate is exact; draws
+# that reach a dead end (no admissible value) get weight 0 and only add variance.
+#
+# Dead ends come from conditions between several variables that the draw order
+# only checks at the last one (x < y < z < 4 leaves x and y free until z). Before
+# sampling, the unary and binary conditions are made arc-consistent (AC-3 on
+# value-pair tables), so every variable is drawn from the values that still
+# have a partner in each of its binary conditions; the restricted masses are
+# part of the weight as before. When the effective sample size still collapses,
+# estimate() warns.
+
+NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
+CHUNK = 1 << 12  # draws per block; each block evaluates (CHUNK, |domain|) candidate tables
+TABLE_LIMIT = 1 << 22  # largest value-pair table built for a binary condition
+ESS_WARN = 0.01  # warn when the effective sample size is below this fraction of the draws
+
+
+class ImportanceSampler:
+    def __init__(self, variables, domain, pmf=None):
+        """variables, domain, pmf: as for ProbabilityCalculator (pmf None = uniform)."""
+        self.variables = variables
+        self.domain = domain
+        self.pmf = pmf
+
+    def _base(self, v):
+        values = np.asarray(list(self.domain[v]))
+        if self.pmf and v in self.pmf:
+            p = np.array([self.pmf[v].get(x, 0.0) for x in values.tolist()], dtype=float)
+            return values, p / p.sum()
+        return values, np.full(len(values), 1.0 / len(values))
+
+    def plan(self, path):
+        """Draw order and, per variable, the (compiled condition, wanted outcome) pairs it decides."""
+        order = [v for v in self.variables
+                 if any(v in NAME_RE.findall(c) for c, _ in path if c != 'Statements')]
+        rank = {v: i for i, v in enumerate(order)}
+        stages = {v: [] for v in order}
+        for cond, outcome in path:
+            if cond == 'Statements':
+                continue
+            names = [n for n in NAME_RE.findall(cond) if n in rank]
+            if not names:
+                raise ValueError(f"Condition uses no random input: {cond}")
+            stages[max(names, key=rank.get)].append((compile_vectorized(cond), outcome == 'True'))
+        return order, stages
+
+    def _consistent(self, path, base):
+        """Per variable, the values kept by arc consistency over the unary and binary conditions."""
+        keep = {v: p > 0 for v, (_, p) in base.items()}
+        helpers = dict(VECTOR_HELPERS)
+        tables = []
+        for cond, outcome in path:
+            if cond == 'Statements':
+                continue
+            names = sorted({n for n in NAME_RE.findall(cond) if n in keep})
+            if len(names) > 2 or np.prod([len(base[v][0]) for v in names]) > TABLE_LIMIT:
+                continue
+            grids = np.ix_(*[base[v][0] for v in names])
+            try:
+                ok = eval(compile_vectorized(cond), helpers, dict(zip(names, grids)))
+            except Exception:
+                continue  # does not vectorize: checked only while drawing
+            ok = np.broadcast_to(np.asarray(ok, dtype=bool), tuple(len(g.ravel()) for g in grids)) == (outcome == 'True')
+            if len(names) == 1:
+                keep[names[0]] &= ok
+            else:
+                tables.append((names[0], names[1], ok))
+        changed = True
+        while changed:
+            changed = False
+            for a, b, ok in tables:
+                ka = keep[a] & (ok & keep[b][None, :]).any(axis=1)
+                kb = keep[b] & (ok & ka[:, None]).any(axis=0)
+                changed |= bool((ka != keep[a]).any() or (kb != keep[b]).any())
+                keep[a], keep[b] = ka, kb
+        return keep
+
+    def _block(self, rng, m, order, stages, base):
+        """Log-weights of m sequential draws (-inf for draws that hit a dead end)."""
+        env, log_w = {}, np.zeros(m)
+        helpers = dict(VECTOR_HELPERS)
+        for v in order:
+            values, p = base[v]
+            if not stages[v]:
+                mass = p.sum()
+                env[v] = values[rng.choice(len(p), size=m, p=p / mass)]
+                log_w += math.log(mass)
+                continue
+            # candidate table: row = draw so far, column = value of v
+            cand = {u: x[:, None] for u, x in env.items()}
+            cand[v] = values[None, :]
+            ok = np.broadcast_to(p > 0, (m, len(values))).copy()
+            for code, want in stages[v]:
+                ok &= np.broadcast_to(np.asarray(eval(code, helpers, cand), dtype=bool), ok.shape) == want
+            cdf = np.cumsum(ok * p, axis=1)
+            mass = cdf[:, -1]
+            u = rng.random(m) * mass
+            k = np.minimum((cdf <= u[:, None]).sum(axis=1), len(values) - 1)
+            with np.errstate(divide="ignore"):
+                log_w += np.log(mass)
+            env[v] = values[k]
+        return log_w
+
+    def estimate(self, path, n=100_000, seed=None):
+        """
+        Importance-sampling estimate of P(path).
+        Returns {'estimate', 'stderr', 'rel_error', 'ess', 'hits', 'trials', 'seconds'};
+        'hits' counts draws with nonzero weight, 'ess' is their effective sample size.
+        """
+        t0 = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        order, stages = self.plan(path)
+        base = {v: self._base(v) for v in order}
+        keep = self._consistent(path, base)
+        if all(keep[v].any() for v in order):
+            # unnormalized: the mass a variable loses to arc consistency stays in its weight
+            base = {v: (values, p * keep[v]) for v, (values, p) in base.items()}
+            w = np.concatenate([np.exp(self._block(rng, min(CHUNK, n - s), order, stages, base))
+                                for s in range(0, n, CHUNK)])
+        else:
+            w = np.zeros(n)  # some variable has no admissible value: the path is impossible
+        est = w.mean()
+        stderr = w.std(ddof=1) / math.sqrt(n) if n > 1 else math.inf
+        ess = float(w.sum() ** 2 / (w * w).sum()) if est else 0.0
+        if est and ess < ESS_WARN * n:
+            warnings.warn(f"Importance weights collapsed: effective sample size {ess:.0f} of {n} draws; "
+                          f"the estimate {est:.3e} ± {stderr / est:.0%} is unreliable", stacklevel=2)
+        return {
+            "estimate": float(est),
+            "stderr": float(stderr),
+            "rel_error": float(stderr / est) if est else math.inf,
+            "ess": ess,
+            "hits": int(np.count_nonzero(w)),
+            "trials": n,
+            "seconds": time.perf_counter() - t0,
+        }
+
+
+# --------------------- Demo: tail paths vs exact values ---------------------
+if __name__ == "__main__":
+    from pathbranch.birthday_engine import BirthdayEngine
+    from pathbranch.limitedpathmin import build_birthday_paths
+
+    # six equal birthdays: 365^-5 ~ 1.5e-13
+    people = [f"b{i}" for i in range(6)]
+    chain = [(f"b{i} == b{i - 1}", 'True') for i in range(1, 6)] + [('Statements', ['return 1'])]
+
+    # first collision only at person 60, with person 0: distinct(60) / 365 ~ 1.6e-5
+    K = 60
+    crowd = [f"b{i}" for i in range(K + 1)]
+    late = next(p for p in build_birthday_paths(K) if p[-2][0] == f"b{K} == b0" and p[-2][1] == 'True')
+
+    # Freivalds false positive in 40 independent rounds (row d = (0, 1) mod 2): 2^-40 ~ 9.1e-13
+    bits = [f"r_1_{k}" for k in range(40)]
+    frev = [(f"(({v}) % 2) != 0", 'False') for v in bits] + [('Statements', ['return True'])]
+
+    # biased coins: ten heads at P(heads) = 0.05 -> ~9.8e-14
+    coins = [f"c{i}" for i in range(10)]
+    heads = [(f"{c} == 1", 'True') for c in coins] + [('Statements', ['return 1'])]
+    coin_pmf = {c: {0: 0.95, 1: 0.05} for c in coins}
+
+    # a path that is not a clean chain: x < y < z with x, y, z in 1..100 and z < 4 (only 1 < 2 < 3)
+    xyz = [('x < y', 'True'), ('y < z', 'True'), ('z < 4', 'True'), ('Statements', ['return 1'])]
+
+    for name, variables, domain, pmf, path, exact, n in [
+        ("equal chain", people, {v: range(365) for v in people}, None, chain, 365.0 ** -5, 100_000),
+        ("late collision", crowd, {v: range(365) for v in crowd}, None, late,
+         BirthdayEngine(S=365).distinct(K) / 365, 5_000),
+        ("freivalds K=40", bits, {v: [0, 1] for v in bits}, None, frev, 2.0 ** -40, 100_000),
+        ("10 biased heads", coins, {c: [0, 1] for c in coins}, coin_pmf, heads, 0.05 ** 10, 100_000),
+        ("x<y<z<4", list("xyz"), {v: range(1, 101) for v in "xyz"}, None, xyz, 1e-6, 100_000),
+    ]:
+        r = ImportanceSampler(variables, domain, pmf).estimate(path, n=n, seed=1)
+        print(f"{name:>15}: IS {r['estimate']:.4e} ± {r['rel_error']:.2%} ({r['hits']}/{r['trials']} nonzero, "
+              f"ESS {r['ess']:.0f}, {r['seconds']:.2f}s)  exact {exact:.4e}")
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import re
 from itertools import product
 from functools import lru_cache
+from pathbranch.birthday_engine import BirthdayEngine
 
 # -------------------- Utility: parse vars used in an expression --------------------
 NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
@@ -23,6 +28,7 @@ class ProbabilityCalculator:
         self.variables = variables
         self.domain = domain
         self.varset = set(variables)
+        self._bday = None  # BirthdayEngine, built on first birthday-shaped path
 
     # ---------- Core evaluation (compiled + small env) ----------
     @staticmethod
@@ -69,96 +75,15 @@ class ProbabilityCalculator:
         t, T = self._count_pair(condition, given_condition)
         return t / T if T else 0.0
 
-    # ---------- Birthday closed-form detection (strict) ----------
-    @staticmethod
-    def _match_birthday_eq(cond: str):
-        """Return (i, j) iff cond is exactly 'b<i> == b<j>' with i>j; else None."""
-        m = re.fullmatch(r'\s*b(\d+)\s*==\s*b(\d+)\s*', cond)
-        if not m:
-            return None
-        i, j = int(m.group(1)), int(m.group(2))
-        return (i, j) if i > j else None
-
-    @staticmethod
-    def _is_birthday_return1_step(step):
-        """Detect a birthday 'hit' step ('bI == bJ','True') with I>J."""
-        cond, outcome = step
-        if outcome != 'True':
-            return None
-        return ProbabilityCalculator._match_birthday_eq(cond)
-
-    @staticmethod
-    def _birthday_all_distinct_K(path):
-        """
-        If 'path' is the canonical all-distinct birthday path:
-          - every predicate is ('bI == bJ','False') with I>J
-          - final step is ('Statements',['return 0'])
-        return K = 1 + max index among used b-variables; else None.
-        """
-        if not path:
-            return None
-        *preds, last = path
-        if not (isinstance(last, tuple) and last[0] == 'Statements'
-                and last[1] in (['return 0'], ('return 0',))):
-            return None
-
-        max_idx = -1
-        for cond, outcome in preds:
-            if outcome != 'False':
-                return None
-            hit = ProbabilityCalculator._match_birthday_eq(cond)
-            if not hit:
-                return None
-            i, j = hit
-            max_idx = max(max_idx, i, j)
-
-        return (max_idx + 1) if max_idx >= 0 else None
-
-    @staticmethod
-    def _path_returns_1(path):
-        return (isinstance(path[-1], tuple)
-                and path[-1][0] == 'Statements'
-                and ('return 1' in path[-1][1]))
-
+    # ---------- Closed-form birthday shortcut (see pathbranch/birthday_engine.py) ----------
     def _birthday_closed_form_prob(self, path, S: int) -> float | None:
         """
-        If the path is a strict birthday unrolled path, return its exact probability.
-        Otherwise return None.
-        Rules:
-          - 'return 1' paths with last positive equality 'b_i == b_j' get p_no(i) * (1/S)
-          - The all-distinct 'return 0' path gets ∏_{t=0}^{K-1} (1 - t/S)
+        If the path is a birthday unrolled path, return its exact probability; otherwise None.
+        The engine keeps log-space prefix products, so each path costs O(1).
         """
-        # 'return 1' (collision) case
-        if self._path_returns_1(path):
-            last_hit = None
-            for step in path[::-1]:
-                if step[0] == 'Statements':
-                    continue
-                hit = self._is_birthday_return1_step(step)
-                if hit:
-                    last_hit = hit
-                    break
-            if not last_hit:
-                return None
-            i, _ = last_hit
-            p_no = 1.0
-            for t in range(i):
-                if S - t <= 0:
-                    return 0.0
-                p_no *= (S - t) / S
-            return p_no * (1.0 / S)
-
-        # 'return 0' (all distinct) case
-        K = self._birthday_all_distinct_K(path)
-        if K is not None:
-            p_all = 1.0
-            for t in range(K):
-                if S - t <= 0:
-                    return 0.0
-                p_all *= (S - t) / S
-            return p_all
-
-        return None  # not a recognized birthday path
+        if self._bday is None or self._bday.S != S:
+            self._bday = BirthdayEngine(S=S)
+        return self._bday.path_probability(path)
 
     # ---------- Main path probability routine ----------
     def calculate_path_probabilities(self, paths):
@@ -1,6 +1,11 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import re
 from itertools import product
 from functools import lru_cache
+from pathbranch.birthday_engine import BirthdayEngine
 
 NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
 
@@ -20,6 +25,7 @@ class ProbabilityCalculator:
         self.variables = variables
         self.domain = domain
         self.varset = set(variables)
+        self._bday = None  # BirthdayEngine, built on first birthday-shaped path
 
     # ---------- Core evaluation (compiled + small env) ----------
     @staticmethod
@@ -67,93 +73,15 @@ class ProbabilityCalculator:
         t, T = self._count_pair(condition, given_condition)
         return t / T if T else 0.0
 
-    # ---------- Closed-form birthday shortcut detection ----------
-    @staticmethod
-    def _is_birthday_return1_step(step):
-        """
-        Detects ('bX == bY', 'True') form.
-        Returns (i, j) if match else None.
-        """
-        cond, outcome = step
-        if outcome != 'True':
-            return None
-        m = re.fullmatch(r'\s*b(\d+)\s*==\s*b(\d+)\s*', cond)
-        if not m:
-            return None
-        i, j = int(m.group(1)), int(m.group(2))
-        if i <= j:
-            return None  # we expect i>j in the unrolled chain
-        return (i, j)
-
-    @staticmethod
-    def _is_birthday_all_distinct_path(path):
-        """
-        Detects the final all-distinct path of the unrolled chain:
-        ... all comparisons False ..., then ('Statements', ['return 0'])
-        We approximate by requiring that every non-final step is ('...','False')
-        and the final step returns 0.
-        """
-        if not path:
-            return False
-        *preds, last = path
-        if not (isinstance(last, tuple) and last[0] == 'Statements' and last[1] in (['return 0'], ('return 0',))):
-            return False
-        for cond, outcome in preds:
-            if outcome != 'False':
-                return False
-        return True
-
-    @staticmethod
-    def _path_returns_1(path):
-        return isinstance(path[-1], tuple) and path[-1][0] == 'Statements' and ('return 1' in path[-1][1])
-
+    # ---------- Closed-form birthday shortcut (see pathbranch/birthday_engine.py) ----------
     def _birthday_closed_form_prob(self, path, S: int) -> float | None:
         """
-        If the path is a birthday unrolled path (like in LBD), return its exact probability.
-        Otherwise return None.
-        Rules:
-          - Return-1 paths with last positive equality 'b_i == b_j' get p_no(i) * (1/S)
-          - The all-distinct 'return 0' path gets ∏_{t=0}^{K-1} (1 - t/S)
+        If the path is a birthday unrolled path, return its exact probability; otherwise None.
+        The engine keeps log-space prefix products, so each path costs O(1).
         """
-        # 'return 1' case?
-        if self._path_returns_1(path):
-            # Find the last ('bX == bY', 'True') in the path
-            last_hit = None
-            for step in path[::-1]:
-                if step[0] == 'Statements':
-                    continue
-                hit = self._is_birthday_return1_step(step)
-                if hit:
-                    last_hit = hit
-                    break
-            if not last_hit:
-                return None
-            i, j = last_hit
-            # i is the index of the first collision; probability mass for this specific match is:
-            # P_no_collision_up_to_i * (1/S)
-            p_no = 1.0
-            for t in range(i):
-                # distinct among first i => multiply (1 - t/S), t=0..i-1
-                p_no *= (S - t) / S
-            return p_no * (1 / S)
-
-        # 'return 0' all-distinct case?
-        if self._is_birthday_all_distinct_path(path):
-            # K is number of b-variables used in the path (infer max index + 1)
-            max_idx = -1
-            for cond, outcome in path:
-                m = re.findall(r'\bb(\d+)\b', cond) if cond != 'Statements' else []
-                for g in m:
-                    max_idx = max(max_idx, int(g))
-            K = max_idx + 1 if max_idx >= 0 else 0
-            p_all = 1.0
-            for t in range(K):
-                if S - t <= 0:
-                    return 0.0
-                p_all *= (S - t) / S
-            return p_all
-
-        return None  # not a recognized birthday path
+        if self._bday is None or self._bday.S != S:
+            self._bday = BirthdayEngine(S=S)
+        return self._bday.path_probability(path)
 
     # ---------- Main entry: calculate path probabilities ----------
     def calculate_path_probabilities(self, paths):
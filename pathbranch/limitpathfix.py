@@ -1,7 +1,17 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import re
 from itertools import product
 from functools import lru_cache
 
+import numpy as np
+
+from pathbranch.vector_eval import compile_vectorized, eval_mask, fits_int64
+from pathbranch.birthday_engine import BirthdayEngine
+from pathbranch.closed_forms import ClosedFormStats, match_closed_form
+
 NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
 
 def _vars_in(expr: str, allowed: set[str]) -> tuple[str, ...]:
@@ -23,7 +33,10 @@ class ProbabilityCalculator:
         self.variables = variables
         self.domain = domain
         self.varset = set(variables)
+        self._bday = None  # BirthdayEngine, built on first birthday-shaped path
         self.pmf = pmf  # optional
+        self._bounds = None  # {var: max |value|} of integer domains, for the int64 check
+        self.closed_form_stats = ClosedFormStats()
 
     # ---------- Core evaluation (compiled + small env) ----------
     @staticmethod
@@ -31,6 +44,8 @@ class ProbabilityCalculator:
         return bool(eval(code_obj, {}, env))
 
     # ---------- Counting / weighted-summing with restriction + caching ----------
+    CHUNK = 1 << 20  # assignments evaluated per vectorized block (bounds memory)
+
     @lru_cache(maxsize=None)
     def _count_pair(self, cond: str, given: str):
         """
@@ -47,6 +62,71 @@ class ProbabilityCalculator:
         else:
             vars_needed = cond_vars
 
+        bounds = self._int_bounds()
+        if not (fits_int64(cond, bounds) and fits_int64(given or "0", bounds)):
+            # int64 arrays would wrap where Python ints grow (x ** 20, 2 ** (7 * x)): enumerate
+            return self._count_pair_scalar(vars_needed, cond, given)
+        try:
+            return self._count_pair_vectorized(vars_needed, cond, given)
+        except Exception:
+            # condition does not broadcast over arrays (e.g. builtin max): enumerate
+            return self._count_pair_scalar(vars_needed, cond, given)
+
+    def _int_bounds(self):
+        """{var: max |value|} over variables whose domain is all ints or bools (for fits_int64)."""
+        if self._bounds is None:
+            self._bounds = {}
+            for v in self.variables:
+                vals = list(self.domain.get(v, ()))
+                if vals and all(isinstance(x, (int, np.integer, np.bool_)) for x in vals):
+                    self._bounds[v] = max(abs(int(x)) for x in vals)
+        return self._bounds
+
+    def _weight_vectors(self, vars_needed):
+        """Per-variable probability vectors aligned with the domain order; values missing from pmf get 0."""
+        return [np.array([self.pmf[v].get(x, 0.0) for x in self.domain[v]], dtype=float)
+                for v in vars_needed]
+
+    def _count_pair_vectorized(self, vars_needed, cond: str, given: str):
+        """
+        Evaluate the condition masks on whole blocks of the product domain at once.
+        The weight of an assignment is the product of its per-variable probabilities
+        (an entry of the outer product of the weight vectors), so the weighted mass is
+        (mask * weight).sum() per block.
+        """
+        values = [np.asarray(list(self.domain[v])) for v in vars_needed]
+        # bool arrays add and negate as logic (True + True is True); Python bools are ints
+        values = [vals.astype(np.int64) if vals.dtype == bool else vals for vals in values]
+        sizes = tuple(len(vals) for vals in values)
+        weights = self._weight_vectors(vars_needed) if self.pmf else None
+        cond_code = compile_vectorized(cond)
+        given_code = compile_vectorized(given) if given else None
+
+        total = int(np.prod(sizes, dtype=np.int64)) if sizes else 1
+        mass_true = 0.0 if self.pmf else 0
+        mass_total = 0.0 if self.pmf else 0
+        for start in range(0, total, self.CHUNK):
+            stop = min(start + self.CHUNK, total)
+            n = stop - start
+            cols = np.unravel_index(np.arange(start, stop), sizes) if sizes else ()
+            env = {v: vals[c] for v, vals, c in zip(vars_needed, values, cols)}
+
+            given_mask = eval_mask(given_code, env, n) if given_code else np.ones(n, dtype=bool)
+            true_mask = eval_mask(cond_code, env, n) & given_mask
+
+            if weights is not None:
+                w = np.ones(n)
+                for wv, c in zip(weights, cols):
+                    w *= wv[c]
+                mass_total += float((given_mask * w).sum())
+                mass_true += float((true_mask * w).sum())
+            else:
+                mass_total += int(np.count_nonzero(given_mask))
+                mass_true += int(np.count_nonzero(true_mask))
+
+        return mass_true, mass_total
+
+    def _count_pair_scalar(self, vars_needed, cond: str, given: str):
         var_lists = [self.domain[v] for v in vars_needed]
         cond_code = _compile_expr(cond)
         given_code = _compile_expr(given) if given else None
@@ -92,90 +172,44 @@ class ProbabilityCalculator:
         t, T = self._count_pair(condition, given_condition)
         return t / T if T else 0.0
 
-    # ---------- Closed-form birthday shortcut detection (unchanged) ----------
-    @staticmethod
-    def _is_birthday_return1_step(step):
-        cond, outcome = step
-        if outcome != 'True':
-            return None
-        m = re.fullmatch(r'\s*b(\d+)\s*==\s*b(\d+)\s*', cond)
-        if not m:
-            return None
-        i, j = int(m.group(1)), int(m.group(2))
-        if i <= j:
-            return None
-        return (i, j)
-
-    @staticmethod
-    def _is_birthday_all_distinct_path(path):
-        if not path:
-            return False
-        *preds, last = path
-        if not (isinstance(last, tuple) and last[0] == 'Statements' and last[1] in (['return 0'], ('return 0',))):
-            return False
-        for cond, outcome in preds:
-            if outcome != 'False':
-                return False
-        return True
-
-    @staticmethod
-    def _path_returns_1(path):
-        return isinstance(path[-1], tuple) and path[-1][0] == 'Statements' and ('return 1' in path[-1][1])
+    # ---------- Closed-form birthday shortcut (see pathbranch/birthday_engine.py) ----------
+    def _birthday_engine(self, S: int):
+        """One engine per calculator, so the log-space prefix table is shared by every path."""
+        if self._bday is None:
+            day_pmf = None
+            if self.pmf:
+                tables = {tuple(sorted(t.items())) for t in self.pmf.values()}
+                if len(tables) != 1:
+                    return None  # people with different calendars: no closed form
+                day_pmf = dict(tables.pop())
+            self._bday = BirthdayEngine(S=S, pmf=day_pmf)
+        return self._bday
 
     def _birthday_closed_form_prob(self, path, S: int) -> float | None:
-        # 'return 1' case?
-        if self._path_returns_1(path):
-            last_hit = None
-            for step in path[::-1]:
-                if step[0] == 'Statements':
-                    continue
-                hit = self._is_birthday_return1_step(step)
-                if hit:
-                    last_hit = hit
-                    break
-            if not last_hit:
-                return None
-            i, _ = last_hit
-            p_no = 1.0
-            for t in range(i):
-                p_no *= (S - t) / S
-            return p_no * (1 / S)
-
-        # 'return 0' all-distinct
-        if self._is_birthday_all_distinct_path(path):
-            max_idx = -1
-            for cond, outcome in path:
-                m = re.findall(r'\bb(\d+)\b', cond) if cond != 'Statements' else []
-                for g in m:
-                    max_idx = max(max_idx, int(g))
-            K = max_idx + 1 if max_idx >= 0 else 0
-            p_all = 1.0
-            for t in range(K):
-                if S - t <= 0:
-                    return 0.0
-                p_all *= (S - t) / S
-            return p_all
-
-        return None
+        engine = self._birthday_engine(S)
+        return engine.path_probability(path) if engine else None
+
+    def _uniform_domain_size(self):
+        """S if every variable's domain has the same size, else None (birthday shortcut guard)."""
+        unique_sizes = {len(list(v)) for v in self.domain.values()}
+        return unique_sizes.pop() if len(unique_sizes) == 1 else None
 
     # ---------- Batch path probabilities ----------
     def calculate_path_probabilities(self, paths):
         """
         Compute probabilities for all extracted paths.
-        Uses closed-form (birthday) when possible; otherwise falls back to enumeration
-        (weighted if pmf is provided).
+        Consults the closed-form registry (pathbranch/closed_forms.py: birthday chains,
+        all-distinct chains, two-input comparisons, thresholds, Freivalds rows) first;
+        otherwise falls back to enumeration (weighted if pmf is provided).
+        Hits per family are kept in self.closed_form_stats.
         """
-        unique_sizes = {len(list(v)) for v in self.domain.values()}
-        S_uniform = unique_sizes.pop() if len(unique_sizes) == 1 else None
-
         probs = {}
         for path in paths:
-            p_cf = None
-            if S_uniform is not None:
-                p_cf = self._birthday_closed_form_prob(path, S_uniform)
+            hit = match_closed_form(path, self)
+            self.closed_form_stats.record(hit[0] if hit else None)
 
-            if p_cf is not None:
-                p = p_cf
+            if hit is not None:
+                p = hit[1]
             else:
                 p = 1.0
                 givens = []
@@ -198,75 +232,94 @@ class ProbabilityCalculator:
 
 # --------------------- TEST: Von Neumann all paths at once ---------------------
 
-variables = ['a', 'b']
-domain = {'a': [0, 1], 'b': [0, 1]}
-
-# (a==0 and b==1) -> return 0
-# elif (a==1 and b==0) -> return 1
-# else -> return -1   (repeat)
-neumacoin = [
-    [('a == 0 and b == 1', 'True'),  ('Statements', ['return 0'])],
-    [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'True'),  ('Statements', ['return 1'])],
-    [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'False'), ('Statements', ['return -1'])],
-]
-
-# ---- Case A: uniform (sanity check) ----
-calc_uniform = ProbabilityCalculator(variables, domain)
-uniform_probs = calc_uniform.calculate_path_probabilities(neumacoin)
-
-print("=== Uniform (p=0.5) ===")
-total = 0.0
-for path, pr in uniform_probs.items():
-    print(f"{path}  -> P={pr:.6f}")
-    total += pr
-print("Sum:", total, "\n")   # expect 1.0; masses should be 0.25, 0.25, 0.50
-
-# ---- Case B: biased coin with parameter p (pmf) ----
-p = 0.8
-pmf = {'a': {0: p, 1: 1-p}, 'b': {0: p, 1: 1-p}}
-calc_biased = ProbabilityCalculator(variables, domain, pmf=pmf)
-biased_probs = calc_biased.calculate_path_probabilities(neumacoin)
-
-print("=== Biased (P(0)=p, p=0.8) ===")
-total = 0.0
-agg = {"return 0": 0.0, "return 1": 0.0, "repeat": 0.0}
-for path, pr in biased_probs.items():
-    total += pr
-    # detect label from last Statements
-    last = path[-1]
-    lab = "repeat"
-    if last[0] == 'Statements':
-        block = last[1] if isinstance(last[1], (list, tuple)) else [last[1]]
-        for s in block:
-            s = s.strip()
-            if s.startswith("return 0"): lab = "return 0"
-            elif s.startswith("return 1"): lab = "return 1"
-            elif s.startswith("return -1"): lab = "repeat"
-    agg[lab] += pr
-    print(f"{path}  -> P={pr:.6f}")
-
-print("Sum:", total)
-print(f"P(HT → 0) = {agg['return 0']:.6f}   (expected p*(1-p))")
-print(f"P(TH → 1) = {agg['return 1']:.6f}   (expected (1-p)*p)")
-print(f"P(repeat) = {agg['repeat']:.6f}     (expected p*p + (1-p)*(1-p))")
-
-accept = agg['return 0'] + agg['return 1']
-if accept > 0:
-    print(f"P(output=0 | accept) = {agg['return 0']/accept:.6f}")  # -> 0.5
-    print(f"P(output=1 | accept) = {agg['return 1']/accept:.6f}")  # -> 0.5
-
-
-#------randominoftwo function test-------
-
-randminoftwo_paths = [
-[('x < y', 'True'), ('Statements', ['return 1'])]
-,[('x < y', 'False'), ('Statements', ['return 0'])]
-]
-calc_randmin = ProbabilityCalculator(['x','y'], {'x': list(range(1,10)),  'y': list(range(1,10)),})
-randmin_probs = calc_randmin.calculate_path_probabilities(randminoftwo_paths)
-print("\n=== randminoftwo paths ===")
-total = 0.0
-for path, pr in randmin_probs.items():
-    print(f"{path}  -> P={pr:.6f}")
-    total += pr
-print("Sum:", total, "\n")   # expect 1.0; masses should be 0.55, 0.45  
+if __name__ == "__main__":
+
+    variables = ['a', 'b']
+    domain = {'a': [0, 1], 'b': [0, 1]}
+
+    # (a==0 and b==1) -> return 0
+    # elif (a==1 and b==0) -> return 1
+    # else -> return -1   (repeat)
+    neumacoin = [
+        [('a == 0 and b == 1', 'True'),  ('Statements', ['return 0'])],
+        [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'True'),  ('Statements', ['return 1'])],
+        [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'False'), ('Statements', ['return -1'])],
+    ]
+
+    # ---- Case A: uniform (sanity check) ----
+    calc_uniform = ProbabilityCalculator(variables, domain)
+    uniform_probs = calc_uniform.calculate_path_probabilities(neumacoin)
+
+    print("=== Uniform (p=0.5) ===")
+    total = 0.0
+    for path, pr in uniform_probs.items():
+        print(f"{path}  -> P={pr:.6f}")
+        total += pr
+    print("Sum:", total, "\n")   # expect 1.0; masses should be 0.25, 0.25, 0.50
+
+    # ---- Case B: biased coin with parameter p (pmf) ----
+    p = 0.8
+    pmf = {'a': {0: p, 1: 1-p}, 'b': {0: p, 1: 1-p}}
+    calc_biased = ProbabilityCalculator(variables, domain, pmf=pmf)
+    biased_probs = calc_biased.calculate_path_probabilities(neumacoin)
+
+    print("=== Biased (P(0)=p, p=0.8) ===")
+    total = 0.0
+    agg = {"return 0": 0.0, "return 1": 0.0, "repeat": 0.0}
+    for path, pr in biased_probs.items():
+        total += pr
+        # detect label from last Statements
+        last = path[-1]
+        lab = "repeat"
+        if last[0] == 'Statements':
+            block = last[1] if isinstance(last[1], (list, tuple)) else [last[1]]
+            for s in block:
+                s = s.strip()
+                if s.startswith("return 0"): lab = "return 0"
+                elif s.startswith("return 1"): lab = "return 1"
+                elif s.startswith("return -1"): lab = "repeat"
+        agg[lab] += pr
+        print(f"{path}  -> P={pr:.6f}")
+
+    print("Sum:", total)
+    print(f"P(HT → 0) = {agg['return 0']:.6f}   (expected p*(1-p))")
+    print(f"P(TH → 1) = {agg['return 1']:.6f}   (expected (1-p)*p)")
+    print(f"P(repeat) = {agg['repeat']:.6f}     (expected p*p + (1-p)*(1-p))")
+
+    accept = agg['return 0'] + agg['return 1']
+    if accept > 0:
+        print(f"P(output=0 | accept) = {agg['return 0']/accept:.6f}")  # -> 0.5
+        print(f"P(output=1 | accept) = {agg['return 1']/accept:.6f}")  # -> 0.5
+
+
+    #------randominoftwo function test-------
+
+    randminoftwo_paths = [
+    [('x < y', 'True'), ('Statements', ['return 1'])]
+    ,[('x < y', 'False'), ('Statements', ['return 0'])]
+    ]
+    calc_randmin = ProbabilityCalculator(['x','y'], {'x': list(range(1,10)),  'y': list(range(1,10)),})
+    randmin_probs = calc_randmin.calculate_path_probabilities(randminoftwo_paths)
+    print("\n=== randminoftwo paths ===")
+    total = 0.0
+    for path, pr in randmin_probs.items():
+        print(f"{path}  -> P={pr:.6f}")
+        total += pr
+    print("Sum:", total, "\n")   # expect 1.0; masses should be 0.55, 0.45
+
+    print("Closed-form registry hits:", calc_randmin.closed_form_stats.report())
+
+    # ---- int64 overflow: these must match plain enumeration, not wrapped arrays ----
+    calc_big = ProbabilityCalculator(['x'], {'x': range(1, 11)})
+    for cond, expected in [('x ** 20 > 10 ** 18', 0.3), ('2 ** (x*7) % 1000 == 0', 0.0)]:
+        got = calc_big.compute_probability(cond)
+        assert abs(got - expected) < 1e-12, (cond, got, expected)
+        print(f"P({cond}) = {got:.6f}   (expected {expected})")
+
+    # ---- bool domains add as ints (True + True == 2), guarded division stays quiet ----
+    calc_bool = ProbabilityCalculator(['a', 'b'], {'a': [True, False], 'b': [True, False]})
+    got = calc_bool.compute_probability('a + b == 2')
+    assert abs(got - 0.25) < 1e-12, got
+    print(f"P(a + b == 2) over bools = {got:.6f}   (expected 0.25)")
+    calc_div = ProbabilityCalculator(['x', 'y'], {'x': range(4), 'y': range(4)})
+    print(f"P(y != 0 and x / y > 1) = {calc_div.compute_probability('y != 0 and x / y > 1'):.6f}   (expected 0.1875)")
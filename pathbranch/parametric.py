@@ -0,0 +1,292 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ast
+import re
+from itertools import product
+from math import comb
+
+import numpy as np
+from numpy.polynomial import Chebyshev, Polynomial
+
+from pathbranch.limitpathfix import ProbabilityCalculator
+from pathbranch.vector_eval import compile_vectorized, eval_mask, fits_int64
+
+# ---------- Path probabilities as polynomials in a parameter ----------
+#
+# With an independent product pmf whose entries are polynomials in p (p, 1 - p,
+# p**2, ...), every path probability is a sum over satisfying assignments of
+# products of entries, i.e. a polynomial in p of degree at most the sum of the
+# per-variable degrees. It is built exactly by enumeration, in the scaled
+# Bernstein basis p^k (1 - p)^(d - k): the entries p and 1 - p are single basis
+# terms, a product of entries is a convolution of coefficient arrays, and
+# probabilities come out as sums of non-negative terms, so evaluating at
+# p = 0.95 does not cancel huge alternating monomial coefficients. The path's
+# condition is split into conjuncts over disjoint variables (coin chains fall
+# apart into one factor per coin) and each group is enumerated in NumPy blocks.
+# Groups whose product domain exceeds ENUM_LIMIT fall back to interpolating the
+# ordinary calculator at Chebyshev nodes, kept as a Chebyshev series.
+
+PARAM = Polynomial([0.0, 1.0])  # the parameter itself: pmf = {'a': {0: PARAM, 1: 1 - PARAM}}
+ENUM_LIMIT = 1 << 22            # largest product domain of one variable group enumerated exactly
+CHUNK = 1 << 16                 # assignments per enumeration block
+
+NAME_RE = re.compile(r'\b[a-zA-Z_]\w*\b')
+
+
+def _degree(entry) -> int:
+    return entry.degree() if isinstance(entry, Polynomial) else 0
+
+
+def _at(entry, x: float) -> float:
+    return float(entry(x)) if isinstance(entry, Polynomial) else float(entry)
+
+
+def _elevate(c, d):
+    """Same polynomial in the degree-d basis (multiply by (p + (1 - p))^(d - deg))."""
+    c = np.asarray(c, dtype=float)
+    e = d - (len(c) - 1)
+    return np.convolve(c, [comb(e, i) for i in range(e + 1)]) if e > 0 else c
+
+
+class BernsteinPoly:
+    """sum_k c_k p^k (1 - p)^(d - k); 'coef' is the monomial form (for display and poly_expr)."""
+
+    def __init__(self, c, symbol="p"):
+        self.c = np.atleast_1d(np.asarray(c, dtype=float))
+        self.symbol = symbol
+
+    @classmethod
+    def from_entry(cls, entry, symbol="p"):
+        """Basis coefficients of a pmf entry (number or Polynomial in p): p^j = sum_k C(d-j, k-j) p^k (1-p)^(d-k)."""
+        a = entry.coef if isinstance(entry, Polynomial) else np.array([float(entry)])
+        d = len(a) - 1
+        return cls([sum(a[j] * comb(d - j, k - j) for j in range(k + 1)) for k in range(d + 1)], symbol)
+
+    @property
+    def degree(self):
+        return len(self.c) - 1
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=float)
+        k = np.arange(len(self.c))
+        terms = self.c * x[..., None] ** k * (1 - x[..., None]) ** (self.degree - k)
+        return terms.sum(axis=-1)
+
+    def __mul__(self, other):
+        return BernsteinPoly(np.convolve(self.c, other.c), self.symbol)
+
+    def __add__(self, other):
+        d = max(self.degree, other.degree)
+        return BernsteinPoly(_elevate(self.c, d) + _elevate(other.c, d), self.symbol)
+
+    def to_polynomial(self) -> Polynomial:
+        p = Polynomial([0.0, 1.0], symbol=self.symbol)
+        return sum((c * p ** k * (1 - p) ** (self.degree - k) for k, c in enumerate(self.c) if c),
+                   Polynomial([0.0], symbol=self.symbol))
+
+    @property
+    def coef(self):
+        return self.to_polynomial().coef
+
+    def prism_expr(self, param="p"):
+        """PRISM expression as a sum of non-negative basis terms."""
+        d = self.degree
+        terms = [f"{c:.17g}*pow({param},{k})*pow(1-{param},{d - k})" for k, c in enumerate(self.c) if c]
+        return " + ".join(terms) or "0"
+
+    def __repr__(self):
+        return str(self.to_polynomial())
+
+
+class ParametricPaths:
+    """Path -> polynomial in the parameter (BernsteinPoly when exact, Chebyshev when interpolated)."""
+
+    def __init__(self, paths, polys, param="p"):
+        self.paths = list(paths)
+        self.polys = list(polys)
+        self.param = param
+
+    @property
+    def coeffs(self):
+        """Monomial coefficients (lowest order first), one column per path, padded to a common degree."""
+        cols = [self.polynomial(k).coef for k in range(len(self.paths))]
+        out = np.zeros((max(map(len, cols), default=1), len(cols)))
+        for k, c in enumerate(cols):
+            out[:len(c), k] = c
+        return out
+
+    def polynomial(self, k: int) -> Polynomial:
+        f = self.polys[k]
+        if isinstance(f, BernsteinPoly):
+            return f.to_polynomial()
+        return f.convert(kind=Polynomial, domain=[-1, 1], window=[-1, 1])
+
+    def evaluate(self, p: float) -> dict:
+        """Numeric path probabilities at one parameter value (same keys as calculate_path_probabilities)."""
+        return {path: float(max(f(p), 0.0)) for path, f in zip(self.paths, self.polys)}
+
+    def evaluate_many(self, ps) -> np.ndarray:
+        """Array (len(ps), n_paths) of path probabilities over a sweep of parameter values."""
+        ps = np.asarray(ps, dtype=float)
+        return np.clip(np.column_stack([f(ps) for f in self.polys]) if self.polys else np.zeros((len(ps), 0)), 0.0, None)
+
+    def total(self, select):
+        """Polynomial for the summed probability of the paths with select(path) true."""
+        picked = [f for path, f in zip(self.paths, self.polys) if select(path)]
+        if not picked:
+            return BernsteinPoly([0.0], self.param)
+        out = picked[0]
+        for f in picked[1:]:
+            out = out + f
+        return out
+
+    def items(self):
+        """(path, polynomial): the BernsteinPoly itself when exact, else its monomial Polynomial."""
+        return ((path, f if isinstance(f, BernsteinPoly) else self.polynomial(k))
+                for k, (path, f) in enumerate(zip(self.paths, self.polys)))
+
+
+def _conjuncts(path):
+    """Top-level 'and' parts of the path's joint condition."""
+    parts = []
+    for cond, outcome in path:
+        if cond == 'Statements':
+            continue
+        node = ast.parse(cond.strip(), mode="eval").body
+        if outcome == 'True' and isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            parts.extend(ast.unparse(v) for v in node.values)
+        else:
+            parts.append(cond if outcome == 'True' else f"not ({cond})")
+    return parts
+
+
+class ParametricCalculator:
+    def __init__(self, variables, domain, pmf, param="p"):
+        """
+        variables, domain: as for ProbabilityCalculator
+        pmf: dict[str, dict[value, number | Polynomial]] with entries polynomial in the
+             parameter, e.g. {'a': {0: PARAM, 1: 1 - PARAM}} for a coin with P(0) = p.
+        """
+        self.variables = variables
+        self.domain = domain
+        self.pmf = pmf
+        self.param = param
+        self.degree = sum(max((_degree(e) for e in table.values()), default=0) for table in pmf.values())
+
+    def pmf_at(self, x: float) -> dict:
+        return {v: {val: _at(e, x) for val, e in table.items()} for v, table in self.pmf.items()}
+
+    def _weights(self, v):
+        """(values, (|domain|, d_v + 1) basis coefficients) for one variable; uniform without a pmf entry."""
+        values = list(self.domain[v])
+        table = self.pmf.get(v)
+        if table is None:
+            return values, np.full((len(values), 1), 1.0 / len(values))
+        rows = [BernsteinPoly.from_entry(table.get(x, 0.0)).c for x in values]
+        d = max(len(r) for r in rows) - 1
+        return values, np.array([_elevate(r, d) for r in rows])
+
+    def _groups(self, conjuncts):
+        """Conjuncts merged into groups over disjoint variable sets: [(vars, condition)]."""
+        groups = []
+        for part in conjuncts:
+            names = set(NAME_RE.findall(part)) & set(self.variables)
+            merged = [g for g in groups if g[0] & names]
+            for g in merged:
+                groups.remove(g)
+                names |= g[0]
+            groups.append((names, [p for g in merged for p in g[1]] + [part]))
+        return [(sorted(names), " and ".join(f"({p})" for p in parts)) for names, parts in groups]
+
+    def _group_poly(self, names, cond):
+        """Exact polynomial of P(cond) over the variables 'names' by blockwise enumeration."""
+        tables = [self._weights(v) for v in names]
+        values = [np.asarray(vals) for vals, _ in tables]
+        values = [v.astype(np.int64) if v.dtype == bool else v for v in values]
+        sizes = tuple(len(v) for v in values)
+        total = int(np.prod(sizes, dtype=np.int64)) if sizes else 1
+        bounds = {v: max(abs(int(x)) for x in vals) for v, vals in zip(names, values)
+                  if vals.dtype.kind in "iu" and len(vals)}
+        vectorized = fits_int64(cond, bounds)
+        code = compile_vectorized(cond) if vectorized else compile(cond, "<cond>", "eval")
+        acc = np.zeros(sum(w.shape[1] - 1 for _, w in tables) + 1)
+        for start in range(0, total, CHUNK):
+            stop = min(start + CHUNK, total)
+            cols = np.unravel_index(np.arange(start, stop), sizes) if sizes else ()
+            if vectorized:
+                mask = eval_mask(code, {v: vals[c] for v, vals, c in zip(names, values, cols)}, stop - start)
+            else:
+                mask = np.array([bool(eval(code, {}, {v: vals[i].item() for v, vals, i in zip(names, values, idx)}))
+                                 for idx in zip(*cols)], dtype=bool) if sizes else np.array([bool(eval(code, {}, {}))])
+            if not mask.any():
+                continue
+            # product of the chosen rows' coefficient arrays, one convolution per variable
+            prod_c = np.ones((int(mask.sum()), 1))
+            for (_, w), c in zip(tables, cols):
+                rows = w[c[mask]]
+                grown = np.zeros((len(prod_c), prod_c.shape[1] + rows.shape[1] - 1))
+                for s in range(rows.shape[1]):
+                    grown[:, s:s + prod_c.shape[1]] += prod_c * rows[:, s:s + 1]
+                prod_c = grown
+            acc[:prod_c.shape[1]] += prod_c.sum(axis=0)
+        return BernsteinPoly(acc, self.param)
+
+    def _path_groups(self, path):
+        return self._groups(_conjuncts(path))
+
+    def _exact(self, path):
+        poly = BernsteinPoly([1.0], self.param)
+        for names, cond in self._path_groups(path):
+            poly = poly * self._group_poly(names, cond)
+        return poly
+
+    def _fitted(self, paths):
+        """Chebyshev interpolation of the calculator at degree + 1 nodes in (0, 1)."""
+        n = self.degree + 1
+        nodes = 0.5 - 0.5 * np.cos((2 * np.arange(n) + 1) * np.pi / (2 * n))
+        keys, rows = None, []
+        for x in nodes:
+            probs = ProbabilityCalculator(self.variables, self.domain, pmf=self.pmf_at(x)) \
+                .calculate_path_probabilities(paths)
+            keys = keys or list(probs)
+            rows.append([probs[k] for k in keys])
+        rows = np.array(rows)
+        return keys, [Chebyshev.fit(nodes, rows[:, k], self.degree, domain=[0, 1], symbol=self.param)
+                      for k in range(len(keys))]
+
+    def calculate_path_polynomials(self, paths) -> ParametricPaths:
+        paths = list(paths)
+        size = lambda names: int(np.prod([len(list(self.domain[v])) for v in names], dtype=np.int64))
+        if all(size(names) <= ENUM_LIMIT for path in paths for names, _ in self._path_groups(path)):
+            keys = [tuple((c, tuple(o) if isinstance(o, list) else o) for c, o in path) for path in paths]
+            return ParametricPaths(keys, [self._exact(path) for path in paths], self.param)
+        keys, polys = self._fitted(paths)
+        return ParametricPaths(keys, polys, self.param)
+
+
+# --------------------- Demo: Von Neumann coin with symbolic bias ---------------------
+if __name__ == "__main__":
+    variables = ['a', 'b']
+    domain = {'a': [0, 1], 'b': [0, 1]}
+    neumacoin = [
+        [('a == 0 and b == 1', 'True'),  ('Statements', ['return 0'])],
+        [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'True'),  ('Statements', ['return 1'])],
+        [('a == 0 and b == 1', 'False'), ('a == 1 and b == 0', 'False'), ('Statements', ['return -1'])],
+    ]
+    pmf = {'a': {0: PARAM, 1: 1 - PARAM}, 'b': {0: PARAM, 1: 1 - PARAM}}
+    poly = ParametricCalculator(variables, domain, pmf).calculate_path_polynomials(neumacoin)
+    for path, f in poly.items():
+        print(f"{path[-1][1]} -> {f}")
+
+    sweep = np.linspace(0.1, 0.9, 5)
+    print("p      :", np.round(sweep, 3))
+    print("P(ret0):", np.round(poly.evaluate_many(sweep)[:, 0], 6), "(expected p*(1-p))")
+
+    # many coins: 24 tails in a row is (1 - p)^24, far below any monomial-fit noise at p = 0.95
+    coins = [f"c{i}" for i in range(24)]
+    tails = [[(f"{c} == 1", 'True') for c in coins] + [('Statements', ['return 1'])]]
+    many = ParametricCalculator(coins, {c: [0, 1] for c in coins}, {c: {0: PARAM, 1: 1 - PARAM} for c in coins})
+    got = many.calculate_path_polynomials(tails).evaluate_many([0.7, 0.95])[:, 0]
+    print(f"24 tails at p = 0.7, 0.95: {got[0]:.6e} {got[1]:.6e}  (exact {0.3 ** 24:.6e} {0.05 ** 24:.6e})")
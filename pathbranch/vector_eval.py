@@ -0,0 +1,149 @@
+import ast
+from functools import reduce
+
+import numpy as np
+
+# ---------- Vectorized evaluation of path conditions ----------
+#
+# Path conditions are plain Python expressions ('a == 0 and b == 1',
+# 'not (x < y)', 'px**2 + py**2 <= R2'). 'and' / 'or' / 'not' and chained
+# comparisons do not broadcast over arrays, so the expression is rewritten to
+# element-wise helpers before compiling. Anything that still does not
+# vectorize (e.g. builtin max() on arrays) raises at eval time and callers
+# fall back to the scalar loop. Integer arrays are int64 and wrap around
+# silently where Python ints would grow, so callers check fits_int64 first.
+
+def _and(*xs):
+    return reduce(np.logical_and, xs)
+
+def _or(*xs):
+    return reduce(np.logical_or, xs)
+
+def _isin(x, values):
+    return np.isin(x, list(values))
+
+def _where(c, a, b):
+    return np.where(c, a, b)
+
+VECTOR_HELPERS = {
+    '_and': _and,
+    '_or': _or,
+    '_not': np.logical_not,
+    '_isin': _isin,
+    '_where': _where,
+    'abs': np.abs,
+}
+
+
+def _call(name, args):
+    return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+
+class _Vectorizer(ast.NodeTransformer):
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return _call('_and' if isinstance(node.op, ast.And) else '_or', node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return _call('_not', [node.operand])
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return _call('_where', [node.test, node.body, node.orelse])
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if isinstance(right, (ast.Tuple, ast.List, ast.Set)):
+                    # 'x in (a, b)' may list other variables: compare element-wise
+                    part = _call('_or', [ast.Compare(left=left, ops=[ast.Eq()], comparators=[e])
+                                         for e in right.elts] or [ast.Constant(False)])
+                else:
+                    part = _call('_isin', [left, right])
+                if isinstance(op, ast.NotIn):
+                    part = _call('_not', [part])
+            else:
+                part = ast.Compare(left=left, ops=[op], comparators=[right])
+            parts.append(part)
+            left = right
+        return parts[0] if len(parts) == 1 else _call('_and', parts)
+
+
+INT64_MAX = 2 ** 63 - 1
+
+
+def _magnitude(node, bounds):
+    """
+    Upper bound on |value| of an integer subexpression, None when it may leave
+    int64. Names outside 'bounds' and non-integer constants are not integer
+    arithmetic (floats do not wrap) and get 0, which is never checked further.
+    """
+    if isinstance(node, ast.Constant):
+        return abs(node.value) if type(node.value) is int else 0
+    if isinstance(node, ast.Name):
+        return bounds.get(node.id, 0)
+    if isinstance(node, ast.UnaryOp):
+        return _magnitude(node.operand, bounds)
+    if isinstance(node, ast.BinOp):
+        a, b = _magnitude(node.left, bounds), _magnitude(node.right, bounds)
+        if a is None or b is None:
+            return None
+        op = node.op
+        if isinstance(op, (ast.Add, ast.Sub)):
+            m = a + b
+        elif isinstance(op, ast.Mult):
+            m = a * b
+        elif isinstance(op, ast.Pow):
+            if a > 1 and b * a.bit_length() > 64:
+                return None
+            m = a ** b
+        elif isinstance(op, ast.LShift):
+            if b + a.bit_length() > 64:
+                return None
+            m = a << b
+        elif isinstance(op, ast.Mod):
+            m = b
+        else:  # //, /, >>, &, |, ^ do not grow past their operands
+            m = max(a, b)
+        return m if m <= INT64_MAX else None
+    bad = False
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, ast.expr) and _magnitude(child, bounds) is None:
+            bad = True
+    return None if bad else 0
+
+
+def fits_int64(expr: str, bounds: dict) -> bool:
+    """
+    True when no integer arithmetic in 'expr' can overflow int64, given
+    bounds = {name: max |value|} for integer-valued variables.
+    """
+    return _magnitude(ast.parse(expr.strip(), mode="eval").body, bounds) is not None
+
+
+def vectorize_expr(expr: str) -> str:
+    """Rewrite a Python boolean/arithmetic expression into its element-wise NumPy form."""
+    tree = _Vectorizer().visit(ast.parse(expr.strip(), mode="eval"))
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+
+def compile_vectorized(expr: str):
+    return compile(vectorize_expr(expr), "<vexpr>", "eval")
+
+
+def eval_mask(code_obj, env: dict, size: int):
+    """
+    Evaluate a compiled vectorized condition to a boolean array of length 'size'.
+    'and'/'or' evaluate every operand on every element, so guarded divisions
+    (b != 0 and a / b > 1) divide by zero where the guard is false; those
+    elements are masked out anyway and the warnings are silenced.
+    """
+    with np.errstate(all="ignore"):
+        out = eval(code_obj, dict(VECTOR_HELPERS), env)
+    return np.broadcast_to(np.asarray(out, dtype=bool), (size,))